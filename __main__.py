@@ -0,0 +1,13 @@
+"""
+以 python -m foldersize 运行（需在本项目目录的上一级目录中执行，且本项目目录名为foldersize）
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cli
+
+
+sys.exit(cli.main())
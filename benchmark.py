@@ -0,0 +1,275 @@
+"""
+性能测试
+在临时文件夹中生成可重复的文件夹树，分别测量扫描、排序、建立搜索索引、搜索、导出、显示等阶段的耗时与内存峰值，
+结果以JSON格式保存，并可与之前保存的基准结果比较，超出阈值时以非0退出码结束
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import tracemalloc
+from fileUtils import DirTreeNode, CompactDirTree, DirManager
+from nameIndex import DirNameIndex
+
+treeKinds = ('wide', 'deep', 'tinyFiles', 'cjk', 'denied')
+cjkChars = '文件夹大小统计测试数据备份图片视频音乐文档下载项目临时日志缓存资料'
+
+
+def buildSyntheticTree(nodeCount: int, fanout: int = 10) -> DirTreeNode:
+    """ 在内存中生成指定节点数的文件夹树，文件夹名会大量重复（与真实情况类似） """
+    rootNode = DirTreeNode('/synthetic', '/synthetic')
+    nodes = [rootNode]
+    for i in range(1, nodeCount):
+        parent = nodes[(i - 1) // fanout]
+        dirName = f'dir{i % 100}'
+        node = parent.appendChild(DirTreeNode(f'{parent.pathDirName}/{dirName}', dirName))
+        node.selfSize = node.allSize = i
+        node.fileCount = i % 7
+        nodes.append(node)
+    return rootNode
+
+
+def benchmarkMemory(nodeCount: int) -> dict:
+    """ 比较DirTreeNode对象树与CompactDirTree存储相同数据时占用的内存 """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseBytes = tracemalloc.get_traced_memory()[0]
+        rootNode = buildSyntheticTree(nodeCount)
+        objectBytes = tracemalloc.get_traced_memory()[0] - baseBytes
+
+        store = CompactDirTree(rootNode.pathDirName)
+        store.rootIndex = store.importTree(rootNode)
+        store.releaseInternTable()
+        del rootNode
+        gc.collect()
+        compactBytes = tracemalloc.get_traced_memory()[0] - baseBytes
+    finally:
+        tracemalloc.stop()
+    return {'nodeCount': nodeCount, 'objectBytes': objectBytes, 'compactBytes': compactBytes,
+            'ratio': objectBytes / compactBytes if compactBytes else 0}
+
+
+def _writeFiles(pathDirName: str, count: int, rand: random.Random, maxSize: int):
+    """ 在文件夹中生成若干随机大小的文件 """
+    for i in range(count):
+        with open(os.path.join(pathDirName, f'file{i}.dat'), 'wb') as file:
+            file.write(b'\0' * rand.randint(0, maxSize))
+
+
+def generateTree(baseDir: str, kind: str, scale: int = 1, seed: int = 0) -> str:
+    """ 在baseDir下生成一种文件夹树，相同参数生成的树完全相同
+    :param kind: wide（很宽）、deep（很深）、tinyFiles（大量小文件）、cjk（中文名称）、denied（部分文件夹无权访问）
+    :param scale: 规模倍数
+    :returns: 生成的树的根路径
+    """
+    rand = random.Random(f'{kind}-{seed}')
+    rootDir = os.path.join(baseDir, kind)
+    os.makedirs(rootDir)
+    if kind == 'wide':
+        for i in range(2000 * scale):
+            pathDirName = os.path.join(rootDir, f'dir{i}')
+            os.mkdir(pathDirName)
+            _writeFiles(pathDirName, 3, rand, 4096)
+    elif kind == 'deep':
+        for branch in range(4 * scale):
+            pathDirName = os.path.join(rootDir, f'branch{branch}')
+            for _ in range(300):
+                pathDirName = os.path.join(pathDirName, 'd')
+            os.makedirs(pathDirName)
+            for _ in range(300):
+                _writeFiles(pathDirName, 1, rand, 1024)
+                pathDirName = os.path.dirname(pathDirName)
+    elif kind == 'tinyFiles':
+        for i in range(40 * scale):
+            pathDirName = os.path.join(rootDir, f'dir{i}')
+            os.mkdir(pathDirName)
+            _writeFiles(pathDirName, 500, rand, 16)
+    elif kind == 'cjk':
+        for i in range(1500 * scale):
+            names = [''.join(rand.choice(cjkChars) for _ in range(rand.randint(2, 6))) + str(i)
+                     for _ in range(rand.randint(1, 3))]
+            pathDirName = os.path.join(rootDir, *names)
+            os.makedirs(pathDirName, exist_ok=True)
+            _writeFiles(pathDirName, 2, rand, 2048)
+    elif kind == 'denied':
+        for i in range(500 * scale):
+            pathDirName = os.path.join(rootDir, f'dir{i}', 'sub')
+            os.makedirs(pathDirName)
+            _writeFiles(pathDirName, 2, rand, 2048)
+            if i % 10 == 0:
+                # 以root身份运行时权限限制无效
+                os.chmod(os.path.dirname(pathDirName), 0)
+    else:
+        raise ValueError(f'未知的文件夹树类型: {kind}')
+    return rootDir
+
+
+def removeTree(rootDir: str):
+    """ 删除生成的文件夹树（先恢复被限制的权限） """
+    # 自顶向下遍历时，子文件夹在进入之前已恢复权限
+    for pathDirName, dirNames, _ in os.walk(rootDir):
+        for dirName in dirNames:
+            os.chmod(os.path.join(pathDirName, dirName), stat.S_IRWXU)
+    shutil.rmtree(rootDir)
+
+
+def measure(func, repeat: int) -> dict:
+    """ 测量函数的耗时（多次运行取最短）与内存峰值（单独运行一次并追踪内存，避免影响计时） """
+    bestSeconds = None
+    for _ in range(repeat):
+        gc.collect()
+        startTime = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - startTime
+        bestSeconds = seconds if bestSeconds is None else min(bestSeconds, seconds)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peakBytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': bestSeconds, 'peakBytes': peakBytes}
+
+
+def benchmarkTree(rootDir: str, repeat: int, workers: int, gui: bool) -> dict:
+    """ 测量一棵文件夹树各阶段的性能 """
+    result = {'scan': measure(lambda: DirManager(rootDir, workers=workers), repeat)}
+    dirManager = DirManager(rootDir, workers=workers)
+    result['sort'] = measure(lambda: [dirManager.sort(key) for key in
+                                      ('name', 'allSize', 'selfSize', 'dirCount', 'fileCount')], repeat)
+    # 建立文件夹名索引（首次搜索的主要开销）单独测量，search只测量使用已建立的索引的查询
+    result['index'] = measure(lambda: DirNameIndex(dirManager.dirTree), repeat)
+    list(dirManager.searchNode('1', True, False))
+    result['search'] = measure(lambda: (list(dirManager.searchNode('1', True, False)),
+                                        list(dirManager.searchNode('d.*[0-9]$', False, True))), repeat)
+
+    def export():
+        with open(os.devnull, 'w', encoding='utf-8') as file:
+            dirManager.export(file)
+
+    result['export'] = measure(export, repeat)
+    if gui:
+        result['showData'] = benchmarkShowData(dirManager, repeat)
+    result['dirCount'] = dirManager.dirTree.dirCount
+    result['fileCount'] = dirManager.dirTree.fileCount
+    return result
+
+
+def benchmarkShowData(dirManager: DirManager, repeat: int) -> dict:
+    """ 测量主窗口显示扫描结果的性能，需要图形界面 """
+    import mainWindow
+    window = mainWindow.MainWindow()
+    window.withdraw()
+    try:
+        # 直接调用主窗口的私有方法，避免经过文件对话框和后台扫描
+        window._MainWindow__dirManager = dirManager
+
+        def showData():
+            window._MainWindow__showData()
+            window.update_idletasks()
+
+        return measure(showData, repeat)
+    finally:
+        window.destroy()
+
+
+def compareResults(results: dict, baseline: dict, timeThreshold: float, memoryThreshold: float,
+                   minSeconds: float) -> list:
+    """ 与基准结果比较
+    :param timeThreshold: 耗时允许增加的比例
+    :param memoryThreshold: 内存峰值允许增加的比例
+    :param minSeconds: 基准耗时小于该值的阶段不比较耗时（误差太大）
+    :returns: 超出阈值的项的说明
+    """
+    regressions = []
+    for kind, phases in results['cases'].items():
+        for phase, metrics in phases.items():
+            if not isinstance(metrics, dict):
+                continue
+            baseMetrics = baseline.get('cases', {}).get(kind, {}).get(phase)
+            if not isinstance(baseMetrics, dict):
+                continue
+            baseSeconds = baseMetrics['seconds']
+            if baseSeconds >= minSeconds and metrics['seconds'] > baseSeconds * (1 + timeThreshold):
+                regressions.append(f'{kind}.{phase} 耗时 {baseSeconds:.4f}s -> {metrics["seconds"]:.4f}s')
+            basePeak = baseMetrics['peakBytes']
+            if basePeak and metrics['peakBytes'] > basePeak * (1 + memoryThreshold):
+                regressions.append(f'{kind}.{phase} 内存峰值 {basePeak} -> {metrics["peakBytes"]} 字节')
+    return regressions
+
+
+def runBenchmarks(kinds, scale: int, repeat: int, workers: int, gui: bool, nodeCount: int) -> dict:
+    """ 生成各文件夹树并测量，结束后删除生成的文件 """
+    results = {'python': platform.python_version(), 'platform': platform.platform(), 'scale': scale,
+               'workers': workers, 'cases': {}}
+    baseDir = tempfile.mkdtemp(prefix='foldersize-benchmark-')
+    try:
+        for kind in kinds:
+            rootDir = generateTree(baseDir, kind, scale)
+            results['cases'][kind] = benchmarkTree(rootDir, repeat, workers, gui)
+            removeTree(rootDir)
+    finally:
+        if os.path.exists(baseDir):
+            removeTree(baseDir)
+    if nodeCount > 0:
+        results['compactMemory'] = benchmarkMemory(nodeCount)
+    return results
+
+
+def main():
+    """ 命令行入口 """
+    parser = argparse.ArgumentParser(description='foldersize 性能测试')
+    parser.add_argument('--kinds', nargs='+', choices=treeKinds, default=list(treeKinds), help='测试的文件夹树类型')
+    parser.add_argument('--scale', type=int, default=1, help='文件夹树的规模倍数')
+    parser.add_argument('--repeat', type=int, default=3, help='每个阶段重复运行的次数（取最短耗时）')
+    parser.add_argument('--workers', type=int, default=1, help='扫描时并发读取文件夹的线程数')
+    parser.add_argument('--gui', action='store_true', help='同时测试主窗口显示数据（需要图形界面）')
+    parser.add_argument('--nodes', type=int, default=100000, help='内存测试的节点数，为0时不测试')
+    parser.add_argument('--output', help='将结果保存为JSON文件（可作为之后的基准）')
+    parser.add_argument('--baseline', help='基准结果JSON文件，超出阈值时以退出码1结束')
+    parser.add_argument('--time-threshold', type=float, default=0.25, help='耗时允许增加的比例（默认0.25）')
+    parser.add_argument('--memory-threshold', type=float, default=0.25, help='内存峰值允许增加的比例（默认0.25）')
+    parser.add_argument('--min-seconds', type=float, default=0.01, help='基准耗时小于该值的阶段不比较耗时')
+    args = parser.parse_args()
+
+    results = runBenchmarks(args.kinds, args.scale, args.repeat, args.workers, args.gui, args.nodes)
+    for kind, phases in results['cases'].items():
+        print(f'{kind}: {phases["dirCount"]} 个文件夹，{phases["fileCount"]} 个文件')
+        for phase, metrics in phases.items():
+            if isinstance(metrics, dict):
+                print(f'    {phase:<10}{metrics["seconds"]:>10.4f}s{metrics["peakBytes"] / 1024**2:>10.2f} MB')
+    if 'compactMemory' in results:
+        memory = results['compactMemory']
+        print(f'节点数: {memory["nodeCount"]}')
+        print(f'DirTreeNode: {memory["objectBytes"] / 1024**2:.1f} MB '
+              f'({memory["objectBytes"] / memory["nodeCount"]:.0f} B/节点)')
+        print(f'CompactDirTree: {memory["compactBytes"] / 1024**2:.1f} MB '
+              f'({memory["compactBytes"] / memory["nodeCount"]:.0f} B/节点)')
+        print(f'比例: {memory["ratio"]:.1f}x')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compareResults(results, baseline, args.time_threshold, args.memory_threshold,
+                                     args.min_seconds)
+        for regression in regressions:
+            print(f'性能下降: {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""
+二进制快照
+文件由文件头、定长节点记录、子节点序号表、文件夹名字符串表、名称表和名称节点序号表组成，
+节点按广度优先顺序排列（根节点序号为0），每个节点的子节点序号在子节点序号表中连续存放；
+名称表按名称记录使用该名称的节点序号（在名称节点序号表中连续存放），搜索时不必读取每个节点的记录。
+打开时通过mmap映射文件，节点数据在访问时才从文件中读取，打开很大的快照几乎不占用内存
+"""
+
+from array import array
+from collections import deque
+import mmap
+import struct
+import sys
+import time
+from fileUtils import getNameSortKey
+
+binarySnapshotMagic = b'FSZSNAP\0'
+binarySnapshotVersion = 2
+
+_magicStruct = struct.Struct('<8sI')  # 魔数, 版本
+# 魔数, 版本, 记录长度, 节点数, 保存时间戳, 记录起始位置, 子节点序号表起始位置, 字符串表起始位置
+_headerStructV1 = struct.Struct('<8sIIQqQQQ')
+# 版本1的各字段, 名称表起始位置, 名称数, 名称节点序号表起始位置
+_headerStruct = struct.Struct('<8sIIQqQQQQQQ')
+# 名称在字符串表中的位置, 名称长度, 首个节点在名称节点序号表中的位置, 节点数
+_nameStruct = struct.Struct('<QIII')
+# 直属大小, 总大小, 子孙文件夹数, 子孙文件数, 百分比, 名称位置, 名称长度, 父节点序号, 深度, 首个子节点在序号表中的位置,
+# 子节点数, 是否可访问
+_recordStruct = struct.Struct('<qqqqdQIIIIIB3x')
+_noParent = 0xFFFFFFFF
+
+
+def saveBinarySnapshot(rootNode, file):
+    """ 保存以rootNode为根的文件夹树的二进制快照，根节点的名称保存为其完整路径
+    :param file: 以二进制模式打开、可以seek的文件
+    """
+    startPosition = file.tell()
+    file.write(b'\0' * _headerStruct.size)  # 最后再写入文件头
+    recordsOffset = _headerStruct.size
+    names = bytearray()
+    nameDic = {}  # {文件夹名: (位置, 长度)}
+    nameNodesDic = {}  # {文件夹名: array(使用该名称的节点序号)}
+    childIndices = array('I')
+    buffer = []
+    nodeCount = 0
+    nodeQueue = deque([(rootNode, rootNode.pathDirName, _noParent, 0)])  # [(节点, 名称, 父节点序号, 深度)]
+    while nodeQueue:
+        curNode, dirName, parentIndex, depth = nodeQueue.popleft()
+        nameLocation = nameDic.get(dirName)
+        if nameLocation is None:
+            encodedName = dirName.encode('utf-8', 'surrogatepass')
+            nameLocation = (len(names), len(encodedName))
+            names += encodedName
+            nameDic[dirName] = nameLocation
+            nameNodesDic[dirName] = array('I')
+        nameNodesDic[dirName].append(nodeCount)
+        children = curNode.children
+        childStart = len(childIndices)
+        # 广度优先，子节点的序号为已加入队列的节点数之后的连续序号
+        firstChildIndex = nodeCount + len(nodeQueue) + 1
+        childIndices.extend(range(firstChildIndex, firstChildIndex + len(children)))
+        buffer.append(_recordStruct.pack(curNode.selfSize, curNode.allSize, curNode.dirCount, curNode.fileCount,
+                                         curNode.sizePercent, nameLocation[0], nameLocation[1], parentIndex, depth,
+                                         childStart, len(children), curNode.canVisit))
+        nodeQueue.extend((child, child.dirName, nodeCount, depth + 1) for child in children)
+        nodeCount += 1
+        if len(buffer) >= 4096:
+            file.write(b''.join(buffer))
+            buffer.clear()
+    file.write(b''.join(buffer))
+    childIndexOffset = recordsOffset + nodeCount * _recordStruct.size
+    if sys.byteorder != 'little':
+        childIndices.byteswap()
+    file.write(childIndices.tobytes())
+    stringsOffset = childIndexOffset + len(childIndices) * 4
+    file.write(names)
+    nameTableOffset = stringsOffset + len(names)
+    buffer.clear()
+    nodePosition = 0
+    for dirName, (nameStart, nameLength) in nameDic.items():
+        nameNodeCount = len(nameNodesDic[dirName])
+        buffer.append(_nameStruct.pack(nameStart, nameLength, nodePosition, nameNodeCount))
+        nodePosition += nameNodeCount
+        if len(buffer) >= 4096:
+            file.write(b''.join(buffer))
+            buffer.clear()
+    file.write(b''.join(buffer))
+    nameNodesOffset = nameTableOffset + len(nameDic) * _nameStruct.size
+    for nameNodes in nameNodesDic.values():
+        if sys.byteorder != 'little':
+            nameNodes.byteswap()
+        file.write(nameNodes.tobytes())
+    endPosition = file.tell()
+    file.seek(startPosition)
+    file.write(_headerStruct.pack(binarySnapshotMagic, binarySnapshotVersion, _recordStruct.size, nodeCount,
+                                  int(time.time()), recordsOffset, childIndexOffset, stringsOffset, nameTableOffset,
+                                  len(nameDic), nameNodesOffset))
+    file.seek(endPosition)
+
+
+class MappedDirTree:
+    """ 以mmap打开的二进制快照（只读），对外通过轻量的MappedDirNode视图访问
+    子节点顺序可以在内存中重新排列（用于排序），不写回文件
+    """
+
+    def __init__(self, fileName: str):
+        """ 打开快照，文件不是二进制快照时抛出ValueError """
+        self.__file = open(fileName, 'rb')
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self.__file.close()
+            raise ValueError('不是二进制快照文件')
+        try:
+            self.__readHeader()
+        except ValueError:
+            self.close()
+            raise
+        self.__childOrderDic = {}  # {节点序号: [重新排列后的子节点序号]}
+
+    def __readHeader(self):
+        """ 读取并检查文件头，版本1的快照没有名称表 """
+        if len(self.__map) < _magicStruct.size:
+            raise ValueError('不是二进制快照文件')
+        magic, version = _magicStruct.unpack_from(self.__map, 0)
+        if magic != binarySnapshotMagic:
+            raise ValueError('不是二进制快照文件')
+        headerStruct = _headerStructV1 if version == 1 else _headerStruct
+        if version not in (1, binarySnapshotVersion) or len(self.__map) < headerStruct.size:
+            raise ValueError(f'不支持的二进制快照版本: {version}')
+        fields = headerStruct.unpack_from(self.__map, 0)
+        _, _, recordSize, nodeCount, timestamp, recordsOffset, childIndexOffset, stringsOffset = fields[:8]
+        nameTableOffset, nameCount, nameNodesOffset = fields[8:] if version > 1 else (0, 0, 0)
+        if recordSize != _recordStruct.size:
+            raise ValueError(f'不支持的二进制快照版本: {version}')
+        if nodeCount == 0 or stringsOffset > len(self.__map) or \
+                childIndexOffset != recordsOffset + nodeCount * recordSize or \
+                nameNodesOffset != nameTableOffset + nameCount * _nameStruct.size or \
+                (nameCount and nameNodesOffset + nodeCount * 4 > len(self.__map)):
+            raise ValueError('二进制快照文件不完整')
+        self.nodeCount = nodeCount
+        self.timestamp = timestamp
+        self.__recordsOffset = recordsOffset
+        self.__childIndexOffset = childIndexOffset
+        self.__stringsOffset = stringsOffset
+        self.__nameTableOffset = nameTableOffset
+        self.__nameCount = nameCount
+        self.__nameNodesOffset = nameNodesOffset
+
+    def __len__(self):
+        return self.nodeCount
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def close(self):
+        """ 关闭文件，之后不能再访问节点 """
+        self.__map.close()
+        self.__file.close()
+
+    @property
+    def root(self):
+        """ 根节点视图 """
+        return MappedDirNode(self, 0)
+
+    @property
+    def rootPathDirName(self) -> str:
+        """ 根文件夹路径 """
+        return self.getName(0)
+
+    def node(self, index: int):
+        """ 获取节点视图 """
+        return MappedDirNode(self, index)
+
+    def readRecord(self, index: int) -> tuple:
+        """ 读取节点记录，字段顺序见_recordStruct """
+        return _recordStruct.unpack_from(self.__map, self.__recordsOffset + index * _recordStruct.size)
+
+    def getName(self, index: int) -> str:
+        """ 获取文件夹名（根节点为完整路径） """
+        record = self.readRecord(index)
+        start = self.__stringsOffset + record[5]
+        return self.__map[start:start + record[6]].decode('utf-8', 'surrogatepass')
+
+    def getParentIndex(self, index: int) -> int:
+        """ 获取父节点的序号，根节点为-1 """
+        parentIndex = self.readRecord(index)[7]
+        return -1 if parentIndex == _noParent else parentIndex
+
+    def getChildIndices(self, index: int) -> list:
+        """ 获取子节点的序号 """
+        childOrder = self.__childOrderDic.get(index)
+        if childOrder is not None:
+            return list(childOrder)
+        record = self.readRecord(index)
+        childCount = record[10]
+        if not childCount:
+            return []
+        return list(struct.unpack_from(f'<{childCount}I', self.__map, self.__childIndexOffset + record[9] * 4))
+
+    @property
+    def hasNameTable(self) -> bool:
+        """ 是否保存了名称表（版本1的快照没有） """
+        return self.__nameCount > 0
+
+    def iterNameTable(self):
+        """ 依次产生名称表中的(文件夹名, 首个节点在名称节点序号表中的位置, 节点数)，根节点的名称为完整路径 """
+        mappedFile = self.__map
+        stringsOffset = self.__stringsOffset
+        chunkSize = 65536 * _nameStruct.size  # 分块读取，不一次复制整个名称表
+        tableEnd = self.__nameTableOffset + self.__nameCount * _nameStruct.size
+        for chunkStart in range(self.__nameTableOffset, tableEnd, chunkSize):
+            chunk = mappedFile[chunkStart:min(chunkStart + chunkSize, tableEnd)]
+            for nameStart, nameLength, nodePosition, nodeCount in _nameStruct.iter_unpack(chunk):
+                start = stringsOffset + nameStart
+                yield mappedFile[start:start + nameLength].decode('utf-8', 'surrogatepass'), nodePosition, nodeCount
+
+    def readNameNodes(self, nodePosition: int, nodeCount: int) -> tuple:
+        """ 读取名称节点序号表中的一段，即使用某一名称的节点序号 """
+        return struct.unpack_from(f'<{nodeCount}I', self.__map, self.__nameNodesOffset + nodePosition * 4)
+
+    def setChildOrder(self, index: int, childIndices: list):
+        """ 在内存中重新排列子节点 """
+        self.__childOrderDic[index] = childIndices
+
+    def getPathDirName(self, index: int) -> str:
+        """ 获取文件夹路径 """
+        names = []
+        while index > 0:
+            names.append(self.getName(index))
+            index = self.getParentIndex(index)
+        names.append(self.getName(0).rstrip('/'))
+        names.reverse()
+        return '/'.join(names) or '/'
+
+
+def _recordProperty(fieldIndex: int, doc: str) -> property:
+    """ 生成读取节点记录某一字段的只读属性 """
+
+    def getter(self):
+        return self.tree.readRecord(self.index)[fieldIndex]
+
+    return property(getter, doc=doc)
+
+
+class MappedDirNode:
+    """ MappedDirTree中节点的轻量视图，读取接口与DirTreeNode一致，数据只读 """
+
+    __slots__ = ('tree', 'index')
+
+    files = None  # 快照不记录文件
+    breakdown = None  # 快照不记录分类统计
+
+    def __init__(self, tree: MappedDirTree, index: int):
+        """ 初始化 """
+        self.tree = tree
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, MappedDirNode) and self.index == other.index and self.tree is other.tree
+
+    def __hash__(self):
+        return self.index
+
+    selfSize = _recordProperty(0, '直属文件大小')
+    allSize = _recordProperty(1, '总大小')
+    dirCount = _recordProperty(2, '子孙文件夹数')
+    fileCount = _recordProperty(3, '子孙文件数')
+    sizePercent = _recordProperty(4, '占父文件夹的百分比')
+    depth = _recordProperty(8, '深度')
+
+    @property
+    def canVisit(self) -> bool:
+        """ 是否可访问 """
+        return bool(self.tree.readRecord(self.index)[11])
+
+    @property
+    def parent(self):
+        """ 父节点 """
+        parentIndex = self.tree.getParentIndex(self.index)
+        return MappedDirNode(self.tree, parentIndex) if parentIndex >= 0 else None
+
+    @property
+    def children(self) -> list:
+        """ 子节点（每次生成新的列表） """
+        return [MappedDirNode(self.tree, index) for index in self.tree.getChildIndices(self.index)]
+
+    @property
+    def dirName(self) -> str:
+        """ 文件夹名 """
+        return self.tree.getName(self.index)
+
+    @property
+    def pathDirName(self) -> str:
+        """ 文件夹路径 """
+        return self.tree.getPathDirName(self.index)
+
+    @property
+    def dirNamePinyin(self) -> tuple:
+        """ 文件夹名拼音，用于按名称排序 """
+        return getNameSortKey(self.dirName)
+
+    def sortChildren(self, key, reverse: bool):
+        """ 子节点排序 """
+        self.setChildrenOrder(sorted(self.children, key=key, reverse=reverse))
+
+    def setChildrenOrder(self, children):
+        """ 按给定顺序重新排列子节点 """
+        self.tree.setChildOrder(self.index, [child.index for child in children])
+
+    def preorderTraversal(self) -> list:
+        """ 前序遍历 """
+        result = []
+        indexStack = [self.index]
+        while indexStack:
+            curIndex = indexStack.pop()
+            result.append(MappedDirNode(self.tree, curIndex))
+            indexStack.extend(reversed(self.tree.getChildIndices(curIndex)))
+        return result
+
+    def postorderTraversal(self) -> list:
+        """ 后序遍历 """
+        result = []
+        indexStack = [self.index]
+        while indexStack:
+            curIndex = indexStack.pop()
+            result.append(MappedDirNode(self.tree, curIndex))
+            indexStack.extend(self.tree.getChildIndices(curIndex))
+        result.reverse()
+        return result
@@ -0,0 +1,266 @@
+"""
+命令行入口
+只依赖fileUtils，不导入tkinter（按名称排序遇到中日韩文字时才导入pypinyin），可在没有图形界面的服务器上运行
+"""
+
+import argparse
+import re
+import sys
+from fileUtils import ByteUnit, byteUnitCountDic, DirManager
+
+unitDic = {'B': ByteUnit.byte, 'KB': ByteUnit.kiloByte, 'MB': ByteUnit.megaByte, 'GB': ByteUnit.gigaByte}
+sortKeys = ('name', 'allSize', 'selfSize', 'dirCount', 'fileCount')
+pruneReasonDic = {'exclude': '排除规则', 'filesystem': '其他文件系统'}
+exportFormats = ('text', 'csv', 'ndjson', 'json')  # 与treeExport.exportFormats一致，避免启动时导入
+
+
+def createParser() -> argparse.ArgumentParser:
+    """ 创建命令行参数解析器 """
+    parser = argparse.ArgumentParser(prog='foldersize', description='统计文件夹大小')
+    subParsers = parser.add_subparsers(dest='command')
+    subParsers.required = True
+
+    scanParser = subParsers.add_parser('scan', help='扫描文件夹并输出统计结果')
+    scanParser.add_argument('path', help='要统计的文件夹路径')
+    scanParser.add_argument('--sort', choices=sortKeys, default='allSize', help='排序关键字（默认allSize）')
+    scanParser.add_argument('--ascending', action='store_true', help='升序排列（默认降序）')
+    scanParser.add_argument('--depth', type=int, default=1, help='输出的最大深度，根文件夹为0（默认1）')
+    scanParser.add_argument('--top', type=int, default=0, help='每个文件夹只输出排在前面的N个子文件夹（默认全部）')
+    scanParser.add_argument('--unit', choices=list(unitDic), default='MB', help='大小单位（默认MB）')
+    scanParser.add_argument('--largest', type=int, default=0, help='在统计表后输出最大的N个文件和文件夹')
+    scanParser.add_argument('--format', choices=exportFormats, dest='fileFormat',
+                            help='导出完整的文件夹（包括文件）信息，而不是输出统计表')
+    scanParser.add_argument('-o', '--output', help='输出文件路径（默认标准输出）')
+    scanParser.add_argument('--workers', type=int, default=1, help='并发读取文件夹的线程（进程）数（默认1）')
+    scanParser.add_argument('--processes', action='store_true', help='使用进程池代替线程池并发读取')
+    scanParser.add_argument('--cache', help='扫描缓存文件路径，重新扫描时只读取修改时间变化了的文件夹'
+                                            '（指定--largest或--breakdown时仍读取所有文件夹，只更新缓存）')
+    scanParser.add_argument('--compact', action='store_true', help='使用紧凑存储，适用于非常大的文件夹树')
+    scanParser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                            help='排除匹配的文件夹，不含"/"时匹配文件夹名（如.git），否则匹配完整路径，可多次指定')
+    scanParser.add_argument('--exclude-regex', action='append', default=[], dest='excludeRegex', metavar='REGEX',
+                            help='排除完整路径匹配该正则表达式的文件夹，可多次指定')
+    scanParser.add_argument('--max-depth', type=int, dest='maxDepth',
+                            help='最大展开深度，更深的文件夹只计入大小和数量（默认不限制）')
+    scanParser.add_argument('--one-file-system', action='store_true', dest='oneFileSystem',
+                            help='不统计位于其他文件系统（挂载点）的文件夹')
+    scanParser.add_argument('--breakdown', type=int, default=0, metavar='N',
+                            help='在统计表后输出根文件夹中占用空间最多的N种扩展名和各修改时间段的文件大小')
+    scanParser.add_argument('--pruned', action='store_true', help='在统计表后输出被排除的文件夹')
+    scanParser.add_argument('--snapshot', help='同时保存快照到该文件，用于diff命令')
+    scanParser.add_argument('--binary-snapshot', dest='binarySnapshot',
+                            help='同时保存二进制快照到该文件，可在图形界面中直接载入而不必扫描')
+    scanParser.add_argument('--stats', action='store_true', help='结束时在标准错误输出各阶段耗时、计数和最慢的文件夹')
+    scanParser.add_argument('--progress', action='store_true', help='扫描中在标准错误输出进度')
+
+    streamParser = subParsers.add_parser('stream', help='流式扫描，每读取完或统计完一个文件夹即输出一行JSON')
+    streamParser.add_argument('path', help='要统计的文件夹路径')
+    streamParser.add_argument('--completed-only', action='store_true', dest='completedOnly',
+                              help='只输出子树统计完毕的文件夹（包含子文件夹的最终大小）')
+    streamParser.add_argument('--exclude', action='append', default=[], metavar='GLOB', help='同scan')
+    streamParser.add_argument('--exclude-regex', action='append', default=[], dest='excludeRegex', metavar='REGEX',
+                              help='同scan')
+    streamParser.add_argument('--max-depth', type=int, dest='maxDepth', help='同scan')
+    streamParser.add_argument('--one-file-system', action='store_true', dest='oneFileSystem', help='同scan')
+    streamParser.add_argument('-o', '--output', help='输出文件路径（默认标准输出）')
+
+    diffParser = subParsers.add_parser('diff', help='对比两个快照，列出发生变化的文件夹')
+    diffParser.add_argument('old', help='旧快照文件')
+    diffParser.add_argument('new', help='新快照文件')
+    diffParser.add_argument('--limit', type=int, default=0, help='只输出变化最大的N个文件夹（默认全部）')
+    diffParser.add_argument('--allow-other-root', action='store_true', dest='allowOtherRoot',
+                            help='允许对比根文件夹不同的快照（如移动过的文件夹），按相对路径比较')
+    diffParser.add_argument('--unit', choices=list(unitDic), default='MB', help='大小单位（默认MB）')
+    diffParser.add_argument('--csv', action='store_true', help='以CSV格式输出')
+    diffParser.add_argument('-o', '--output', help='输出文件路径（默认标准输出）')
+    return parser
+
+
+def formatNode(node, unitRate: int, sizeFormat: str, indent: str) -> str:
+    """ 获取节点在统计表中的一行 """
+    dirName = node.dirName if node.canVisit else f'{node.dirName} [无法访问]'
+    return (f'{node.allSize / unitRate:>16.{sizeFormat}} {node.sizePercent:>8.3f}% {node.dirCount:>10} '
+            f'{node.fileCount:>10}  {indent}{dirName}\n')
+
+
+def writeTable(dirManager: DirManager, file, maxDepth: int, top: int, unit: ByteUnit):
+    """ 输出统计表，只排序实际输出的文件夹的子文件夹 """
+    unitRate = byteUnitCountDic[unit]
+    sizeFormat = '0f' if unit == ByteUnit.byte else '3f'
+    unitName = [name for name, value in unitDic.items() if value == unit][0]
+    file.write(f'{"大小(" + unitName + ")":>14} {"百分比":>6} {"文件夹数":>6} {"文件数":>7}  路径\n')
+    rootNode = dirManager.dirTree
+    nodeStack = [rootNode]
+    while nodeStack:
+        curNode = nodeStack.pop()
+        depth = curNode.depth - rootNode.depth
+        file.write(formatNode(curNode, unitRate, sizeFormat, '    ' * depth))
+        if depth < maxDepth:
+            dirManager.ensureSorted(curNode)
+            children = curNode.children
+            nodeStack.extend(reversed(children[:top] if top > 0 else children))
+
+
+def writeRanking(ranking, file, unit: ByteUnit):
+    """ 输出扫描中统计的最大的文件和文件夹 """
+    unitRate = byteUnitCountDic[unit]
+    sizeFormat = '0f' if unit == ByteUnit.byte else '3f'
+    for title, topItems in (('最大的文件', ranking.largestFiles),
+                            ('最大的文件夹（包含子文件夹）', ranking.largestDirsByAllSize),
+                            ('最大的文件夹（不包含子文件夹）', ranking.largestDirsBySelfSize)):
+        file.write(f'\n{title}:\n')
+        for size, pathName in topItems.items():
+            file.write(f'{size / unitRate:>16.{sizeFormat}}  {pathName}\n')
+
+
+def writeBreakdown(node, file, count: int, unit: ByteUnit):
+    """ 输出节点按扩展名和修改时间分类的文件大小 """
+    unitRate = byteUnitCountDic[unit]
+    sizeFormat = '0f' if unit == ByteUnit.byte else '3f'
+    breakdown = node.breakdown
+    for title, rows in ((f'占用空间最多的{count}种扩展名', breakdown.largestExtensions(count)),
+                        ('按修改时间', breakdown.ages())):
+        file.write(f'\n{title}:\n')
+        for name, size, fileCount in rows:
+            percent = size / node.allSize * 100 if node.allSize else 0
+            file.write(f'{size / unitRate:>16.{sizeFormat}} {percent:>8.3f}% {fileCount:>10}  {name or "（无扩展名）"}\n')
+
+
+def writePruned(prunedDirs: list, file):
+    """ 输出被排除而未读取的文件夹 """
+    file.write(f'\n被排除的文件夹（{len(prunedDirs)}）:\n')
+    for pathDirName, reason in prunedDirs:
+        file.write(f'{pruneReasonDic[reason]:<8}{pathDirName}\n')
+
+
+def runScan(args) -> int:
+    """ 执行scan命令
+    :returns: 进程退出码
+    """
+    for pattern in args.excludeRegex:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            sys.stderr.write(f'正则表达式有误: {pattern} ({e})\n')
+            return 2
+    stats = None
+    if args.stats or args.progress:
+        from fileUtils import ScanStats
+        stats = ScanStats(onProgress=writeProgress if args.progress else None)
+    dirManager = DirManager(args.path, workers=args.workers, useProcess=args.processes, cacheFile=args.cache,
+                            compact=args.compact, recordFiles=args.fileFormat is not None, topCount=args.largest,
+                            stats=stats, excludeGlobs=args.exclude, excludeRegexes=args.excludeRegex,
+                            maxDepth=args.maxDepth, oneFileSystem=args.oneFileSystem, breakdown=args.breakdown > 0,
+                            breakdownDepth=0)
+    if dirManager.dirTree is None:
+        sys.stderr.write(f'无法读取文件夹: {args.path} ({dirManager.scanError!r})\n')
+        return 1
+    if args.snapshot:
+        with open(args.snapshot, mode='w', encoding='utf-8') as file:
+            dirManager.saveSnapshot(file)
+    if args.binarySnapshot:
+        with open(args.binarySnapshot, mode='wb') as file:
+            dirManager.saveBinarySnapshot(file)
+
+    # 每次调用sort切换排序方向，第一次为升序；不传入节点时只记录排序方式，输出时再逐个排序
+    dirManager.sort(args.sort, [])
+    if not args.ascending:
+        dirManager.sort(args.sort, [])
+
+    file = open(args.output, mode='w', encoding='utf-8', newline='' if args.fileFormat == 'csv' else None) \
+        if args.output else sys.stdout
+    try:
+        if args.fileFormat is None:
+            writeTable(dirManager, file, args.depth, args.top, unitDic[args.unit])
+            if dirManager.ranking is not None:
+                writeRanking(dirManager.ranking, file, unitDic[args.unit])
+            if args.breakdown > 0:
+                writeBreakdown(dirManager.dirTree, file, args.breakdown, unitDic[args.unit])
+            if args.pruned:
+                writePruned(dirManager.prunedDirs, file)
+        else:
+            for node in dirManager.dirTree.preorderTraversal():
+                dirManager.ensureSorted(node)
+            dirManager.export(file, args.fileFormat)
+    finally:
+        if file is not sys.stdout:
+            file.close()
+    if args.stats:
+        sys.stderr.write(stats.report() + '\n')
+    return 0
+
+
+def writeProgress(stats):
+    """ 在标准错误输出扫描进度 """
+    sys.stderr.write(f'已扫描 {stats.dirCount} 个文件夹，{stats.fileCount} 个文件，{stats.size:,} 字节，'
+                     f'{stats.errorCount} 个错误\n')
+
+
+def runStream(args) -> int:
+    """ 执行stream命令，逐行输出JSON，不在内存中建立文件夹树
+    :returns: 进程退出码
+    """
+    import json
+    from scanStream import iterScan
+    events = iterScan(args.path, args.exclude, args.excludeRegex, args.maxDepth, args.oneFileSystem)
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    file = open(args.output, mode='w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for event in events:
+            if not args.completedOnly or event.kind == 'completed':
+                file.write(dumps(event._asdict()))
+                file.write('\n')
+    except (OSError, re.error) as e:
+        sys.stderr.write(f'无法扫描文件夹: {args.path} ({e!r})\n')
+        return 1
+    finally:
+        if file is not sys.stdout:
+            file.close()
+    return 0
+
+
+def runDiff(args) -> int:
+    """ 执行diff命令
+    :returns: 进程退出码
+    """
+    from snapshot import diffSnapshotFiles, writeDiffCsv
+    try:
+        changes = diffSnapshotFiles(args.old, args.new, args.limit, args.allowOtherRoot)
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f'无法读取快照: {e}\n')
+        return 1
+
+    file = open(args.output, mode='w', encoding='utf-8', newline='' if args.csv else None) \
+        if args.output else sys.stdout
+    try:
+        if args.csv:
+            writeDiffCsv(changes, file)
+        else:
+            unitRate = byteUnitCountDic[unitDic[args.unit]]
+            sizeFormat = '0f' if args.unit == 'B' else '3f'
+            for change in changes:
+                file.write(f'{change.status:<8}{change.sizeDelta / unitRate:>+16.{sizeFormat}} '
+                           f'{change.fileDelta:>+10}  {change.path or "."}\n')
+    finally:
+        if file is not sys.stdout:
+            file.close()
+    return 0
+
+
+def main(argv=None) -> int:
+    """ 命令行入口
+    :param argv: 命令行参数，为None时使用sys.argv
+    :returns: 进程退出码
+    """
+    args = createParser().parse_args(argv)
+    if args.command == 'scan':
+        return runScan(args)
+    if args.command == 'stream':
+        return runStream(args)
+    if args.command == 'diff':
+        return runDiff(args)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
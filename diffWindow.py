@@ -0,0 +1,112 @@
+"""
+快照对比结果窗口
+"""
+
+import tkinter as tk
+from tkinter import ttk
+from tkinter import filedialog
+from fileUtils import ByteUnit, byteUnitCountDic
+from snapshot import writeDiffCsv
+
+
+class DiffWindow(tk.Toplevel):
+    """ 以树状显示发生变化的文件夹，同级按大小变化的绝对值降序排列，展开时才插入子项 """
+
+    __title = '快照对比'
+    __initWidth = 1100
+    __initHeight = 700
+    __statusTextDic = {'added': '新增', 'removed': '删除', 'grown': '增大', 'shrunk': '减小', 'changed': '文件数变化'}
+
+    def __init__(self, master, changes: list, rootPathDirName: str, unit: ByteUnit, onLocate):
+        """ 初始化
+        :param changes: 按大小变化的绝对值降序排列的[snapshot.DirChange]
+        :param rootPathDirName: 对比的根文件夹路径
+        :param onLocate: 双击某项时以文件夹路径为参数调用
+        """
+        super().__init__(master)
+        self.title(f'{DiffWindow.__title} - {rootPathDirName}')
+        self.geometry(f'{DiffWindow.__initWidth}x{DiffWindow.__initHeight}')
+        self.__changes = changes
+        self.__rootPathDirName = rootPathDirName.rstrip('/')
+        self.__onLocate = onLocate
+        self.__unitRate = byteUnitCountDic[unit]
+        self.__sizeFormat = '0f' if unit == ByteUnit.byte else '3f'
+        self.__itemChangeDic = {}  # {项: 变化}
+        self.__placeholderDic = {}  # {尚未插入子项的项: 占位项}
+
+        # 按父路径分组，变化最大的在前
+        self.__childrenDic = {}  # {父路径: [变化]}，顶层的父路径为None
+        changedPaths = {change.path for change in changes}
+        for change in changes:
+            self.__childrenDic.setdefault(self.__getParentPath(change.path, changedPaths), []).append(change)
+
+        topFrame = tk.Frame(self, bg='white')
+        topFrame.pack(side=tk.TOP, fill=tk.X)
+        tk.Button(topFrame, command=self.__clickExportButton, relief='flat', text='导出', bg='white').pack(side=tk.LEFT)
+        tk.Label(topFrame, text=f'共 {len(changes)} 个文件夹发生变化', bg='white').pack(side=tk.LEFT)
+
+        scrollbar = tk.Scrollbar(self)
+        scrollbar.pack(fill=tk.Y, side=tk.RIGHT)
+        self.__treeView = ttk.Treeview(self, yscrollcommand=scrollbar.set, columns=(None,) * 5)
+        self.__treeView.heading('#0', text='路径')
+        self.__treeView.heading('#1', text='变化')
+        self.__treeView.heading('#2', text='原大小')
+        self.__treeView.heading('#3', text='现大小')
+        self.__treeView.heading('#4', text='大小变化')
+        self.__treeView.heading('#5', text='文件数变化')
+        self.__treeView.column('#0', width=450)
+        for column in ('#1', '#2', '#3', '#4', '#5'):
+            self.__treeView.column(column, width=120, anchor=tk.E)
+        self.__treeView.pack(fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.__treeView.yview)
+        self.__treeView.bind('<<TreeviewOpen>>', self.__onTreeviewOpen)
+        self.__treeView.bind('<Double-1>', self.__onDoubleClick)
+        self.__insertChildItems('', None)
+
+    @staticmethod
+    def __getParentPath(path: str, changedPaths: set):
+        """ 获取最近的发生变化的祖先文件夹路径，没有时返回None """
+        while path:
+            path = path.rpartition('/')[0]
+            if path in changedPaths:
+                return path
+        return None
+
+    def __insertChildItems(self, parentItem: str, parentPath):
+        """ 插入一个路径下的变化 """
+        for change in self.__childrenDic.get(parentPath, ()):
+            if parentPath is None:
+                text = f'{self.__rootPathDirName}/{change.path}'.rstrip('/') or '/'
+            else:
+                text = change.path.rpartition('/')[2]
+            item = self.__treeView.insert(parentItem, 'end', text=text, values=(
+                DiffWindow.__statusTextDic[change.status],
+                f'{change.oldSize / self.__unitRate: .{self.__sizeFormat}}',
+                f'{change.newSize / self.__unitRate: .{self.__sizeFormat}}',
+                f'{change.sizeDelta / self.__unitRate:+.{self.__sizeFormat}}',
+                f'{change.fileDelta:+}'))
+            self.__itemChangeDic[item] = change
+            if change.path in self.__childrenDic:
+                self.__placeholderDic[item] = self.__treeView.insert(item, 'end')
+
+    def __onTreeviewOpen(self, _):
+        """ 展开项时插入子项 """
+        item = self.__treeView.focus()
+        placeholder = self.__placeholderDic.pop(item, None)
+        if placeholder is not None:
+            self.__treeView.delete(placeholder)
+            self.__insertChildItems(item, self.__itemChangeDic[item].path)
+
+    def __onDoubleClick(self, _):
+        """ 双击定位到主窗口中的文件夹 """
+        change = self.__itemChangeDic.get(self.__treeView.focus())
+        if change is not None and change.status != 'removed':
+            pathDirName = f'{self.__rootPathDirName}/{change.path}' if change.path else self.__rootPathDirName
+            self.__onLocate(pathDirName or '/')
+
+    def __clickExportButton(self):
+        """ 点击导出 """
+        fileName = filedialog.asksaveasfilename(parent=self, defaultextension='.csv', filetypes=[('csv files', '.csv')])
+        if fileName:
+            with open(fileName, mode='w', encoding='utf-8', newline='') as file:
+                writeDiffCsv(self.__changes, file)
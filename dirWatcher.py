@@ -0,0 +1,283 @@
+"""
+文件夹变化监视
+Linux下使用inotify，其余系统或inotify不可用时退化为定时检查文件夹修改时间
+监视线程先遍历并开始监视所有文件夹（准备阶段），之后只负责收集并合并变化的文件夹路径，文件夹树的更新由回调方自行完成
+"""
+
+import abc
+import os
+import sys
+import select
+import struct
+import threading
+import time
+from fileUtils import defaultListOptions, getPruneReason, ListOptions
+
+
+class DirWatcher(abc.ABC):
+    """ 文件夹变化监视器基类，子类实现开始监视单个文件夹的_watchDir和监视线程_run
+    准备阶段的进度和结果记录在watchedCount、ready、setupError中，供其他线程查询
+    """
+
+    def __init__(self, rootDirName: str, callback, delay: float, pruneOptions: ListOptions = defaultListOptions):
+        """ 初始化
+        :param rootDirName: 要监视的根文件夹路径，在监视线程中遍历其所有子孙文件夹并逐个监视（inotify不支持递归监视）
+        :param callback: 在监视线程中调用，参数为合并后发生变化的文件夹路径列表
+        :param delay: 合并变化事件的时间窗口（秒）
+        :param pruneOptions: 排除规则和文件系统限制（ListOptions的excludes、rootDevice），被排除的文件夹不监视
+        """
+        self._rootDirName = rootDirName
+        self._pruneOptions = pruneOptions
+        self._callback = callback
+        self._delay = delay
+        self._stopEvent = threading.Event()
+        self._changedDirs = set()
+        self._firstChangeTime = 0
+        self.watchedCount = 0  # 准备阶段已开始监视的文件夹数
+        self.ready = False  # 准备阶段是否已完成
+        self.setupError = None  # 准备阶段失败时的异常，此时监视线程已结束
+        self.fallbackReason = None  # 不为None时表示准备阶段中途改用了轮询方式，为改用的原因
+        self.__thread = threading.Thread(target=self.__threadMain, daemon=True)
+
+    def start(self):
+        """ 开始监视 """
+        self.__thread.start()
+
+    def stop(self):
+        """ 停止监视 """
+        self._stopEvent.set()
+        if self.__thread.is_alive() and self.__thread is not threading.current_thread():
+            self.__thread.join()
+
+    def __threadMain(self):
+        """ 监视线程：遍历并开始监视所有文件夹，然后监视变化 """
+        try:
+            for pathDirName in iterDirs(self._rootDirName, self._pruneOptions, pruneRoot=False):
+                if self._stopEvent.is_set():
+                    break
+                self._watchDir(pathDirName)
+                self.watchedCount += 1
+            else:
+                self.ready = True
+        except OSError as e:
+            self.setupError = e
+            self._stopEvent.set()
+        self._run()
+
+    @abc.abstractmethod
+    def _watchDir(self, pathDirName: str):
+        """ 在准备阶段开始监视一个文件夹，无法继续监视时抛出OSError """
+
+    @abc.abstractmethod
+    def _run(self):
+        """ 准备阶段后的监视线程，直到_stopEvent被设置（设置后须立即返回并释放资源），
+        发现的变化以_addChange记录并定期调用_flushChanges
+        """
+
+    def _addChange(self, pathDirName: str):
+        """ 记录一个变化的文件夹 """
+        if not self._changedDirs:
+            self._firstChangeTime = time.monotonic()
+        self._changedDirs.add(pathDirName)
+
+    def _flushChanges(self, force: bool = False):
+        """ 时间窗口已过时将合并后的变化交给回调 """
+        if self._changedDirs and (force or time.monotonic() - self._firstChangeTime >= self._delay):
+            changedDirs = sorted(self._changedDirs)
+            self._changedDirs.clear()
+            self._callback(changedDirs)
+
+
+def iterDirs(pathDirName: str, pruneOptions: ListOptions = defaultListOptions, pruneRoot: bool = True):
+    """ 逐个产生一个文件夹及其所有子孙文件夹的路径，跳过按pruneOptions不读取的文件夹及其子孙文件夹
+    :param pruneRoot: 是否也按pruneOptions检查pathDirName本身（扫描的根文件夹总是读取）
+    """
+    if pruneRoot and getPruneReason(os.path.basename(pathDirName), pathDirName, pruneOptions) is not None:
+        return
+    dirStack = [pathDirName]
+    while dirStack:
+        curDir = dirStack.pop()
+        yield curDir
+        try:
+            with os.scandir(curDir) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        subPathDirName = entry.path.replace('\\', '/')
+                        if getPruneReason(entry.name, subPathDirName, pruneOptions, entry) is None:
+                            dirStack.append(subPathDirName)
+        except OSError:
+            pass
+
+
+def walkDirs(pathDirName: str, pruneOptions: ListOptions = defaultListOptions) -> list:
+    """ 获取一个文件夹及其所有子孙文件夹的路径，跳过按pruneOptions不读取的文件夹（包括pathDirName本身）及其子孙文件夹 """
+    return list(iterDirs(pathDirName, pruneOptions))
+
+
+class InotifyWatcher(DirWatcher):
+    """ 基于inotify的文件夹变化监视器 """
+
+    __IN_MODIFY = 0x00000002
+    __IN_ATTRIB = 0x00000004
+    __IN_MOVED_FROM = 0x00000040
+    __IN_MOVED_TO = 0x00000080
+    __IN_CREATE = 0x00000100
+    __IN_DELETE = 0x00000200
+    __IN_Q_OVERFLOW = 0x00004000
+    __IN_IGNORED = 0x00008000
+    __IN_ISDIR = 0x40000000
+    __watchMask = __IN_MODIFY | __IN_ATTRIB | __IN_MOVED_FROM | __IN_MOVED_TO | __IN_CREATE | __IN_DELETE
+    __eventHeader = struct.Struct('iIII')
+
+    def __init__(self, rootDirName: str, callback, delay: float, pollInterval: float,
+                 pruneOptions: ListOptions = defaultListOptions):
+        """ 初始化，inotify不可用时抛出OSError
+        :param pollInterval: 准备阶段监视数超过系统上限时改用轮询方式，轮询的检查间隔（秒）
+        """
+        super().__init__(rootDirName, callback, delay, pruneOptions)
+        import ctypes
+        import ctypes.util
+        self.__libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.__fd = self.__libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.__pollInterval = pollInterval
+        self.__wdPathDic = {}
+        self.__poller = None  # 改用轮询方式后的监视器，与本监视器共用停止事件和回调
+
+    def _watchDir(self, pathDirName: str):
+        """ 开始监视一个文件夹，监视数超过系统上限时关闭inotify，已监视的和其余文件夹改用轮询方式 """
+        if self.__poller is None:
+            try:
+                self.__addWatch(pathDirName)
+                return
+            except OSError as e:
+                os.close(self.__fd)
+                self.fallbackReason = e.strerror
+                self.__poller = PollingWatcher(self._rootDirName, self._callback, self._delay, self.__pollInterval,
+                                               self._pruneOptions)
+                self.__poller._stopEvent = self._stopEvent
+                for watchedDirName in self.__wdPathDic.values():
+                    self.__poller._watchDir(watchedDirName)
+                self.__wdPathDic.clear()
+        self.__poller._watchDir(pathDirName)
+
+    def __addWatch(self, pathDirName: str):
+        """ 监视一个文件夹，监视数超过系统上限时抛出OSError """
+        import ctypes
+        wd = self.__libc.inotify_add_watch(self.__fd, os.fsencode(pathDirName), InotifyWatcher.__watchMask)
+        if wd >= 0:
+            self.__wdPathDic[wd] = pathDirName
+        elif ctypes.get_errno() == 28:  # ENOSPC
+            raise OSError(28, 'inotify watch limit reached')
+
+    def _run(self):
+        """ 监视线程 """
+        if self.__poller is not None:
+            self.__poller._run()
+            return
+        try:
+            while not self._stopEvent.is_set():
+                readable, _, _ = select.select([self.__fd], [], [], min(self._delay, 0.5))
+                if readable:
+                    self.__readEvents()
+                self._flushChanges()
+        finally:
+            os.close(self.__fd)
+
+    def __readEvents(self):
+        """ 读取并解析inotify事件 """
+        try:
+            data = os.read(self.__fd, 65536)
+        except BlockingIOError:
+            return
+        headerSize = InotifyWatcher.__eventHeader.size
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, nameLen = InotifyWatcher.__eventHeader.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + headerSize:offset + headerSize + nameLen].rstrip(b'\0'))
+            offset += headerSize + nameLen
+            if mask & InotifyWatcher.__IN_Q_OVERFLOW:
+                # 事件队列溢出，无法得知哪些文件夹发生变化
+                for pathDirName in self.__wdPathDic.values():
+                    self._addChange(pathDirName)
+                continue
+            pathDirName = self.__wdPathDic.get(wd)
+            if mask & InotifyWatcher.__IN_IGNORED:
+                self.__wdPathDic.pop(wd, None)
+                continue
+            if pathDirName is None:
+                continue
+            self._addChange(pathDirName)
+            if mask & InotifyWatcher.__IN_ISDIR and mask & (InotifyWatcher.__IN_CREATE | InotifyWatcher.__IN_MOVED_TO):
+                # 新出现的子文件夹由父文件夹的更新负责扫描，这里只需开始监视
+                newPathDirName = os.path.join(pathDirName, name).replace('\\', '/')
+                for subPathDirName in walkDirs(newPathDirName, self._pruneOptions):
+                    try:
+                        self.__addWatch(subPathDirName)
+                    except OSError:
+                        pass
+
+
+class PollingWatcher(DirWatcher):
+    """ 定时检查文件夹修改时间的变化监视器
+    文件夹的修改时间只在其直属文件（夹）增删改名时变化，修改文件内容不会被发现
+    """
+
+    def __init__(self, rootDirName: str, callback, delay: float, pollInterval: float,
+                 pruneOptions: ListOptions = defaultListOptions):
+        """ 初始化
+        :param pollInterval: 检查间隔（秒）
+        """
+        super().__init__(rootDirName, callback, delay, pruneOptions)
+        self.__pollInterval = pollInterval
+        self.__mtimeDic = {}
+
+    def _watchDir(self, pathDirName: str):
+        """ 开始检查一个文件夹的修改时间 """
+        self.__recordMtime(pathDirName)
+
+    def __recordMtime(self, pathDirName: str) -> bool:
+        """ 记录文件夹修改时间
+        :returns: 修改时间是否变化
+        """
+        try:
+            mtime = os.stat(pathDirName).st_mtime_ns
+        except OSError:
+            self.__mtimeDic.pop(pathDirName, None)
+            return False
+        if self.__mtimeDic.get(pathDirName) == mtime:
+            return False
+        self.__mtimeDic[pathDirName] = mtime
+        return True
+
+    def _run(self):
+        """ 监视线程 """
+        while not self._stopEvent.wait(self.__pollInterval):
+            for pathDirName in list(self.__mtimeDic):
+                if pathDirName in self.__mtimeDic and self.__recordMtime(pathDirName):
+                    self._addChange(pathDirName)
+                    # 开始检查新出现的子文件夹
+                    try:
+                        with os.scandir(pathDirName) as entries:
+                            subPathDirNames = [entry.path.replace('\\', '/') for entry in entries if entry.is_dir()]
+                    except OSError:
+                        subPathDirNames = []
+                    for subPathDirName in subPathDirNames:
+                        if subPathDirName not in self.__mtimeDic:
+                            for newPathDirName in walkDirs(subPathDirName, self._pruneOptions):
+                                self.__recordMtime(newPathDirName)
+            self._flushChanges(force=True)
+
+
+def createDirWatcher(rootDirName: str, callback, delay: float = 1.0, pollInterval: float = 5.0,
+                     usePolling: bool = False, pruneOptions: ListOptions = defaultListOptions) -> DirWatcher:
+    """ 创建文件夹变化监视器，优先使用inotify
+    :param pruneOptions: 排除规则和文件系统限制，应与扫描时一致，被排除的文件夹不监视
+    """
+    if not usePolling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(rootDirName, callback, delay, pollInterval, pruneOptions)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(rootDirName, callback, delay, pollInterval, pruneOptions)
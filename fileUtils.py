@@ -2,11 +2,16 @@
 文件、文件夹相关功能
 """
 
+from array import array
+import bisect
+from collections import namedtuple
 from enum import Enum
+import fnmatch
+import functools
+import heapq
 import re
-import queue
 import os
-import pypinyin
+import time
 
 
 class ByteUnit(Enum):
@@ -19,6 +24,23 @@ class ByteUnit(Enum):
 
 byteUnitCountDic = {ByteUnit.byte: 1, ByteUnit.kiloByte: 1024, ByteUnit.megaByte: 1024**2, ByteUnit.gigaByte: 1024**3}
 
+cjkPattern = re.compile('[\u2e80-\u9fff\uf900-\ufaff\U00020000-\U0003134f]')  # 中日韩文字
+
+ageBucketDays = (1, 7, 30, 90, 365, 3 * 365)  # 按修改时间分类的各时间段上限（天）
+ageBucketNames = ('1天内', '7天内', '30天内', '90天内', '1年内', '3年内', '3年以上')
+
+
+@functools.lru_cache(maxsize=65536)
+def getNameSortKey(dirName: str) -> tuple:
+    """ 获取按名称排序时使用的关键字（拼音），同名文件夹只计算一次
+    不含中日韩文字的名称不调用pypinyin，结果与pypinyin一致
+    """
+    lowerName = dirName.lower()
+    if cjkPattern.search(lowerName) is None:
+        return ('0' + lowerName,)
+    import pypinyin
+    return tuple(pypinyin.lazy_pinyin(lowerName, errors=lambda item: '0'+item))
+
 
 class DirTreeNode:
     """ 文件夹树节点 """
@@ -31,19 +53,51 @@ class DirTreeNode:
 
         self.pathDirName = pathDirName
         self.dirName = dirName
-        self.dirNamePinyin = pypinyin.lazy_pinyin(self.dirName.lower(), errors=lambda item: '0'+item)
         self.selfSize = 0
         self.allSize = 0
         self.sizePercent = 0
         self.dirCount = 0
         self.fileCount = 0
         self.canVisit = True
+        self.files = None  # 直属文件记录（FileRecords），仅在扫描时要求记录文件时存在
+        self.breakdown = None  # 子树中文件的分类统计（SizeBreakdown），仅在扫描时要求分类统计时存在
+
+    @property
+    def dirNamePinyin(self) -> tuple:
+        """ 文件夹名拼音，用于按名称排序 """
+        return getNameSortKey(self.dirName)
 
     def appendChild(self, node):
-        """ 添加子节点 """
+        """ 添加子节点
+        :returns: 添加到树中的节点
+        """
         self.children.append(node)
         node.parent = self
         node.depth = self.depth + 1
+        return node
+
+    def replaceChild(self, oldNode, newNode):
+        """ 用新节点替换子节点
+        :returns: 添加到树中的节点
+        """
+        self.children[self.children.index(oldNode)] = newNode
+        newNode.parent = self
+        newNode.depth = self.depth + 1
+        oldNode.parent = None
+        return newNode
+
+    def removeChild(self, node):
+        """ 移除子节点 """
+        self.children.remove(node)
+        node.parent = None
+
+    def sortChildren(self, key, reverse: bool):
+        """ 子节点排序 """
+        self.children.sort(key=key, reverse=reverse)
+
+    def setChildrenOrder(self, children):
+        """ 按给定顺序重新排列子节点 """
+        self.children[:] = children
 
     def preorderTraversal(self) -> list:
         """ 前序遍历 """
@@ -67,123 +121,1555 @@ class DirTreeNode:
         return result
 
 
+class CompactDirTree:
+    """ 紧凑的文件夹树存储
+    节点数据按列保存在并行数组中，以父节点、首个子节点、下一个兄弟节点的序号表示树结构，
+    文件夹名去重后存放在同一块缓冲区中，对外通过轻量的CompactDirNode视图访问
+    替换或移除子树后原记录不会回收
+    """
+
+    def __init__(self, rootPathDirName: str):
+        """ 初始化
+        :param rootPathDirName: 根节点的路径，其余节点的路径由文件夹名拼接得到
+        """
+        self.rootPathDirName = rootPathDirName
+        self.rootIndex = -1
+        self.parents = array('q')
+        self.firstChildren = array('q')
+        self.nextSiblings = array('q')
+        self.depths = array('i')
+        self.selfSizes = array('q')
+        self.allSizes = array('q')
+        self.sizePercents = array('d')
+        self.dirCounts = array('q')
+        self.fileCounts = array('q')
+        self.canVisits = bytearray()
+        self.nameStarts = array('q')
+        self.nameEnds = array('q')
+        self.fileRecords = {}  # {节点序号: 直属文件记录}，只保存有文件记录的节点
+        self.breakdowns = {}  # {节点序号: 分类统计}，只保存有分类统计的节点
+        self.__names = bytearray()
+        self.__nameDic = {}  # {文件夹名: (起始位置, 结束位置)}
+
+    def __len__(self):
+        return len(self.parents)
+
+    @property
+    def root(self):
+        """ 根节点视图 """
+        return CompactDirNode(self, self.rootIndex)
+
+    def node(self, index: int):
+        """ 获取节点视图 """
+        return CompactDirNode(self, index)
+
+    def addNode(self, node: DirTreeNode, childIndices) -> int:
+        """ 添加一个节点的记录，其子节点须已添加
+        :param childIndices: 子节点的序号（按顺序）
+        :returns: 新节点的序号
+        """
+        index = len(self.parents)
+        start, end = self.__internName(node.dirName)
+        self.parents.append(-1)
+        self.depths.append(node.depth)
+        self.selfSizes.append(node.selfSize)
+        self.allSizes.append(node.allSize)
+        self.sizePercents.append(node.sizePercent)
+        self.dirCounts.append(node.dirCount)
+        self.fileCounts.append(node.fileCount)
+        self.canVisits.append(node.canVisit)
+        self.nameStarts.append(start)
+        self.nameEnds.append(end)
+        self.firstChildren.append(-1)
+        self.nextSiblings.append(-1)
+        if node.files is not None:
+            self.fileRecords[index] = node.files
+        if node.breakdown is not None:
+            self.breakdowns[index] = node.breakdown
+        self.linkChildren(index, childIndices)
+        return index
+
+    def importTree(self, rootNode: DirTreeNode) -> int:
+        """ 添加以DirTreeNode为根的整个子树
+        :returns: 子树根节点的序号
+        """
+        indexDic = {}
+        for curNode in rootNode.postorderTraversal():
+            indexDic[curNode] = self.addNode(curNode, [indexDic.pop(child) for child in curNode.children])
+        return indexDic[rootNode]
+
+    def releaseInternTable(self):
+        """ 释放文件夹名去重表，之后添加的文件夹名不再去重 """
+        self.__nameDic = None
+
+    def linkChildren(self, index: int, childIndices):
+        """ 按顺序重新设置节点的子节点 """
+        prevIndex = -1
+        for childIndex in childIndices:
+            self.parents[childIndex] = index
+            if prevIndex < 0:
+                self.firstChildren[index] = childIndex
+            else:
+                self.nextSiblings[prevIndex] = childIndex
+            prevIndex = childIndex
+        if prevIndex < 0:
+            self.firstChildren[index] = -1
+        else:
+            self.nextSiblings[prevIndex] = -1
+
+    def getChildIndices(self, index: int) -> list:
+        """ 获取子节点的序号 """
+        result = []
+        childIndex = self.firstChildren[index]
+        while childIndex >= 0:
+            result.append(childIndex)
+            childIndex = self.nextSiblings[childIndex]
+        return result
+
+    def getName(self, index: int) -> str:
+        """ 获取文件夹名 """
+        return self.__names[self.nameStarts[index]:self.nameEnds[index]].decode('utf-8', 'surrogatepass')
+
+    def getPathDirName(self, index: int) -> str:
+        """ 获取文件夹路径 """
+        names = []
+        while index != self.rootIndex and index >= 0:
+            names.append(self.getName(index))
+            index = self.parents[index]
+        if not names:
+            return self.rootPathDirName
+        names.reverse()
+        return os.path.join(self.rootPathDirName, *names).replace('\\', '/')
+
+    def __internName(self, dirName: str) -> tuple:
+        """ 将文件夹名存入缓冲区，相同的文件夹名只存一份 """
+        if self.__nameDic is not None and dirName in self.__nameDic:
+            return self.__nameDic[dirName]
+        start = len(self.__names)
+        self.__names += dirName.encode('utf-8', 'surrogatepass')
+        result = (start, len(self.__names))
+        if self.__nameDic is not None:
+            self.__nameDic[dirName] = result
+        return result
+
+
+def _columnProperty(columnName: str, doc: str) -> property:
+    """ 生成读写CompactDirTree某一列的属性 """
+
+    def getter(self):
+        return getattr(self.tree, columnName)[self.index]
+
+    def setter(self, value):
+        getattr(self.tree, columnName)[self.index] = value
+
+    return property(getter, setter, doc=doc)
+
+
+class CompactDirNode:
+    """ CompactDirTree中节点的轻量视图，接口与DirTreeNode一致 """
+
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree: CompactDirTree, index: int):
+        """ 初始化 """
+        self.tree = tree
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, CompactDirNode) and self.index == other.index and self.tree is other.tree
+
+    def __hash__(self):
+        return self.index
+
+    selfSize = _columnProperty('selfSizes', '直属文件大小')
+    allSize = _columnProperty('allSizes', '总大小')
+    sizePercent = _columnProperty('sizePercents', '占父文件夹的百分比')
+    dirCount = _columnProperty('dirCounts', '子孙文件夹数')
+    fileCount = _columnProperty('fileCounts', '子孙文件数')
+    depth = _columnProperty('depths', '深度')
+
+    @property
+    def canVisit(self) -> bool:
+        """ 是否可访问 """
+        return bool(self.tree.canVisits[self.index])
+
+    @canVisit.setter
+    def canVisit(self, value: bool):
+        self.tree.canVisits[self.index] = value
+
+    @property
+    def files(self):
+        """ 直属文件记录，未记录时为None """
+        return self.tree.fileRecords.get(self.index)
+
+    @files.setter
+    def files(self, value):
+        if value is None:
+            self.tree.fileRecords.pop(self.index, None)
+        else:
+            self.tree.fileRecords[self.index] = value
+
+    @property
+    def breakdown(self):
+        """ 子树中文件的分类统计，未统计时为None """
+        return self.tree.breakdowns.get(self.index)
+
+    @breakdown.setter
+    def breakdown(self, value):
+        if value is None:
+            self.tree.breakdowns.pop(self.index, None)
+        else:
+            self.tree.breakdowns[self.index] = value
+
+    @property
+    def parent(self):
+        """ 父节点 """
+        if self.index == self.tree.rootIndex:
+            return None
+        parentIndex = self.tree.parents[self.index]
+        return CompactDirNode(self.tree, parentIndex) if parentIndex >= 0 else None
+
+    @property
+    def children(self) -> list:
+        """ 子节点（每次生成新的列表） """
+        return [CompactDirNode(self.tree, index) for index in self.tree.getChildIndices(self.index)]
+
+    @property
+    def dirName(self) -> str:
+        """ 文件夹名 """
+        if self.index == self.tree.rootIndex:
+            return self.tree.rootPathDirName
+        return self.tree.getName(self.index)
+
+    @property
+    def pathDirName(self) -> str:
+        """ 文件夹路径 """
+        return self.tree.getPathDirName(self.index)
+
+    @property
+    def dirNamePinyin(self) -> tuple:
+        """ 文件夹名拼音，用于按名称排序 """
+        return getNameSortKey(self.dirName)
+
+    def appendChild(self, node: DirTreeNode):
+        """ 添加以DirTreeNode为根的子树作为子节点
+        :returns: 添加到树中的节点
+        """
+        childIndex = self.tree.importTree(node)
+        self.tree.linkChildren(self.index, self.tree.getChildIndices(self.index) + [childIndex])
+        self.tree.depths[childIndex] = self.depth + 1
+        return CompactDirNode(self.tree, childIndex)
+
+    def replaceChild(self, oldNode, newNode: DirTreeNode):
+        """ 用以DirTreeNode为根的子树替换子节点
+        :returns: 添加到树中的节点
+        """
+        childIndex = self.tree.importTree(newNode)
+        childIndices = self.tree.getChildIndices(self.index)
+        childIndices[childIndices.index(oldNode.index)] = childIndex
+        self.tree.linkChildren(self.index, childIndices)
+        self.tree.parents[oldNode.index] = -1
+        self.tree.depths[childIndex] = self.depth + 1
+        return CompactDirNode(self.tree, childIndex)
+
+    def removeChild(self, node):
+        """ 移除子节点 """
+        childIndices = self.tree.getChildIndices(self.index)
+        childIndices.remove(node.index)
+        self.tree.linkChildren(self.index, childIndices)
+        self.tree.parents[node.index] = -1
+
+    def sortChildren(self, key, reverse: bool):
+        """ 子节点排序 """
+        self.setChildrenOrder(sorted(self.children, key=key, reverse=reverse))
+
+    def setChildrenOrder(self, children):
+        """ 按给定顺序重新排列子节点 """
+        self.tree.linkChildren(self.index, [child.index for child in children])
+
+    def preorderTraversal(self) -> list:
+        """ 前序遍历 """
+        result = []
+        indexStack = [self.index]
+        while indexStack:
+            curIndex = indexStack.pop()
+            result.append(CompactDirNode(self.tree, curIndex))
+            indexStack.extend(reversed(self.tree.getChildIndices(curIndex)))
+        return result
+
+    def postorderTraversal(self) -> list:
+        """ 后序遍历 """
+        result = []
+        indexStack = [self.index]
+        while indexStack:
+            curIndex = indexStack.pop()
+            result.append(CompactDirNode(self.tree, curIndex))
+            indexStack.extend(self.tree.getChildIndices(curIndex))
+        result.reverse()
+        return result
+
+
+class ScanCancelledError(Exception):
+    """ 扫描被取消 """
+
+
+class FileRecords(namedtuple('FileRecords', ['names', 'sizes'])):
+    """ 一个文件夹的直属文件记录
+    names为以'\\0'连接的文件名（文件名中不可能出现），sizes为对应的文件大小（array），比逐个保存元组节省内存
+    """
+    __slots__ = ()
+    separator = '\0'
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def items(self):
+        """ 依次产生(文件名, 文件大小) """
+        if self.sizes:
+            yield from zip(self.names.split(FileRecords.separator), self.sizes)
+
+
+class SizeBreakdown:
+    """ 按扩展名和修改时间分类的文件大小和数量，子文件夹的统计逐级累加到祖先节点
+    extDic为{小写扩展名（如'.log'，没有扩展名时为''）: [大小, 文件数]}，
+    ageSizes、ageCounts为修改时间在各时间段（见ageBucketNames）内的文件的大小和数量
+    """
+
+    __slots__ = ('extDic', 'ageSizes', 'ageCounts', 'outdated')
+
+    def __init__(self):
+        """ 初始化 """
+        self.extDic = {}
+        self.ageSizes = [0] * len(ageBucketNames)
+        self.ageCounts = [0] * len(ageBucketNames)
+        self.outdated = False  # 部分刷新后无法准确更新时为True
+
+    def addFile(self, ext: str, size: int, ageBucket: int):
+        """ 计入一个文件 """
+        counter = self.extDic.get(ext)
+        if counter is None:
+            self.extDic[ext] = [size, 1]
+        else:
+            counter[0] += size
+            counter[1] += 1
+        self.ageSizes[ageBucket] += size
+        self.ageCounts[ageBucket] += 1
+
+    def add(self, other, sign: int = 1):
+        """ 累加（sign为-1时减去）另一个分类统计 """
+        extDic = self.extDic
+        for ext, (size, count) in other.extDic.items():
+            counter = extDic.get(ext)
+            if counter is None:
+                extDic[ext] = [size * sign, count * sign]
+            else:
+                counter[0] += size * sign
+                counter[1] += count * sign
+                if not counter[0] and not counter[1]:
+                    del extDic[ext]
+        for i, (size, count) in enumerate(zip(other.ageSizes, other.ageCounts)):
+            self.ageSizes[i] += size * sign
+            self.ageCounts[i] += count * sign
+        self.outdated = self.outdated or other.outdated
+
+    def copy(self):
+        """ 复制 """
+        result = SizeBreakdown()
+        result.add(self)
+        return result
+
+    def largestExtensions(self, count: int = 0) -> list:
+        """ 按大小降序排列的[(扩展名, 大小, 文件数)]
+        :param count: 只返回最大的若干项，为0时返回全部
+        """
+        items = sorted(((ext, size, fileCount) for ext, (size, fileCount) in self.extDic.items()),
+                       key=lambda item: item[1], reverse=True)
+        return items[:count] if count > 0 else items
+
+    def ages(self) -> list:
+        """ [(时间段名称, 大小, 文件数)] """
+        return list(zip(ageBucketNames, self.ageSizes, self.ageCounts))
+
+
+class DirListing(namedtuple('DirListing', ['selfSize', 'fileCount', 'subDirs', 'canVisit', 'files', 'largestFiles',
+                                           'stats', 'prunedDirs', 'collapsed', 'breakdown'],
+                            defaults=[None, None, None, None, None, None])):
+    """ 单个文件夹的读取结果
+    subDirs为[(子文件夹名, 子文件夹路径)]，files为直属文件记录（不记录时为None），
+    largestFiles为最大的若干直属文件[(文件大小, 文件名)]（不统计时为None），
+    stats为(读取耗时（秒）, stat次数, 错误数)（不统计时为None），
+    prunedDirs为被排除而未读取的子文件夹[(路径, 原因)]，原因为'exclude'（匹配排除规则）或'filesystem'（位于其他文件系统），
+    collapsed为不展开为节点的子孙文件夹的合计(大小, 文件夹数, 文件数)（展开时为None），
+    breakdown为直属文件（合计时包括子孙文件夹中的文件）的分类统计SizeBreakdown（不统计时为None），
+    仅包含可序列化的简单类型以便跨进程传递
+    """
+    __slots__ = ()
+
+
+class ListOptions(namedtuple('ListOptions', ['recordFiles', 'topFiles', 'instrument', 'excludes', 'rootDevice',
+                                             'breakdownTime'],
+                             defaults=[False, 0, False, (), None, None])):
+    """ 读取文件夹的选项，仅包含基本类型以便跨进程传递
+    recordFiles: 是否同时记录直属文件（普通文件）的文件名和大小，不增加stat次数
+    topFiles: 统计最大的若干直属文件，为0时不统计
+    instrument: 是否统计读取耗时、stat次数和错误数
+    excludes: 排除规则((类型, 表达式), ...)，类型为'glob'或'regex'，匹配的子文件夹不读取
+    rootDevice: 不为None时只读取位于该设备（st_dev）上的子文件夹
+    breakdownTime: 不为None时按扩展名和修改时间分类统计直属文件，修改时间的远近相对于该时间戳计算
+    """
+    __slots__ = ()
+
+
+defaultListOptions = ListOptions()
+_ageBucketSeconds = tuple(days * 86400 for days in ageBucketDays)
+
+
+def makeExcludes(excludeGlobs=(), excludeRegexes=()) -> tuple:
+    """ 将通配符和正则表达式合并为ListOptions的排除规则 """
+    return tuple(('glob', pattern) for pattern in excludeGlobs) + \
+        tuple(('regex', pattern) for pattern in excludeRegexes)
+
+
+@functools.lru_cache(maxsize=32)
+def compileExcludes(excludes: tuple) -> tuple:
+    """ 编译排除规则，不含'/'的通配符只匹配文件夹名，其余匹配完整路径，正则表达式有误时抛出re.error
+    :returns: ((匹配函数, 是否匹配完整路径), ...)
+    """
+    result = []
+    for kind, pattern in excludes:
+        if kind == 'glob':
+            result.append((re.compile(fnmatch.translate(pattern)).match, '/' in pattern))
+        elif kind == 'regex':
+            result.append((re.compile(pattern).search, True))
+        else:
+            raise ValueError(f'未知的排除规则类型: {kind}')
+    return tuple(result)
+
+
+def isExcluded(dirName: str, pathDirName: str, compiledExcludes: tuple) -> bool:
+    """ 文件夹是否匹配排除规则 """
+    for matchFunc, matchPath in compiledExcludes:
+        if matchFunc(pathDirName if matchPath else dirName) is not None:
+            return True
+    return False
+
+
+def getPruneReason(dirName: str, pathDirName: str, options: ListOptions, entry: os.DirEntry = None):
+    """ 获取子文件夹不被读取的原因，'exclude'（匹配排除规则）、'filesystem'（位于其他文件系统）或None（需要读取）
+    :param entry: 子文件夹的os.DirEntry，指定时使用其stat结果
+    """
+    if options.excludes and isExcluded(dirName, pathDirName, compileExcludes(options.excludes)):
+        return 'exclude'
+    if options.rootDevice is not None:
+        try:
+            device = entry.stat().st_dev if entry is not None else os.stat(pathDirName).st_dev
+        except OSError:
+            return None  # 读取该文件夹时再记录错误
+        if device != options.rootDevice:
+            return 'filesystem'
+    return None
+
+
+def pruneListing(listing: DirListing, options: ListOptions) -> DirListing:
+    """ 按排除规则和文件系统筛选读取结果（如缓存数据）中的子文件夹 """
+    if not options.excludes and options.rootDevice is None:
+        return listing
+    subDirs = []
+    prunedDirs = list(listing.prunedDirs or ())
+    for dirName, pathDirName in listing.subDirs:
+        reason = getPruneReason(dirName, pathDirName, options)
+        if reason is None:
+            subDirs.append((dirName, pathDirName))
+        else:
+            prunedDirs.append((pathDirName, reason))
+    return listing._replace(subDirs=subDirs, prunedDirs=prunedDirs)
+
+
+class TopItems:
+    """ 只保留最大的若干项（最小堆），内存占用与保留数量成正比 """
+
+    def __init__(self, count: int):
+        """ 初始化
+        :param count: 保留的项数
+        """
+        self.count = count
+        self.__heap = []  # [(大小, 加入顺序, 项)]
+        self.__addCount = 0
+
+    def __len__(self):
+        return len(self.__heap)
+
+    def accepts(self, size: int) -> bool:
+        """ 该大小的项能否进入排行，用于在生成项之前提前过滤 """
+        return len(self.__heap) < self.count or size > self.__heap[0][0]
+
+    def add(self, size: int, item):
+        """ 加入一项，不够大时直接丢弃 """
+        if not self.accepts(size):
+            return
+        self.__addCount += 1
+        if len(self.__heap) < self.count:
+            heapq.heappush(self.__heap, (size, self.__addCount, item))
+        else:
+            heapq.heapreplace(self.__heap, (size, self.__addCount, item))
+
+    def items(self) -> list:
+        """ 按大小降序排列的[(大小, 项)] """
+        return [(size, item) for size, _, item in sorted(self.__heap, key=lambda entry: (-entry[0], entry[1]))]
+
+
+class SizeRanking:
+    """ 扫描中统计的最大的文件和文件夹（以路径记录） """
+
+    def __init__(self, count: int):
+        """ 初始化
+        :param count: 每个排行保留的项数
+        """
+        self.count = count
+        self.largestFiles = TopItems(count)
+        self.largestDirsByAllSize = TopItems(count)
+        self.largestDirsBySelfSize = TopItems(count)
+
+
+class ScanStats:
+    """ 扫描统计信息：各阶段耗时、文件夹数、文件数、stat次数、错误数和读取最慢的文件夹
+    各阶段耗时为累计值，并发读取时list阶段为各工作线程（进程）耗时之和
+    """
+
+    def __init__(self, slowDirCount: int = 20, onProgress=None, progressInterval: float = 0.5):
+        """ 初始化
+        :param slowDirCount: 记录的最慢文件夹数
+        :param onProgress: 扫描中定期以本对象为参数调用（在扫描线程中）
+        :param progressInterval: 调用onProgress的最小间隔（秒）
+        """
+        self.phaseSeconds = {}  # {阶段名: 累计耗时（秒）}
+        self.dirCount = 0
+        self.fileCount = 0
+        self.statCount = 0
+        self.errorCount = 0
+        self.cacheHitCount = 0
+        self.size = 0
+        self.slowestDirs = TopItems(slowDirCount)  # (读取耗时, 文件夹路径)
+        self.lastError = None  # 导致扫描失败的异常
+        self.__onProgress = onProgress
+        self.__progressInterval = progressInterval
+        self.__lastProgressTime = 0
+
+    def addTime(self, phase: str, seconds: float):
+        """ 累计一个阶段的耗时 """
+        self.phaseSeconds[phase] = self.phaseSeconds.get(phase, 0) + seconds
+
+    def addListing(self, pathDirName: str, listing: DirListing):
+        """ 记录一个文件夹的读取结果 """
+        self.dirCount += 1
+        self.fileCount += listing.fileCount
+        self.size += listing.selfSize
+        if listing.collapsed is not None:
+            collapsedSize, collapsedDirCount, collapsedFileCount = listing.collapsed
+            self.dirCount += collapsedDirCount
+            self.fileCount += collapsedFileCount
+            self.size += collapsedSize
+        if listing.stats is None:
+            # 使用缓存数据
+            self.cacheHitCount += 1
+            return
+        seconds, statCount, errorCount = listing.stats
+        self.addTime('list', seconds)
+        self.statCount += statCount
+        self.errorCount += errorCount
+        if self.slowestDirs.accepts(seconds):
+            self.slowestDirs.add(seconds, pathDirName)
+
+    def notifyProgress(self, force: bool = False):
+        """ 距上次调用onProgress超过间隔时再次调用 """
+        if self.__onProgress is None:
+            return
+        now = time.monotonic()
+        if force or now - self.__lastProgressTime >= self.__progressInterval:
+            self.__lastProgressTime = now
+            self.__onProgress(self)
+
+    def asDict(self) -> dict:
+        """ 转换为只包含基本类型的字典，便于输出为JSON """
+        return {'phaseSeconds': dict(self.phaseSeconds), 'dirCount': self.dirCount, 'fileCount': self.fileCount,
+                'statCount': self.statCount, 'errorCount': self.errorCount, 'cacheHitCount': self.cacheHitCount,
+                'size': self.size, 'slowestDirs': [[seconds, path] for seconds, path in self.slowestDirs.items()],
+                'lastError': repr(self.lastError) if self.lastError is not None else None}
+
+    def report(self) -> str:
+        """ 生成文本报告 """
+        lines = [f'文件夹 {self.dirCount}，文件 {self.fileCount}，stat调用 {self.statCount}，错误 {self.errorCount}，'
+                 f'使用缓存 {self.cacheHitCount}，大小 {self.size:,} 字节']
+        if self.lastError is not None:
+            lines.append(f'扫描失败: {self.lastError!r}')
+        lines.append('各阶段耗时:')
+        lines.extend(f'    {phase:<12}{seconds:>12.3f}s' for phase, seconds in self.phaseSeconds.items())
+        lines.append('读取最慢的文件夹:')
+        lines.extend(f'    {seconds:>12.4f}s  {path}' for seconds, path in self.slowestDirs.items())
+        return '\n'.join(lines)
+
+
+def listDir(pathDirName: str, options: ListOptions = defaultListOptions) -> DirListing:
+    """ 读取一个文件夹的直属文件和子文件夹 """
+    startTime = time.perf_counter() if options.instrument else 0
+    statCount = 0
+    errorCount = 0
+    selfSize = 0
+    fileCount = 0
+    subDirs = []
+    recordFiles = options.recordFiles
+    topFiles = options.topFiles
+    fileNames = [] if recordFiles else None
+    fileSizes = array('q') if recordFiles else None
+    largestFiles = [] if topFiles > 0 else None  # 最小堆
+    breakdownTime = options.breakdownTime
+    breakdown = SizeBreakdown() if breakdownTime is not None else None
+    pruning = bool(options.excludes) or options.rootDevice is not None
+    prunedDirs = [] if pruning else None
+    try:
+        with os.scandir(pathDirName) as entries:
+            for entry in entries:
+                try:
+                    isDir = entry.is_dir()
+                except OSError:
+                    isDir = False
+                    errorCount += 1
+                if isDir:
+                    subPathDirName = entry.path.replace('\\', '/')
+                    if pruning:
+                        if options.rootDevice is not None:
+                            statCount += 1
+                        reason = getPruneReason(entry.name, subPathDirName, options, entry)
+                        if reason is not None:
+                            prunedDirs.append((subPathDirName, reason))
+                            continue
+                    subDirs.append((entry.name, subPathDirName))
+                else:
+                    fileCount += 1
+                    try:
+                        if entry.is_file():
+                            statCount += 1
+                            fileStat = entry.stat()
+                            fileSize = fileStat.st_size
+                            selfSize += fileSize
+                            if recordFiles:
+                                fileNames.append(entry.name)
+                                fileSizes.append(fileSize)
+                            if largestFiles is not None:
+                                if len(largestFiles) < topFiles:
+                                    heapq.heappush(largestFiles, (fileSize, entry.name))
+                                elif fileSize > largestFiles[0][0]:
+                                    heapq.heapreplace(largestFiles, (fileSize, entry.name))
+                            if breakdown is not None:
+                                breakdown.addFile(os.path.splitext(entry.name)[1].lower(), fileSize, bisect.bisect_left(
+                                    _ageBucketSeconds, breakdownTime - fileStat.st_mtime))
+                    except OSError:
+                        errorCount += 1
+    except OSError:
+        return DirListing(0, 0, [], False, FileRecords('', array('q')) if recordFiles else None,
+                          [] if topFiles > 0 else None,
+                          (time.perf_counter() - startTime, statCount, errorCount + 1) if options.instrument else None,
+                          breakdown=SizeBreakdown() if breakdownTime is not None else None)
+    files = FileRecords(FileRecords.separator.join(fileNames), fileSizes) if recordFiles else None
+    stats = (time.perf_counter() - startTime, statCount, errorCount) if options.instrument else None
+    return DirListing(selfSize, fileCount, subDirs, True, files, largestFiles, stats, prunedDirs, breakdown=breakdown)
+
+
+def sumDirTree(pathDirName: str, options: ListOptions = defaultListOptions) -> DirListing:
+    """ 读取一个文件夹并合计其所有子孙文件夹，子孙文件夹不展开为节点（结果的subDirs为空）
+    只记录该文件夹的直属文件，最大的文件包括子孙文件夹中的文件（文件名为相对于该文件夹的路径）
+    """
+    listing = listDir(pathDirName, options)
+    subOptions = options._replace(recordFiles=False)
+    topFiles = options.topFiles
+    largestFiles = listing.largestFiles
+    seconds, statCount, errorCount = listing.stats or (0, 0, 0)
+    prunedDirs = listing.prunedDirs
+    size = dirCount = fileCount = 0
+    dirStack = list(listing.subDirs)  # [(相对路径, 路径)]
+    while dirStack:
+        relPath, subPathDirName = dirStack.pop()
+        subListing = listDir(subPathDirName, subOptions)
+        size += subListing.selfSize
+        dirCount += 1
+        fileCount += subListing.fileCount
+        if subListing.stats is not None:
+            seconds += subListing.stats[0]
+            statCount += subListing.stats[1]
+            errorCount += subListing.stats[2]
+        if subListing.prunedDirs:
+            prunedDirs.extend(subListing.prunedDirs)
+        if subListing.breakdown is not None:
+            listing.breakdown.add(subListing.breakdown)
+        for fileSize, fileName in subListing.largestFiles or ():
+            if len(largestFiles) < topFiles:
+                heapq.heappush(largestFiles, (fileSize, relPath + '/' + fileName))
+            elif fileSize > largestFiles[0][0]:
+                heapq.heapreplace(largestFiles, (fileSize, relPath + '/' + fileName))
+        dirStack.extend((relPath + '/' + dirName, path) for dirName, path in subListing.subDirs)
+    return listing._replace(subDirs=[], stats=(seconds, statCount, errorCount) if listing.stats is not None else None,
+                            collapsed=(size, dirCount, fileCount))
+
+
+def listDirs(pathDirNames: list, options: ListOptions = defaultListOptions) -> list:
+    """ 依次读取多个文件夹，用于进程池中批量提交以减少进程间通信次数 """
+    return [listDir(pathDirName, options) for pathDirName in pathDirNames]
+
+
+def sumDirTrees(pathDirNames: list, options: ListOptions = defaultListOptions) -> list:
+    """ 依次合计多个文件夹，见sumDirTree """
+    return [sumDirTree(pathDirName, options) for pathDirName in pathDirNames]
+
+
+def listChangedDirs(pathDirNames: list, cachedMtimes: list, options: ListOptions = defaultListOptions) -> list:
+    """ 依次读取多个文件夹，修改时间与缓存一致的文件夹不再读取
+    :param cachedMtimes: 缓存中记录的修改时间（纳秒），None表示无缓存（缓存中没有文件记录）
+    :returns: [(当前修改时间, 读取结果)]，读取结果为None表示可直接使用缓存
+    """
+    result = []
+    for pathDirName, cachedMtime in zip(pathDirNames, cachedMtimes):
+        try:
+            mtime = os.stat(pathDirName).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime == cachedMtime:
+            result.append((mtime, None))
+        else:
+            result.append((mtime, listDir(pathDirName, options)))
+    return result
+
+
+_networkFsTypes = frozenset(('nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'afs', 'ncpfs', '9p', 'fuse.sshfs'))
+
+
+def isNetworkPath(pathDirName: str) -> bool:
+    """ 文件夹是否位于网络文件系统（UNC路径、Windows下的网络驱动器、Linux下挂载的nfs、cifs等），无法判断时返回False
+    本地磁盘上并发读取文件夹通常比单线程慢，网络文件系统上并发读取可以掩盖往返延迟
+    """
+    pathDirName = pathDirName.replace('\\', '/')
+    if pathDirName.startswith('//'):
+        return True
+    if os.name == 'nt':
+        import ctypes
+        drive = os.path.splitdrive(os.path.abspath(pathDirName))[0]
+        return bool(drive) and ctypes.windll.kernel32.GetDriveTypeW(drive + '\\') == 4  # DRIVE_REMOTE
+    try:
+        with open('/proc/self/mounts', encoding='utf-8', errors='replace') as file:
+            mounts = [line.split()[1:3] for line in file]
+    except OSError:
+        return False
+    realPath = os.path.realpath(pathDirName)
+    mountPoint, fsType = '', ''
+    for fields in mounts:
+        if len(fields) < 2:
+            continue
+        curMountPoint = fields[0].replace('\\040', ' ')
+        if (realPath == curMountPoint or realPath.startswith(curMountPoint.rstrip('/') + '/')) and \
+                len(curMountPoint) > len(mountPoint):
+            mountPoint, fsType = curMountPoint, fields[1]
+    return fsType in _networkFsTypes
+
+
+class DirScanner:
+    """ 文件夹扫描引擎
+    基于os.scandir，每个文件夹只读取一次，并在扫描过程中直接累计各节点的统计数据
+    """
+
+    __processBatchSize = 32  # 进程池模式下每个任务读取的文件夹数
+    __threadBatchSize = 16  # 线程池模式下每个任务最多读取的文件夹数
+
+    def __init__(self, rootNode: DirTreeNode, workers: int = 1, useProcess: bool = False, cache=None,
+                 onNodeListed=None, cancelEvent=None, store: CompactDirTree = None, recordFiles: bool = False,
+                 ranking: SizeRanking = None, stats: ScanStats = None, excludes: tuple = (), maxDepth: int = None,
+                 rootDevice: int = None, prunedDirs: list = None, breakdownTime: float = None,
+                 breakdownDepth: int = None):
+        """ 初始化
+        :param rootNode: 待扫描的根节点，扫描结果直接填充到该节点
+        :param workers: 并发读取文件夹的工作线程（进程）数，不大于1时单线程扫描
+        :param useProcess: 是否使用进程池代替线程池，适用于非常大的文件夹树
+        :param cache: 扫描缓存（scanCache.ScanCache），修改时间未变的文件夹直接使用缓存数据
+        :param onNodeListed: 每读取完一个文件夹后以该节点为参数调用，此时其大小和数量尚未累计子文件夹
+        :param cancelEvent: threading.Event，被设置后扫描尽快中止并抛出ScanCancelledError
+        :param store: 紧凑存储，指定时已完成的子树即时转存其中并释放节点对象，扫描返回其根节点视图
+        :param recordFiles: 是否在节点的files中记录直属文件，使用缓存数据的文件夹没有文件记录
+        :param ranking: 指定时统计最大的文件和文件夹，此时缓存中没有文件信息，所有文件夹都重新读取（仍更新缓存）
+        :param stats: 指定时统计各阶段耗时、stat次数等信息，不指定时几乎没有额外开销
+        :param excludes: 排除规则((类型, 表达式), ...)，见ListOptions，匹配的文件夹不读取
+        :param maxDepth: 深度（节点的depth）不小于该值的节点不再展开子节点，其子孙文件夹只合计大小和数量，
+                         这些文件夹不使用缓存；为None时不限制
+        :param rootDevice: 不为None时不读取位于其他设备（st_dev）上的文件夹
+        :param prunedDirs: 指定时将未读取的文件夹(路径, 原因)追加到该列表
+        :param breakdownTime: 指定时在节点的breakdown中按扩展名和修改时间（相对于该时间戳）分类统计子树中的文件，
+                              缓存中没有文件信息，所有文件夹都重新读取（仍更新缓存）
+        :param breakdownDepth: 深度（节点的depth）大于该值的节点累加到父节点后不再保留分类统计，为None时全部保留；
+                               根节点总是保留
+        """
+        self.__rootNode = rootNode
+        self.__workers = workers
+        self.__useProcess = useProcess
+        self.__cache = cache
+        self.__onNodeListed = onNodeListed
+        self.__cancelEvent = cancelEvent
+        self.__store = store
+        self.__ranking = ranking
+        self.__stats = stats
+        self.__maxDepth = maxDepth
+        self.__prunedDirs = prunedDirs
+        self.__breakdownDepth = breakdownDepth
+        self.__listOptions = ListOptions(recordFiles, ranking.count if ranking is not None else 0, stats is not None,
+                                         tuple(excludes), rootDevice, breakdownTime)
+        self.__packedDic = {}  # {已完成的节点: 其子节点在紧凑存储中的序号}
+        self.__readCache = ranking is None and breakdownTime is None  # 是否使用缓存数据，需要逐个文件统计时只写入缓存
+
+    def scan(self):
+        """ 扫描并返回根节点 """
+        startTime = time.perf_counter()
+        if self.__workers > 1:
+            self.__scanParallel()
+        else:
+            self.__scanSerial()
+        self.__rootNode.sizePercent = 100
+        if self.__store is None:
+            result = self.__rootNode
+        else:
+            self.__store.rootIndex = self.__store.addNode(self.__rootNode, self.__packedDic.pop(self.__rootNode))
+            self.__store.releaseInternTable()
+            result = self.__store.root
+        if self.__stats is not None:
+            self.__stats.addTime('scan', time.perf_counter() - startTime)
+            self.__stats.notifyProgress(force=True)
+        return result
+
+    def __scanSerial(self):
+        """ 单线程扫描 """
+        pendingDic = {}  # {节点: 尚未完成的子节点数}
+        nodeStack = [self.__rootNode]
+        while nodeStack:
+            self.__checkCancelled()
+            curNode = nodeStack.pop()
+            self.__applyListing(curNode, self.__takeListings([curNode], self.__listNodes([curNode]))[0])
+            if self.__onNodeListed is not None:
+                self.__onNodeListed(curNode)
+            if curNode.children:
+                pendingDic[curNode] = len(curNode.children)
+                nodeStack.extend(reversed(curNode.children))
+            else:
+                self.__completeNode(curNode, pendingDic)
+
+    def __scanParallel(self):
+        """ 多线程（进程）并发扫描，同级文件夹同时读取，得到的树与单线程扫描一致 """
+        import concurrent.futures
+        if self.__useProcess:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.__workers)
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.__workers)
+        pendingDic = {}  # {节点: 尚未完成的子节点数}
+        with executor:
+            futureDic = {executor.submit(*self.__listTask([self.__rootNode])): [self.__rootNode]}
+            while futureDic:
+                if self.__cancelEvent is not None and self.__cancelEvent.is_set():
+                    for future in futureDic:
+                        future.cancel()
+                    raise ScanCancelledError()
+                doneFutures, _ = concurrent.futures.wait(futureDic, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in doneFutures:
+                    nodes = futureDic.pop(future)
+                    for curNode, listing in zip(nodes, self.__takeListings(nodes, future.result())):
+                        self.__applyListing(curNode, listing)
+                        if self.__onNodeListed is not None:
+                            self.__onNodeListed(curNode)
+                        children = curNode.children
+                        if children:
+                            pendingDic[curNode] = len(children)
+                            batchSize = self.__getBatchSize(len(children))
+                            for i in range(0, len(children), batchSize):
+                                batch = children[i:i + batchSize]
+                                futureDic[executor.submit(*self.__listTask(batch))] = batch
+                        else:
+                            self.__completeNode(curNode, pendingDic)
+
+    def __getBatchSize(self, childCount: int) -> int:
+        """ 同级文件夹每个任务读取的文件夹数
+        线程池模式下同级文件夹较多时合并提交以减少任务调度的开销，较少时仍分给各工作线程同时读取
+        """
+        if self.__useProcess:
+            return DirScanner.__processBatchSize
+        return max(1, min(DirScanner.__threadBatchSize, childCount // self.__workers))
+
+    def __checkCancelled(self):
+        """ 扫描已被取消时抛出ScanCancelledError """
+        if self.__cancelEvent is not None and self.__cancelEvent.is_set():
+            raise ScanCancelledError()
+
+    def __listTask(self, nodes: list) -> tuple:
+        """ 生成读取一批文件夹的任务（函数及参数），启用缓存时附带缓存中记录的修改时间 """
+        pathDirNames = [node.pathDirName for node in nodes]
+        if self.__isCollapsed(nodes[0]):
+            # 同一批为同级文件夹，深度相同
+            return sumDirTrees, pathDirNames, self.__listOptions
+        if self.__cache is None:
+            return listDirs, pathDirNames, self.__listOptions
+        if not self.__readCache:
+            return listChangedDirs, pathDirNames, [None] * len(pathDirNames), self.__listOptions
+        startTime = time.perf_counter() if self.__stats is not None else 0
+        cachedMtimes = [self.__cache.getMtime(pathDirName) for pathDirName in pathDirNames]
+        if self.__stats is not None:
+            self.__stats.addTime('cache', time.perf_counter() - startTime)
+        return listChangedDirs, pathDirNames, cachedMtimes, self.__listOptions
+
+    def __listNodes(self, nodes: list) -> list:
+        """ 在当前线程读取一批文件夹 """
+        func, *args = self.__listTask(nodes)
+        return func(*args)
+
+    def __takeListings(self, nodes: list, results: list) -> list:
+        """ 整理读取结果，修改时间未变的文件夹取缓存数据，其余写入缓存
+        缓存中保存未经筛选的子文件夹，使用时再按当前的排除规则筛选
+        """
+        if self.__cache is None or self.__isCollapsed(nodes[0]):
+            return results
+        startTime = time.perf_counter() if self.__stats is not None else 0
+        listings = []
+        for node, (mtime, listing) in zip(nodes, results):
+            if listing is None:
+                listing = pruneListing(self.__cache.getListing(node.pathDirName), self.__listOptions)
+            elif mtime is not None and listing.canVisit:
+                cachedListing = listing
+                if listing.prunedDirs:
+                    cachedListing = listing._replace(subDirs=listing.subDirs + [
+                        (pathDirName.rpartition('/')[2], pathDirName) for pathDirName, _ in listing.prunedDirs])
+                self.__cache.setListing(node.pathDirName, mtime, cachedListing)
+            listings.append(listing)
+        if self.__stats is not None:
+            self.__stats.addTime('cache', time.perf_counter() - startTime)
+            self.__stats.statCount += len(nodes)  # 检查修改时间
+        return listings
+
+    def __isCollapsed(self, node: DirTreeNode) -> bool:
+        """ 节点是否不再展开子节点 """
+        return self.__maxDepth is not None and node.depth >= self.__maxDepth
+
+    def __applyListing(self, node: DirTreeNode, listing: DirListing):
+        """ 将文件夹读取结果填充到节点 """
+        startTime = time.perf_counter() if self.__stats is not None else 0
+        for dirName, pathDirName in listing.subDirs:
+            node.appendChild(DirTreeNode(pathDirName, dirName))
+        node.selfSize = listing.selfSize
+        node.allSize = listing.selfSize
+        node.dirCount = len(listing.subDirs)
+        node.fileCount = listing.fileCount
+        node.canVisit = listing.canVisit
+        node.files = listing.files
+        if self.__listOptions.breakdownTime is not None:
+            node.breakdown = listing.breakdown if listing.breakdown is not None else SizeBreakdown()
+        if listing.collapsed is not None:
+            collapsedSize, collapsedDirCount, collapsedFileCount = listing.collapsed
+            node.allSize += collapsedSize
+            node.dirCount += collapsedDirCount
+            node.fileCount += collapsedFileCount
+        if self.__prunedDirs is not None and listing.prunedDirs:
+            self.__prunedDirs.extend(listing.prunedDirs)
+        if self.__ranking is not None:
+            self.__ranking.largestDirsBySelfSize.add(listing.selfSize, node.pathDirName)
+            largestFiles = self.__ranking.largestFiles
+            for fileSize, fileName in listing.largestFiles or ():
+                if largestFiles.accepts(fileSize):
+                    largestFiles.add(fileSize, os.path.join(node.pathDirName, fileName).replace('\\', '/'))
+        if self.__stats is not None:
+            self.__stats.addListing(node.pathDirName, listing)
+            self.__stats.addTime('aggregate', time.perf_counter() - startTime)
+            self.__stats.notifyProgress()
+
+    def __completeNode(self, node: DirTreeNode, pendingDic: dict):
+        """ 节点及其所有子孙节点均已扫描完毕，将统计数据累加到父节点 """
+        startTime = time.perf_counter() if self.__stats is not None else 0
+        while True:
+            if node.allSize:
+                for child in node.children:
+                    child.sizePercent = child.allSize / node.allSize * 100
+            if self.__store is not None:
+                self.__packChildren(node)
+            if self.__ranking is not None:
+                self.__ranking.largestDirsByAllSize.add(node.allSize, node.pathDirName)
+            if node is self.__rootNode:
+                break
+            parent = node.parent
+            parent.allSize += node.allSize
+            parent.dirCount += node.dirCount
+            parent.fileCount += node.fileCount
+            if node.breakdown is not None:
+                parent.breakdown.add(node.breakdown)
+                if self.__breakdownDepth is not None and node.depth > self.__breakdownDepth:
+                    node.breakdown = None
+            pendingDic[parent] -= 1
+            if pendingDic[parent]:
+                break
+            del pendingDic[parent]
+            node = parent
+        if self.__stats is not None:
+            self.__stats.addTime('aggregate', time.perf_counter() - startTime)
+
+    def __packChildren(self, node: DirTreeNode):
+        """ 将已完成节点的子节点转存到紧凑存储，并释放子节点对象 """
+        self.__packedDic[node] = [self.__store.addNode(child, self.__packedDic.pop(child)) for child in node.children]
+        node.children = []
+
+
 class DirManager:
     """ 文件夹信息管理 """
 
-    __keyFuncs = {'name': lambda node: node.dirNamePinyin,
+    __keyFuncs = {'name': lambda node: getNameSortKey(node.dirName),
                   'allSize': lambda node: node.allSize,
                   'selfSize': lambda node: node.selfSize,
                   'dirCount': lambda node: node.dirCount,
                   'fileCount': lambda node: node.fileCount}
 
-    def __init__(self, pathDirName: str):
+    def __init__(self, pathDirName: str, workers: int = 1, useProcess: bool = False, cacheFile: str = None,
+                 onNodeListed=None, cancelEvent=None, compact: bool = False, recordFiles: bool = False,
+                 topCount: int = 0, stats: ScanStats = None, excludeGlobs=(), excludeRegexes=(),
+                 maxDepth: int = None, oneFileSystem: bool = False, snapshotFile: str = None, breakdown: bool = False,
+                 breakdownDepth: int = None):
+        """ 初始化，扫描被取消时抛出ScanCancelledError
+        :param pathDirName: 要统计的文件夹路径
+        :param workers: 扫描时并发读取文件夹的工作线程（进程）数，不大于1时单线程扫描
+        :param useProcess: 是否使用进程池并发扫描
+        :param cacheFile: 扫描缓存文件路径，指定时重新扫描只读取修改时间变化了的文件夹
+        :param onNodeListed: 扫描中每读取完一个文件夹后以该节点为参数调用（在扫描线程中）
+        :param cancelEvent: threading.Event，被设置后扫描尽快中止
+        :param compact: 是否使用紧凑存储（CompactDirTree），适用于非常大的文件夹树
+        :param recordFiles: 是否在扫描的同时记录各文件夹的直属文件，导出时不必再次读取磁盘
+        :param topCount: 扫描时统计最大的若干文件和文件夹，为0时不统计；统计时不使用缓存数据（仍更新缓存）
+        :param stats: 指定时记录扫描、排序、搜索、导出的耗时和扫描中的各项计数
+        :param excludeGlobs: 排除的文件夹的通配符，不含'/'时匹配文件夹名（如'.git'、'node_modules'），否则匹配完整路径
+        :param excludeRegexes: 排除的文件夹的正则表达式，在完整路径中搜索
+        :param maxDepth: 最大展开深度（根文件夹为0），更深的文件夹只计入大小和数量，不生成节点；为None时不限制
+        :param oneFileSystem: 是否只统计与根文件夹位于同一文件系统的文件夹
+        :param snapshotFile: 二进制快照文件路径，指定时以mmap打开快照（只读）代替扫描，其余扫描参数无效
+        :param breakdown: 是否在扫描的同时按扩展名和修改时间分类统计各子树中的文件（节点的breakdown）；
+                          统计时不使用缓存数据（仍更新缓存）
+        :param breakdownDepth: 只保留深度不大于该值的节点的分类统计以限制内存，为None时全部保留
+        """
         self.__sortInOrders = {'name': True, 'allSize': True, 'selfSize': True, 'dirCount': True, 'fileCount': True}
+        self.__sortKey = None  # 当前排序关键字
+        self.__sortReverse = False
+        self.__defaultSortState = None  # 未单独排序的节点的子节点顺序，(关键字, 是否逆序)，None表示扫描顺序
+        self.__sortStateDic = {}  # {单独排序过的节点: (关键字, 是否逆序)}，值为None表示需要重新排序
+        self.__sortedOrderDic = {}  # {节点: {关键字: 升序排列的子节点}}
+        self.__nameIndex = None  # 文件夹名索引，首次搜索时建立
         self.__pathDirName = pathDirName
-        self.__buildDirTree()
+        self.__workers = workers
+        self.__useProcess = useProcess
+        self.__cacheFile = cacheFile
+        self.__compact = compact
+        self.__recordFiles = recordFiles
+        self.__topCount = topCount
+        self.__excludes = makeExcludes(excludeGlobs, excludeRegexes)
+        self.__maxDepth = maxDepth
+        self.__oneFileSystem = oneFileSystem
+        self.__snapshotFile = snapshotFile
+        self.__breakdown = breakdown
+        self.__breakdownDepth = breakdownDepth
+        self.__breakdownTime = None  # 分类统计修改时间时的参照时间（最近一次完整扫描的开始时间）
+        self.__mappedTree = None  # 打开的二进制快照
+        self.__rootDevice = None
+        self.__prunedDirs = []
+        self.__ranking = None
+        self.__stats = stats
+        self.__scanError = None
+        self.__buildDirTree(onNodeListed, cancelEvent)
 
     @property
     def dirTree(self):
         """ 获取文件夹信息树 """
         return self.__dirTree
 
-    def reload(self):
-        """ 重新计算 """
-        self.__buildDirTree()
+    @property
+    def ranking(self):
+        """ 最近一次完整扫描中最大的文件和文件夹（SizeRanking），未统计时为None
+        只刷新部分文件夹时不更新
+        """
+        return self.__ranking
+
+    @classmethod
+    def openBinarySnapshot(cls, fileName: str, stats: ScanStats = None):
+        """ 打开二进制快照（见binarySnapshot模块），节点数据在访问时才从文件读取，文件有误时scanError不为None """
+        return cls(fileName, stats=stats, snapshotFile=fileName)
 
-    def searchNode(self, text: str, ignoreCase: bool, regex: bool) -> list:
-        """ 搜索匹配的节点 """
-        result = []
-        nodes = self.__dirTree.preorderTraversal()
-        try:
-            if regex:
-                if ignoreCase:
-                    result = [node for node in nodes if re.search(text, node.dirName, re.IGNORECASE) is not None]
-                else:
-                    result = [node for node in nodes if re.search(text, node.dirName) is not None]
+    @property
+    def recordFiles(self) -> bool:
+        """ 扫描时是否记录了各文件夹的直属文件（导出文件时不必再次读取磁盘） """
+        return self.__recordFiles
+
+    @property
+    def readOnly(self) -> bool:
+        """ 是否为打开的二进制快照（不能刷新或监视） """
+        return self.__snapshotFile is not None
+
+    @property
+    def prunedDirs(self) -> list:
+        """ 最近一次完整扫描中被排除而未读取的文件夹[(路径, 原因)]，原因为'exclude'或'filesystem'
+        只刷新部分文件夹时不更新
+        """
+        return self.__prunedDirs
+
+    @property
+    def stats(self):
+        """ 统计信息（ScanStats），未统计时为None """
+        return self.__stats
+
+    @property
+    def scanError(self):
+        """ 最近一次完整扫描失败的原因（异常），扫描成功时为None """
+        return self.__scanError
+
+    def reload(self, onNodeListed=None, cancelEvent=None):
+        """ 重新计算，参数同__init__ """
+        self.__buildDirTree(onNodeListed, cancelEvent)
+
+    def refreshNode(self, node: DirTreeNode):
+        """ 只重新扫描一个子树，并将大小和数量的变化累加到各祖先节点
+        :returns: 替换原节点的新节点，文件夹已不存在时返回None
+        """
+        if self.readOnly:
+            raise ValueError('二进制快照为只读，不能刷新')
+        parent = node.parent
+        if parent is None:
+            self.__buildDirTree()
+            return self.__dirTree
+        if os.path.isdir(node.pathDirName):
+            newNode = DirTreeNode(node.pathDirName, node.dirName)
+            newNode.depth = node.depth
+            self.__scanTree(newNode)
+            self.__sortNewTree(newNode)
+            self.__forgetSortOrder(node)
+            newNode = parent.replaceChild(node, newNode)
+            if self.__nameIndex is not None:
+                self.__nameIndex.removeTree(node)
+                self.__nameIndex.addTree(newNode)
+            sizeDelta = newNode.allSize - node.allSize
+            dirDelta = newNode.dirCount - node.dirCount
+            fileDelta = newNode.fileCount - node.fileCount
+            if self.__breakdownTime is not None:
+                breakdownDelta = None
+                if node.breakdown is not None:
+                    breakdownDelta = newNode.breakdown.copy()
+                    breakdownDelta.add(node.breakdown, -1)
+                self.__applyBreakdownDelta(parent, breakdownDelta)
+                self.__dropDeepBreakdown(newNode)
+        else:
+            newNode = None
+            self.__forgetSortOrder(node)
+            parent.removeChild(node)
+            if self.__nameIndex is not None:
+                self.__nameIndex.removeTree(node)
+            sizeDelta = -node.allSize
+            dirDelta = -node.dirCount - 1
+            fileDelta = -node.fileCount
+            if self.__breakdownTime is not None:
+                breakdownDelta = None
+                if node.breakdown is not None:
+                    breakdownDelta = SizeBreakdown()
+                    breakdownDelta.add(node.breakdown, -1)
+                self.__applyBreakdownDelta(parent, breakdownDelta)
+        DirManager.__applyDelta(parent, sizeDelta, dirDelta, fileDelta)
+        self.__invalidateSortOrder(parent)
+        return newNode
+
+    def findNode(self, pathDirName: str):
+        """ 根据路径查找节点，不存在时返回None """
+        node, found = self.__findNearestNode(pathDirName)
+        return node if found else None
+
+    def __findNearestNode(self, pathDirName: str) -> tuple:
+        """ 根据路径查找节点，节点不存在（如位于未展开的文件夹中）时查找其最深的祖先节点
+        :returns: (节点, 是否为该路径的节点)，路径不在树中时节点为None
+        """
+        node = self.__dirTree
+        if node is None:
+            return None, False
+        pathDirName = pathDirName.replace('\\', '/')
+        if pathDirName == node.pathDirName:
+            return node, True
+        rootPath = node.pathDirName.rstrip('/') + '/'
+        if not pathDirName.startswith(rootPath):
+            return None, False
+        for dirName in pathDirName[len(rootPath):].split('/'):
+            for child in node.children:
+                if child.dirName == dirName:
+                    node = child
+                    break
             else:
-                if ignoreCase:
-                    text = text.lower()
-                    result = [node for node in nodes if node.dirName.lower().find(text) >= 0]
-                else:
-                    result = [node for node in nodes if node.dirName.find(text) >= 0]
-        except:
-            pass
+                return node, False
+        return node, True
+
+    def updateDirs(self, pathDirNames) -> list:
+        """ 重新读取发生变化的文件夹（不递归），新出现的子文件夹完整扫描，并将变化累加到各祖先节点
+        未展开的文件夹（超过最大深度）及其中的子孙文件夹发生变化时，整体重新合计该文件夹
+        :param pathDirNames: 发生变化的文件夹路径
+        :returns: 重新读取了的节点（整体重新合计的节点被替换，返回其父节点）；重新扫描了根文件夹时只返回新的根节点
+        """
+        if self.readOnly:
+            raise ValueError('二进制快照为只读，不能刷新')
+        result = []
+        resummedPaths = set()  # 已整体重新合计的文件夹
+        for pathDirName in sorted(set(pathDirNames), key=lambda path: path.count('/')):
+            node, found = self.__findNearestNode(pathDirName)
+            if node is None:
+                continue
+            if self.__isCollapsed(node):
+                if node.pathDirName in resummedPaths:
+                    continue
+                resummedPaths.add(node.pathDirName)
+                parent = node.parent
+                self.refreshNode(node)
+                if parent is None:
+                    return [self.__dirTree]
+                result.append(parent)
+                continue
+            if not found:
+                # 被排除或尚未出现在父文件夹中的文件夹，由父文件夹的更新负责
+                continue
+            listing = listDir(node.pathDirName, ListOptions(self.__recordFiles, excludes=self.__excludes,
+                                                            rootDevice=self.__rootDevice,
+                                                            breakdownTime=self.__breakdownTime))
+            breakdownDelta = None  # 分类统计的变化，无法准确计算时为None
+            if self.__breakdownTime is not None and node.breakdown is not None and \
+                    all(child.breakdown is not None for child in node.children):
+                oldOwnBreakdown = node.breakdown.copy()
+                for child in node.children:
+                    oldOwnBreakdown.add(child.breakdown, -1)
+                breakdownDelta = listing.breakdown.copy()
+                breakdownDelta.add(oldOwnBreakdown, -1)
+            ownFileCount = node.fileCount - sum(child.fileCount for child in node.children)
+            sizeDelta = listing.selfSize - node.selfSize
+            dirDelta = 0
+            fileDelta = listing.fileCount - ownFileCount
+            node.selfSize = listing.selfSize
+            node.canVisit = listing.canVisit
+            node.files = listing.files
+            subDirNames = {dirName for dirName, _ in listing.subDirs}
+            for child in [child for child in node.children if child.dirName not in subDirNames]:
+                self.__forgetSortOrder(child)
+                node.removeChild(child)
+                if self.__nameIndex is not None:
+                    self.__nameIndex.removeTree(child)
+                sizeDelta -= child.allSize
+                dirDelta -= child.dirCount + 1
+                fileDelta -= child.fileCount
+                if breakdownDelta is not None:
+                    breakdownDelta.add(child.breakdown, -1)
+            childNames = {child.dirName for child in node.children}
+            for dirName, subPathDirName in listing.subDirs:
+                if dirName not in childNames:
+                    newNode = DirTreeNode(subPathDirName, dirName)
+                    newNode.depth = node.depth + 1
+                    self.__scanTree(newNode)
+                    self.__sortNewTree(newNode)
+                    newNode = node.appendChild(newNode)
+                    if self.__nameIndex is not None:
+                        self.__nameIndex.addTree(newNode)
+                    sizeDelta += newNode.allSize
+                    dirDelta += newNode.dirCount + 1
+                    fileDelta += newNode.fileCount
+                    if breakdownDelta is not None:
+                        breakdownDelta.add(newNode.breakdown)
+                    self.__dropDeepBreakdown(newNode)
+            DirManager.__applyDelta(node, sizeDelta, dirDelta, fileDelta)
+            if self.__breakdownTime is not None:
+                self.__applyBreakdownDelta(node, breakdownDelta)
+            self.__invalidateSortOrder(node)
+            result.append(node)
         return result
 
-    def sort(self, key: str):
-        """ 排序 """
+    def watch(self, callback, delay: float = 1.0, pollInterval: float = 5.0, usePolling: bool = False):
+        """ 监视文件夹变化
+        :param callback: 在监视线程中调用，参数为合并后发生变化的文件夹路径列表，通常转交给updateDirs处理
+        :param delay: 合并变化事件的时间窗口（秒）
+        :param pollInterval: 轮询方式的检查间隔（秒）
+        :param usePolling: 是否强制使用轮询方式（非Linux系统或inotify不可用时自动使用）
+        :returns: 已启动的监视器（dirWatcher.DirWatcher），调用其stop方法停止监视；
+                  遍历并开始监视各文件夹在监视线程中进行，进度和结果见监视器的watchedCount、ready、setupError
+        """
+        if self.readOnly:
+            raise ValueError('二进制快照为只读，不能监视')
+        from dirWatcher import createDirWatcher
+        # 按与扫描相同的排除规则监视磁盘上的所有文件夹，未展开的文件夹中的变化由updateDirs归到该文件夹
+        pruneOptions = ListOptions(excludes=self.__excludes, rootDevice=self.__rootDevice)
+        watcher = createDirWatcher(self.__dirTree.pathDirName, callback, delay, pollInterval, usePolling, pruneOptions)
+        watcher.start()
+        return watcher
+
+    def searchNode(self, text: str, ignoreCase: bool, regex: bool):
+        """ 搜索名称匹配的节点，首次搜索时建立文件夹名索引
+        :returns: 逐个产生匹配节点的生成器，正则表达式有误时立即抛出re.error
+        """
+        if self.__dirTree is None:
+            return iter(())
+        if self.__nameIndex is None or self.__nameIndex.needsRebuild:
+            from nameIndex import DirNameIndex
+            startTime = time.perf_counter()
+            self.__nameIndex = DirNameIndex(self.__dirTree, self.__mappedTree is not None and
+                                            self.__mappedTree.hasNameTable)
+            if self.__stats is not None:
+                self.__stats.addTime('index', time.perf_counter() - startTime)
+        return self.__nameIndex.search(text, ignoreCase, regex)
+
+    def sort(self, key: str, nodes=None):
+        """ 排序，每次调用切换该关键字的排序方向
+        :param nodes: 只对这些节点的子节点排序（如界面上已展开的节点），其余节点在ensureSorted时再排序；
+                      为None时对整棵树排序
+        """
         if self.__dirTree is None:
             return
         self.__sortInOrders[key] = not self.__sortInOrders[key]
+        self.__sortKey = key
+        self.__sortReverse = self.__sortInOrders[key]
+        if nodes is not None:
+            for node in nodes:
+                self.ensureSorted(node)
+            return
+        startTime = time.perf_counter()
         keyFunc = DirManager.__keyFuncs[key]
-        inOrder = self.__sortInOrders[key]
+        if key == 'name' and self.__stats is not None:
+            self.__convertNames(self.__dirTree.preorderTraversal())
         nodeStack = [self.__dirTree]
         while nodeStack:
             curNode = nodeStack.pop()
-            curNode.children.sort(key=keyFunc, reverse=inOrder)
+            curNode.sortChildren(keyFunc, self.__sortReverse)
             nodeStack.extend(curNode.children)
+        if self.__stats is not None:
+            self.__stats.addTime('sort', time.perf_counter() - startTime)
+        self.__defaultSortState = (key, self.__sortReverse)
+        self.__sortStateDic.clear()
+        self.__sortedOrderDic.clear()
 
-    def export(self, file):
-        """ 导出文件夹（包括文件）树状图至文件 """
+    def ensureSorted(self, node) -> bool:
+        """ 使节点的子节点按当前的排序方式排列
+        只是排序方向改变时直接逆序，否则优先使用缓存的该关键字的升序结果
+        :returns: 子节点顺序是否被重新排列
+        """
+        if self.__sortKey is None:
+            return False
+        targetState = (self.__sortKey, self.__sortReverse)
+        curState = self.__sortStateDic.get(node, self.__defaultSortState)
+        if curState == targetState:
+            return False
+        startTime = time.perf_counter() if self.__stats is not None else 0
+        if curState is not None and curState[0] == self.__sortKey:
+            node.setChildrenOrder(node.children[::-1])
+        else:
+            sortedOrders = self.__sortedOrderDic.setdefault(node, {})
+            ascendingChildren = sortedOrders.get(self.__sortKey)
+            if ascendingChildren is None:
+                children = node.children
+                if self.__sortKey == 'name' and self.__stats is not None:
+                    self.__convertNames(children)
+                ascendingChildren = sorted(children, key=DirManager.__keyFuncs[self.__sortKey])
+                sortedOrders[self.__sortKey] = ascendingChildren
+            node.setChildrenOrder(ascendingChildren[::-1] if self.__sortReverse else ascendingChildren)
+        self.__sortStateDic[node] = targetState
+        if self.__stats is not None:
+            self.__stats.addTime('sort', time.perf_counter() - startTime)
+        return True
 
-        def writeOneNode(node):
-            """ 记录一个节点 """
-            file.write(f'{indentStr * node.depth}*{node.dirName}\n')
-            # 记录子文件夹
-            for child in node.children:
-                writeOneNode(child)
-            # 记录文件
-            for fileName in os.listdir(node.pathDirName):
-                if os.path.isfile(os.path.join(node.pathDirName, fileName).replace('\\', '/')):
-                    file.write(f'{indentStr * (node.depth + 1)}{fileName}\n')
+    def export(self, file, fileFormat: str = 'text', includeFiles: bool = True):
+        """ 导出文件夹（包括文件）信息至文件，打开的二进制快照不记录文件，只导出文件夹（不读取当前的磁盘）
+        :param file: 以文本模式打开的文件
+        :param fileFormat: 导出格式，'text'（树状图）、'csv'、'ndjson'或'json'
+        :param includeFiles: 是否导出文件，扫描时没有记录文件（见recordFiles）时导出需要重新读取各文件夹；
+                             为False时只导出文件夹
+        """
+        if self.__dirTree is None:
+            return
+        from treeExport import exportTree
+        startTime = time.perf_counter()
+        exportTree(self.__dirTree, file, fileFormat, includeFiles=includeFiles and not self.readOnly)
+        if self.__stats is not None:
+            self.__stats.addTime('export', time.perf_counter() - startTime)
+
+    def saveSnapshot(self, file):
+        """ 保存快照，用于之后与新的扫描结果对比（见snapshot模块）
+        :param file: 以文本模式（utf-8）打开的文件
+        """
+        if self.__dirTree is None:
+            return
+        from snapshot import saveSnapshot
+        saveSnapshot(self.__dirTree, file)
 
+    def saveBinarySnapshot(self, file):
+        """ 保存二进制快照，之后可以用openBinarySnapshot直接打开而不必扫描
+        :param file: 以二进制模式打开的文件
+        """
         if self.__dirTree is None:
             return
-        indentStr = '    '  # 缩进字符串
-        writeOneNode(self.__dirTree)
+        from binarySnapshot import saveBinarySnapshot
+        startTime = time.perf_counter()
+        saveBinarySnapshot(self.__dirTree, file)
+        if self.__stats is not None:
+            self.__stats.addTime('snapshot', time.perf_counter() - startTime)
+
+    def close(self):
+        """ 关闭打开的二进制快照，之后不能再访问节点 """
+        if self.__mappedTree is not None:
+            self.__mappedTree.close()
+            self.__mappedTree = None
+
+    def diffSnapshot(self, fileName: str, limit: int = 0, allowOtherRoot: bool = False) -> list:
+        """ 对比快照与当前的文件夹树，快照文件格式有误时抛出ValueError
+        :param limit: 只返回变化最大的若干项，为0时返回全部
+        :param allowOtherRoot: 是否允许对比其他根文件夹的快照，为False时快照的根文件夹不同抛出ValueError
+        :returns: 按大小变化的绝对值降序排列的[snapshot.DirChange]
+        """
+        if self.__dirTree is None:
+            return []
+        from snapshot import readSnapshotHeader, checkSnapshotRoot, iterSnapshotRecords, iterTreeRecords, diffRecords
+        with open(fileName, encoding='utf-8') as file:
+            rootPath, _ = readSnapshotHeader(file)
+            if not allowOtherRoot:
+                checkSnapshotRoot(rootPath, self.__dirTree.pathDirName)
+            return diffRecords(iterSnapshotRecords(file), iterTreeRecords(self.__dirTree), limit)
 
-    def __buildDirTree(self):
+    def __buildDirTree(self, onNodeListed=None, cancelEvent=None):
         """ 建立文件夹信息树 """
+        if self.__snapshotFile is not None:
+            self.__openSnapshot()
+            return
         try:
-            self.__dirTree = DirTreeNode(self.__pathDirName.replace('\\', '/'), self.__pathDirName)
-            dirNodeQueue = queue.Queue()
-            dirNodeQueue.put(self.__dirTree)
-            while not dirNodeQueue.empty():
-                curNode = dirNodeQueue.get()
-                try:
-                    for dirName in os.listdir(curNode.pathDirName):
-                        pathDirName = os.path.join(curNode.pathDirName, dirName).replace('\\', '/')
-                        if os.path.isdir(pathDirName):
-                            newNode = DirTreeNode(pathDirName, dirName)
-                            curNode.appendChild(newNode)
-                            dirNodeQueue.put(newNode)
-                            curNode.dirCount += 1
-                        else:
-                            curNode.fileCount += 1
-                except PermissionError:
-                    curNode.canVisit = False
-
-            nodes = self.__dirTree.postorderTraversal()
-            for i in range(len(nodes)):
-                node = nodes[i]
-                node.selfSize = max(DirManager.__getDirSizeWithoutSubdirs(node.pathDirName), 0)
-                node.allSize = node.selfSize + sum([child.allSize for child in node.children])
-                if node.allSize:
-                    for child in node.children:
-                        child.sizePercent = child.allSize / node.allSize * 100
-                node.dirCount += sum([child.dirCount for child in node.children])
-                node.fileCount += sum([child.fileCount for child in node.children])
-            nodes[-1].sizePercent = 100
-        except:
+            rootNode = DirTreeNode(self.__pathDirName.replace('\\', '/'), self.__pathDirName)
+            if not os.path.isdir(rootNode.pathDirName):
+                raise NotADirectoryError(rootNode.pathDirName)
+            compileExcludes(self.__excludes)  # 规则有误时尽早抛出
+            self.__rootDevice = os.stat(rootNode.pathDirName).st_dev if self.__oneFileSystem else None
+            store = CompactDirTree(rootNode.pathDirName) if self.__compact else None
+            ranking = SizeRanking(self.__topCount) if self.__topCount > 0 else None
+            prunedDirs = []
+            self.__breakdownTime = time.time() if self.__breakdown else None
+            self.__dirTree = self.__scanTree(rootNode, onNodeListed, cancelEvent, store, ranking, prunedDirs)
+            self.__ranking = ranking
+            self.__prunedDirs = prunedDirs
+            self.__scanError = None
+            self.__defaultSortState = None
+            self.__sortStateDic = {}
+            self.__sortedOrderDic = {}
+            self.__nameIndex = None
+        except ScanCancelledError:
+            raise
+        except Exception as e:
             self.__dirTree = None
+            self.__scanError = e
+            if self.__stats is not None:
+                self.__stats.lastError = e
+                self.__stats.errorCount += 1
 
-    @staticmethod
-    def __getDirSizeWithoutSubdirs(pathDirName: str) -> int:
-        """ 获取文件夹中直属文件的总大小
-        :returns: 返回负数表示获取失败
-        """
+    def __openSnapshot(self):
+        """ 打开二进制快照代替扫描 """
+        from binarySnapshot import MappedDirTree
+        startTime = time.perf_counter()
+        self.close()
+        self.__defaultSortState = None
+        self.__sortStateDic = {}
+        self.__sortedOrderDic = {}
+        self.__nameIndex = None
         try:
-            return sum([os.path.getsize(os.path.join(pathDirName, fileName)) for fileName in os.listdir(pathDirName)
-                        if os.path.isfile(os.path.join(pathDirName, fileName))])
-        except:
-            return -1
+            self.__mappedTree = MappedDirTree(self.__snapshotFile)
+            self.__dirTree = self.__mappedTree.root
+            self.__pathDirName = self.__mappedTree.rootPathDirName
+            self.__scanError = None
+        except (OSError, ValueError) as e:
+            self.__dirTree = None
+            self.__scanError = e
+            if self.__stats is not None:
+                self.__stats.lastError = e
+                self.__stats.errorCount += 1
+        if self.__stats is not None:
+            self.__stats.addTime('open', time.perf_counter() - startTime)
+
+    def __sortNewTree(self, rootNode: DirTreeNode):
+        """ 将新扫描的子树排列为未单独排序的节点的顺序 """
+        if self.__defaultSortState is None:
+            return
+        key, reverse = self.__defaultSortState
+        keyFunc = DirManager.__keyFuncs[key]
+        for curNode in rootNode.preorderTraversal():
+            curNode.sortChildren(keyFunc, reverse)
+
+    def __convertNames(self, nodes):
+        """ 预先计算（缓存）节点名称的排序关键字，单独统计拼音转换的耗时 """
+        startTime = time.perf_counter()
+        for node in nodes:
+            getNameSortKey(node.dirName)
+        seconds = time.perf_counter() - startTime
+        self.__stats.addTime('pinyin', seconds)
+        self.__stats.addTime('sort', -seconds)  # 已计入pinyin
+
+    def __invalidateSortOrder(self, node):
+        """ 节点及其祖先节点的子节点或大小发生变化，需要重新排序 """
+        if self.__sortKey is None:
+            return
+        while node is not None:
+            self.__sortStateDic[node] = None
+            self.__sortedOrderDic.pop(node, None)
+            node = node.parent
+
+    def __isCollapsed(self, node) -> bool:
+        """ 节点是否不展开子节点（超过最大深度） """
+        return self.__maxDepth is not None and node.depth >= self.__maxDepth
+
+    def __forgetSortOrder(self, rootNode):
+        """ 子树被移除，清除其排序记录 """
+        if not self.__sortStateDic and not self.__sortedOrderDic:
+            return
+        for curNode in rootNode.preorderTraversal():
+            self.__sortStateDic.pop(curNode, None)
+            self.__sortedOrderDic.pop(curNode, None)
+
+    def __applyBreakdownDelta(self, node, breakdownDelta):
+        """ 将分类统计的变化累加到节点及其各祖先节点
+        :param breakdownDelta: 变化（SizeBreakdown），为None表示变化涉及已不保留的分类统计，这些节点的统计标记为过期
+        """
+        while node is not None:
+            breakdown = node.breakdown
+            if breakdown is not None:
+                if breakdownDelta is None:
+                    breakdown.outdated = True
+                else:
+                    breakdown.add(breakdownDelta)
+            node = node.parent
+
+    def __dropDeepBreakdown(self, node):
+        """ 新扫描的子树的根节点超过保留深度时不再保留其分类统计 """
+        if self.__breakdownDepth is not None and node.depth > self.__breakdownDepth:
+            node.breakdown = None
+
+    @staticmethod
+    def __applyDelta(node: DirTreeNode, sizeDelta: int, dirDelta: int, fileDelta: int):
+        """ 将大小和数量的变化累加到节点及其各祖先节点，并重新计算受影响节点的百分比 """
+        ancestor = node
+        while ancestor is not None:
+            ancestor.allSize += sizeDelta
+            ancestor.dirCount += dirDelta
+            ancestor.fileCount += fileDelta
+            ancestor = ancestor.parent
+        # 只有node及其祖先节点的大小发生变化，仅需重新计算这些节点的子节点的百分比
+        ancestor = node
+        while ancestor is not None:
+            for child in ancestor.children:
+                child.sizePercent = child.allSize / ancestor.allSize * 100 if ancestor.allSize else 0
+            if not sizeDelta:
+                break
+            ancestor = ancestor.parent
+
+    def __scanTree(self, rootNode: DirTreeNode, onNodeListed=None, cancelEvent=None, store=None, ranking=None,
+                   prunedDirs=None):
+        """ 扫描以rootNode为根的子树 """
+        if self.__cacheFile:
+            from scanCache import ScanCache
+            with ScanCache(self.__cacheFile, self.__pathDirName.replace('\\', '/')) as cache:
+                return DirScanner(rootNode, self.__workers, self.__useProcess, cache,
+                                  onNodeListed, cancelEvent, store, self.__recordFiles, ranking, self.__stats,
+                                  self.__excludes, self.__maxDepth, self.__rootDevice, prunedDirs,
+                                  self.__breakdownTime, self.__breakdownDepth).scan()
+        return DirScanner(rootNode, self.__workers, self.__useProcess, None,
+                          onNodeListed, cancelEvent, store, self.__recordFiles, ranking, self.__stats,
+                          self.__excludes, self.__maxDepth, self.__rootDevice, prunedDirs,
+                          self.__breakdownTime, self.__breakdownDepth).scan()
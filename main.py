@@ -1,3 +1,11 @@
+import sys
+
+
+if len(sys.argv) > 1:
+    # 带参数时作为命令行工具运行，不导入tkinter
+    import cli
+    sys.exit(cli.main())
+
 import mainWindow
 
 
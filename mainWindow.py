@@ -2,13 +2,22 @@
 主窗口
 """
 
+import itertools
 import os
+import queue
+import re
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
+from tkinter import messagebox
 from toolTip import ToolTip
+from rankingWindow import RankingWindow
+from diffWindow import DiffWindow
+from nodeViewModel import NodeViewModel
 import icon
-from fileUtils import ByteUnit, byteUnitCountDic, DirManager
+from fileUtils import ByteUnit, byteUnitCountDic, DirManager, isNetworkPath, ScanCancelledError, ScanStats
 
 
 class MainWindow(tk.Tk):
@@ -20,6 +29,19 @@ class MainWindow(tk.Tk):
     __initHeight = 900
     __topOff = 50
     __toolTipDelay = 0.5
+    __networkScanWorkers = 8  # 自动设置时网络路径并发读取文件夹的线程数（本地磁盘单线程读取更快）
+    __watchCheckInterval = 500  # 监视模式下检查文件夹变化的间隔（毫秒）
+    __scanCheckInterval = 100  # 后台扫描时刷新列表的间隔（毫秒）
+    __scanBatchSize = 20000  # 后台扫描时每次刷新最多处理的已读取文件夹数（大部分不插入项）
+    __searchBatchSize = 200  # 每次选中的搜索结果数
+    __rankingCount = 100  # 扫描时统计的最大文件和文件夹数
+    __breakdownDepth = 3  # 保留分类统计的最大深度
+    __breakdownExtCount = 50  # 分类统计面板显示的扩展名数
+    __exportFileTypes = [('text files', '.txt'), ('csv files', '.csv'), ('ndjson files', '.ndjson'),
+                         ('json files', '.json')]
+    __snapshotFileTypes = [('snapshot files', '.snapshot')]
+    __binarySnapshotFileTypes = [('binary snapshot files', '.fsnap')]
+    __exportFormatDic = {'.txt': 'text', '.csv': 'csv', '.ndjson': 'ndjson', '.json': 'json'}  # {扩展名: 导出格式}
 
     def __init__(self):
         """ 初始化 """
@@ -32,9 +54,22 @@ class MainWindow(tk.Tk):
 
         self.__dirManager = None
         self.__unit = ByteUnit.byte
+        self.__viewModel = NodeViewModel(self.__unit)
+        self.__childUnitDic = {}  # {已插入子项的项: 其子项显示的单位}，单位不同时在展开时再更新子项
         self.__ignoreCase = True
         self.__regex = False
         self.__nodeItemDic = {}
+        self.__itemNodeDic = {}
+        self.__placeholderDic = {}  # {尚未插入子项的项: 占位项}
+        self.__watcher = None
+        self.__dirChangeQueue = queue.Queue()
+        self.__scanDirName = ''
+        self.__scanTask = None
+        self.__searchResults = None
+        self.__excludeGlobs = []  # 扫描时排除的文件夹的通配符
+        self.__oneFileSystem = False  # 扫描时是否只统计根文件夹所在的文件系统
+        self.__scanWorkers = 0  # 扫描时并发读取文件夹的线程数，为0时自动设置
+        self.__recordFiles = False  # 扫描时是否记录各文件夹的直属文件（导出文件时不必再次读取磁盘，但占用更多内存）
         self.__initWidget()
 
     def __initWidget(self):
@@ -52,6 +87,17 @@ class MainWindow(tk.Tk):
         self.__loadDirButton.pack(side=tk.LEFT)
         ToolTip(self.__loadDirButton, '扫描', delay=MainWindow.__toolTipDelay, follow=False)
 
+        self.__cancelButton = tk.Button(self.__topFrame, command=self.__clickCancelButton, relief='flat',
+                                        text='取消', bg='white')
+        self.__cancelButton.pack(side=tk.LEFT)
+        ToolTip(self.__cancelButton, '取消扫描', delay=MainWindow.__toolTipDelay, follow=False)
+
+        self.__openSnapshotButton = tk.Button(self.__topFrame, command=self.__clickOpenSnapshotButton, relief='flat',
+                                              text='载入', bg='white')
+        self.__openSnapshotButton.pack(side=tk.LEFT)
+        ToolTip(self.__openSnapshotButton, '打开二进制快照（只读，不扫描磁盘）', delay=MainWindow.__toolTipDelay,
+                follow=False)
+
         self.__exportButton = tk.Button(self.__topFrame, command=self.__clickExportButton, relief='flat',
                                         image=self.__icons.exportImage, bg='white')
         self.__exportButton.pack(side=tk.LEFT)
@@ -60,13 +106,44 @@ class MainWindow(tk.Tk):
         self.__refreshButton = tk.Button(self.__topFrame, command=self.__clickRefreshButton, relief='flat',
                                          image=self.__icons.refreshImage, bg='white')
         self.__refreshButton.pack(side=tk.LEFT)
-        ToolTip(self.__refreshButton, '刷新', delay=MainWindow.__toolTipDelay, follow=False)
+        ToolTip(self.__refreshButton, '刷新（选中文件夹时只刷新该文件夹）', delay=MainWindow.__toolTipDelay, follow=False)
+
+        self.__watchButton = tk.Button(self.__topFrame, command=self.__clickWatchButton, relief='flat',
+                                       text='监视', bg='white')
+        self.__watchButton.pack(side=tk.LEFT)
+        ToolTip(self.__watchButton, '监视文件夹变化并自动更新', delay=MainWindow.__toolTipDelay, follow=False)
 
         self.__openButton = tk.Button(self.__topFrame, command=self.__clickOpenButton, relief='flat',
                                       image=self.__icons.openImage, bg='white')
         self.__openButton.pack(side=tk.LEFT)
         ToolTip(self.__openButton, '打开', delay=MainWindow.__toolTipDelay, follow=False)
 
+        self.__rankingButton = tk.Button(self.__topFrame, command=self.__clickRankingButton, relief='flat',
+                                         text='排行', bg='white')
+        self.__rankingButton.pack(side=tk.LEFT)
+        ToolTip(self.__rankingButton, '最大的文件和文件夹', delay=MainWindow.__toolTipDelay, follow=False)
+
+        self.__snapshotButton = tk.Button(self.__topFrame, command=self.__clickSnapshotButton, relief='flat',
+                                          text='快照', bg='white')
+        self.__snapshotButton.pack(side=tk.LEFT)
+        ToolTip(self.__snapshotButton, '保存快照（.fsnap为可直接载入的二进制快照）', delay=MainWindow.__toolTipDelay, follow=False)
+
+        self.__diffButton = tk.Button(self.__topFrame, command=self.__clickDiffButton, relief='flat',
+                                      text='对比', bg='white')
+        self.__diffButton.pack(side=tk.LEFT)
+        ToolTip(self.__diffButton, '与保存的快照对比', delay=MainWindow.__toolTipDelay, follow=False)
+
+        self.__statsButton = tk.Button(self.__topFrame, command=self.__clickStatsButton, relief='flat',
+                                       text='统计', bg='white')
+        self.__statsButton.pack(side=tk.LEFT)
+        ToolTip(self.__statsButton, '扫描耗时与最慢的文件夹', delay=MainWindow.__toolTipDelay, follow=False)
+
+        self.__excludeButton = tk.Button(self.__topFrame, command=self.__clickExcludeButton, relief='flat',
+                                         text='排除', bg='white')
+        self.__excludeButton.pack(side=tk.LEFT)
+        ToolTip(self.__excludeButton, '设置扫描时排除的文件夹和并发线程数，查看上次扫描排除的文件夹',
+                delay=MainWindow.__toolTipDelay, follow=False)
+
         ttk.Separator(self.__topFrame, orient='vertical').pack(side=tk.LEFT, fill=tk.Y, padx=3)
         self.__changeUnitButton = tk.Button(self.__topFrame, command=self.__clickChangeUnitButton,
                                             relief='flat', image=self.__icons.BImage, bg='white')
@@ -74,6 +151,9 @@ class MainWindow(tk.Tk):
         ToolTip(self.__changeUnitButton, '切换单位', delay=MainWindow.__toolTipDelay, follow=False)
         ttk.Separator(self.__topFrame, orient='vertical').pack(side=tk.LEFT, fill=tk.Y, padx=3)
 
+        self.__scanInfoLabel = tk.Label(self.__topFrame, bg='white')
+        self.__scanInfoLabel.pack(side=tk.LEFT)
+
         self.__searchButton = tk.Button(self.__topFrame, command=self.__clickSearchButton, relief='flat',
                                         image=self.__icons.searchImage, bg='white')
         self.__searchButton.pack(side=tk.RIGHT)
@@ -93,16 +173,12 @@ class MainWindow(tk.Tk):
         self.__searchEntry.pack(side=tk.RIGHT, padx=5)
         self.__searchEntry.bind('<Return>', lambda event: self.__clickSearchButton())
 
-        self.__exportButton.configure(state='disabled')
-        self.__refreshButton.configure(state='disabled')
-        self.__openButton.configure(state='disabled')
-        self.__ignoreCaseButton.configure(state='disabled')
-        self.__regexButton.configure(state='disabled')
-        self.__searchButton.configure(state='disabled')
-        self.__searchEntry.configure(state='disabled')
+        self.__cancelButton.configure(state='disabled')
+        self.__setDataButtonState('disabled')
 
     def __initDataFrame(self):
         """ 初始化数据页面 """
+        self.__initBreakdownFrame()
         self.__scrollbar = tk.Scrollbar(self)
         self.__scrollbar.pack(fill=tk.Y, side=tk.RIGHT)
         self.__treeView = ttk.Treeview(self, yscrollcommand=self.__scrollbar.set, columns=(None,)*5)
@@ -119,13 +195,36 @@ class MainWindow(tk.Tk):
         self.__treeView.column('#4', anchor=tk.E)
         self.__treeView.column('#5', anchor=tk.E)
         self.__treeView.pack(expand=1, fill=tk.BOTH)
+        self.__treeView.tag_configure('cannotVisit', background="yellow")
+        self.__treeView.bind('<<TreeviewOpen>>', self.__onTreeviewOpen)
+        self.__treeView.bind('<<TreeviewSelect>>', lambda event: self.__showBreakdown())
         self.__scrollbar.config(command=self.__treeView.yview)
 
+    def __initBreakdownFrame(self):
+        """ 初始化右侧的分类统计面板（选中文件夹的文件按扩展名和修改时间分类） """
+        self.__breakdownFrame = tk.Frame(self)
+        self.__breakdownFrame.pack(side=tk.RIGHT, fill=tk.Y)
+        self.__breakdownLabel = tk.Label(self.__breakdownFrame, anchor=tk.W)
+        self.__breakdownLabel.pack(fill=tk.X)
+        self.__extTreeView = ttk.Treeview(self.__breakdownFrame, columns=(None,)*3, height=20)
+        self.__ageTreeView = ttk.Treeview(self.__breakdownFrame, columns=(None,)*3, height=7)
+        for treeView, title in ((self.__extTreeView, '扩展名'), (self.__ageTreeView, '修改时间')):
+            treeView.heading('#0', text=title)
+            treeView.heading('#1', text='大小')
+            treeView.heading('#2', text='文件数')
+            treeView.heading('#3', text='百分比')
+            treeView.column('#0', width=100)
+            for column in ('#1', '#2', '#3'):
+                treeView.column(column, width=100, anchor=tk.E)
+        self.__extTreeView.pack(fill=tk.BOTH, expand=True)
+        self.__ageTreeView.pack(fill=tk.X)
+
     def __clearData(self):
         """ 清空数据 """
         roots = self.__treeView.get_children()
         for root in roots:
             self.__treeView.delete(root)
+        self.__showBreakdown()
 
     def __clearSelection(self):
         """ 清空选择 """
@@ -133,42 +232,334 @@ class MainWindow(tk.Tk):
 
     def __showData(self):
         """ 显示数据 """
+        self.__searchResults = None
         self.__clearData()
         self.__nodeItemDic = {None: ''}
+        self.__itemNodeDic = {}
+        self.__placeholderDic = {}
+        self.__childUnitDic = {}
+        self.__viewModel.clear()
         if self.__dirManager is None or self.__dirManager.dirTree is None:
             buttonState = 'disabled'
         else:
             buttonState = 'normal'
-            unitRate = byteUnitCountDic[self.__unit]
-            sizeFormat = '0f' if self.__unit == ByteUnit.byte else '3f'
-            dirNodes = self.__dirManager.dirTree.preorderTraversal()
-            for curNode in dirNodes:
-                parentItem = self.__nodeItemDic[curNode.parent] if curNode.parent in self.__nodeItemDic else ''
-                self.__nodeItemDic[curNode] = self.__treeView.insert(
-                    parentItem, 'end', text=curNode.dirName, open=not curNode.parent,
-                    values=(f'{curNode.selfSize / unitRate: .{sizeFormat}}',
-                            f'{curNode.allSize / unitRate: .{sizeFormat}}',
-                            f'{curNode.sizePercent:.3f}%', curNode.dirCount, curNode.fileCount, curNode.pathDirName),
-                    tags='' if curNode.canVisit else 'cannotVisit'
-                )
-            self.__treeView.tag_configure('cannotVisit', background="yellow")
-
-        self.__exportButton.configure(state=buttonState)
-        self.__refreshButton.configure(state=buttonState)
-        self.__openButton.configure(state=buttonState)
-        self.__ignoreCaseButton.configure(state=buttonState)
-        self.__regexButton.configure(state=buttonState)
-        self.__searchButton.configure(state=buttonState)
-        self.__searchEntry.configure(state=buttonState)
-
-    def __getNodeOpenDict(self) -> dict:
-        """ 获取{节点, 展开状态} """
-        return {key: self.__treeView.item(value, option='open') for key, value in self.__nodeItemDic.items()}
-
-    def __setItemOpen(self, nodeOpenDict: dict):
-        """ 设置节点展开状态 """
-        for node, isOpen in nodeOpenDict.items():
-            self.__treeView.item(self.__nodeItemDic[node], open=isOpen)
+            rootNode = self.__dirManager.dirTree
+            self.__insertNodeItem(rootNode, '', 'end')
+            self.__populateItem(rootNode)
+            self.__treeView.item(self.__nodeItemDic[rootNode], open=True)
+        self.__setDataButtonState(buttonState)
+        if self.__dirManager is not None and self.__dirManager.readOnly:
+            self.__refreshButton.configure(state='disabled')
+            self.__watchButton.configure(state='disabled')
+
+    def __setDataButtonState(self, state: str):
+        """ 设置依赖扫描数据的控件的状态 """
+        self.__exportButton.configure(state=state)
+        self.__refreshButton.configure(state=state)
+        self.__watchButton.configure(state=state)
+        self.__openButton.configure(state=state)
+        self.__rankingButton.configure(state=state)
+        self.__snapshotButton.configure(state=state)
+        self.__diffButton.configure(state=state)
+        self.__statsButton.configure(state=state)
+        self.__ignoreCaseButton.configure(state=state)
+        self.__regexButton.configure(state=state)
+        self.__searchButton.configure(state=state)
+        self.__searchEntry.configure(state=state)
+
+    def __insertNodeItem(self, node, parentItem: str, index) -> str:
+        """ 插入节点对应的项，有子节点时先插入占位项，展开时才插入子项 """
+        item = self.__treeView.insert(parentItem, index, text=node.dirName, open=False,
+                                      values=self.__viewModel.getValues(node),
+                                      tags='' if node.canVisit else 'cannotVisit')
+        self.__nodeItemDic[node] = item
+        self.__itemNodeDic[item] = node
+        if node.children:
+            self.__placeholderDic[item] = self.__treeView.insert(item, 'end', text='...')
+        return item
+
+    def __populateItem(self, node):
+        """ 插入节点的子项（尚未插入时），已插入的子项以其他单位显示时连同已展开的子孙项更新为当前单位 """
+        item = self.__nodeItemDic[node]
+        placeholder = self.__placeholderDic.pop(item, None)
+        if placeholder is None:
+            if self.__childUnitDic.get(item) != self.__viewModel.unit:
+                self.__updateOpenItems(item)
+            return
+        self.__childUnitDic[item] = self.__viewModel.unit
+        self.__treeView.delete(placeholder)
+        self.__dirManager.ensureSorted(node)
+        startTime = time.perf_counter()
+        for child in node.children:
+            self.__insertNodeItem(child, item, 'end')
+        if self.__dirManager.stats is not None:
+            self.__dirManager.stats.addTime('treeview', time.perf_counter() - startTime)
+
+    def __updateChildItems(self, item: str):
+        """ 以当前单位更新一个项的子项 """
+        for childItem in self.__treeView.get_children(item):
+            childNode = self.__itemNodeDic.get(childItem)
+            if childNode is not None:
+                self.__treeView.item(childItem, values=self.__viewModel.getValues(childNode))
+        self.__childUnitDic[item] = self.__viewModel.unit
+
+    def __updateVisibleItems(self):
+        """ 以当前单位更新可见（各祖先项均已展开）的项，其余项在展开时再更新 """
+        rootItems = self.__treeView.get_children('')
+        for item in rootItems:
+            node = self.__itemNodeDic.get(item)
+            if node is not None:
+                self.__treeView.item(item, values=self.__viewModel.getValues(node))
+        for item in rootItems:
+            if item not in self.__placeholderDic and self.__treeView.item(item, option='open'):
+                self.__updateOpenItems(item)
+
+    def __updateOpenItems(self, item: str):
+        """ 以当前单位更新一个已插入子项的项的子项，以及其中已展开的子孙项的子项 """
+        itemStack = [item]
+        while itemStack:
+            item = itemStack.pop()
+            self.__updateChildItems(item)
+            for childItem in self.__treeView.get_children(item):
+                if childItem not in self.__placeholderDic and self.__treeView.item(childItem, option='open'):
+                    itemStack.append(childItem)
+
+    def __reorderChildItems(self, node):
+        """ 按子节点的顺序移动已插入的子项 """
+        item = self.__nodeItemDic[node]
+        for index, child in enumerate(node.children):
+            childItem = self.__nodeItemDic.get(child)
+            if childItem is not None:
+                self.__treeView.move(childItem, item, index)
+
+    def __materializeNode(self, node) -> str:
+        """ 确保节点对应的项已插入（依次插入其各祖先节点的子项），并以当前单位显示 """
+        ancestors = []
+        curNode = node.parent
+        while curNode is not None:
+            ancestors.append(curNode)
+            curNode = curNode.parent
+        for ancestor in reversed(ancestors):
+            self.__populateItem(ancestor)
+        return self.__nodeItemDic[node]
+
+    def __removeNodeItems(self, rootNode):
+        """ 删除一个节点及其所有子孙节点对应的项 """
+        rootItem = self.__nodeItemDic[rootNode]
+        itemStack = [rootItem]
+        while itemStack:
+            item = itemStack.pop()
+            self.__placeholderDic.pop(item, None)
+            self.__childUnitDic.pop(item, None)
+            node = self.__itemNodeDic.pop(item, None)
+            if node is not None:
+                del self.__nodeItemDic[node]
+                self.__viewModel.invalidate(node)
+                itemStack.extend(self.__treeView.get_children(item))
+        self.__treeView.delete(rootItem)
+
+    def __syncChildItems(self, node):
+        """ 使节点的子项与其子节点一致 """
+        item = self.__nodeItemDic.get(node)
+        if item is None:
+            return
+        if item in self.__placeholderDic:
+            if not node.children:
+                self.__treeView.delete(self.__placeholderDic.pop(item))
+            return
+        children = set(node.children)
+        for childItem in self.__treeView.get_children(item):
+            childNode = self.__itemNodeDic[childItem]
+            if childNode not in children:
+                self.__removeNodeItems(childNode)
+        for child in node.children:
+            if child not in self.__nodeItemDic:
+                self.__insertNodeItem(child, item, 'end')
+
+    def __onTreeviewOpen(self, _):
+        """ 展开项时插入其子项 """
+        node = self.__itemNodeDic.get(self.__treeView.focus())
+        if node is None:
+            return
+        if self.__scanTask is not None:
+            self.__populateScanItem(node)
+        else:
+            self.__populateItem(node)
+
+    def __updateAncestorItems(self, nodes):
+        """ 更新节点及其祖先节点、以及它们的子节点对应的项（百分比和顺序可能变化） """
+        updatedNodes = set()
+        for node in nodes:
+            ancestor = node
+            while ancestor is not None and ancestor not in updatedNodes:
+                updatedNodes.add(ancestor)
+                for curNode in [ancestor] + ancestor.children:
+                    self.__viewModel.invalidate(curNode)
+                    if curNode in self.__nodeItemDic:
+                        self.__treeView.item(self.__nodeItemDic[curNode], values=self.__viewModel.getValues(curNode))
+                item = self.__nodeItemDic.get(ancestor)
+                if item is not None and item not in self.__placeholderDic and self.__dirManager.ensureSorted(ancestor):
+                    self.__reorderChildItems(ancestor)
+                ancestor = ancestor.parent
+
+    def __startScan(self, dirName: str):
+        """ 在后台线程中扫描文件夹，扫描过程中已读取的文件夹分批显示 """
+        self.__stopWatch()
+        self.__scanDirName = dirName
+        self.__clearData()
+        self.__nodeItemDic = {None: ''}
+        self.__itemNodeDic = {}
+        self.__placeholderDic = {}
+        self.__childUnitDic = {}
+        self.__viewModel.clear()
+        self.__setDataButtonState('disabled')
+        self.__loadDirButton.configure(state='disabled')
+        self.__openSnapshotButton.configure(state='disabled')
+        self.__cancelButton.configure(state='normal')
+        workers = self.__scanWorkers or (MainWindow.__networkScanWorkers if isNetworkPath(dirName) else 1)
+        scanTask = _ScanTask(dirName, workers, MainWindow.__rankingCount, self.__excludeGlobs,
+                             self.__oneFileSystem, MainWindow.__breakdownDepth, self.__recordFiles)
+        self.__scanTask = scanTask
+        scanTask.start()
+        self.after(MainWindow.__scanCheckInterval, self.__showScanProgress, scanTask)
+
+    def __showScanProgress(self, scanTask):
+        """ 显示后台扫描的进度，只插入根文件夹和已展开的项的子项，其余子项在展开时再插入 """
+        if scanTask is not self.__scanTask:
+            return
+        if scanTask.finished:
+            self.__finishScan(scanTask)
+            return
+        startTime = time.perf_counter()
+        for _ in range(MainWindow.__scanBatchSize):
+            try:
+                node = scanTask.nodeQueue.get_nowait()
+            except queue.Empty:
+                break
+            item = self.__nodeItemDic.get(node)
+            if item is not None:
+                # 展开父项时已插入，更新为读取后的数据
+                self.__treeView.item(item, values=self.__viewModel.formatValues(node),
+                                     tags='' if node.canVisit else 'cannotVisit')
+                if node.children and item not in self.__placeholderDic and not self.__treeView.get_children(item):
+                    self.__placeholderDic[item] = self.__treeView.insert(item, 'end', text='...')
+                    if self.__treeView.item(item, option='open'):
+                        self.__populateScanItem(node)
+            elif node.parent is None:
+                item = self.__insertScanItem(node, '')
+                self.__populateScanItem(node)
+                self.__treeView.item(item, open=True)
+            # 其余文件夹在展开父项时再插入
+        scanTask.stats.addTime('treeview', time.perf_counter() - startTime)
+        self.__scanInfoLabel['text'] = (f'已扫描 {scanTask.dirCount} 个文件夹，{scanTask.size:,} 字节，'
+                                        f'{scanTask.stats.errorCount} 个错误')
+        self.after(MainWindow.__scanCheckInterval, self.__showScanProgress, scanTask)
+
+    def __insertScanItem(self, node, parentItem: str) -> str:
+        """ 扫描中插入节点对应的项，有子节点时先插入占位项 """
+        item = self.__treeView.insert(parentItem, 'end', text=node.dirName, open=False,
+                                      values=self.__viewModel.formatValues(node),
+                                      tags='' if node.canVisit else 'cannotVisit')
+        self.__nodeItemDic[node] = item
+        self.__itemNodeDic[item] = node
+        if node.children:
+            self.__placeholderDic[item] = self.__treeView.insert(item, 'end', text='...')
+        return item
+
+    def __populateScanItem(self, node):
+        """ 扫描中展开项时插入其子项，尚未读取的子文件夹读取后再更新 """
+        item = self.__nodeItemDic[node]
+        placeholder = self.__placeholderDic.pop(item, None)
+        if placeholder is None:
+            return
+        self.__treeView.delete(placeholder)
+        for child in list(node.children):
+            self.__insertScanItem(child, item)
+
+    def __finishScan(self, scanTask):
+        """ 后台扫描结束（完成或取消） """
+        self.__scanTask = None
+        self.__loadDirButton.configure(state='normal')
+        self.__openSnapshotButton.configure(state='normal')
+        self.__cancelButton.configure(state='disabled')
+        if scanTask.cancelled:
+            self.__scanInfoLabel['text'] = '扫描已取消'
+        else:
+            self.__closeDirManager()
+            self.__dirManager = scanTask.dirManager
+            scanError = self.__dirManager.scanError
+            prunedCount = len(self.__dirManager.prunedDirs)
+            if scanError is not None:
+                self.__scanInfoLabel['text'] = f'扫描失败: {scanError}'
+            else:
+                self.__scanInfoLabel['text'] = f'已排除 {prunedCount} 个文件夹' if prunedCount else ''
+        self.__showData()
+
+    def __closeDirManager(self):
+        """ 关闭当前的数据（打开的二进制快照） """
+        if self.__dirManager is not None:
+            self.__dirManager.close()
+            self.__dirManager = None
+
+    def __stopWatch(self):
+        """ 停止监视文件夹变化 """
+        if self.__watcher is not None:
+            self.__watcher.stop()
+            self.__watcher = None
+            self.__watchButton.configure(relief='flat')
+            self.__scanInfoLabel['text'] = ''
+        self.__dirChangeQueue = queue.Queue()
+
+    def __applyDirChanges(self, watcher, wasReady: bool = False):
+        """ 在主线程中显示监视的准备进度，并应用监视到的文件夹变化 """
+        if watcher is not self.__watcher:
+            return
+        if watcher.setupError is not None:
+            self.__stopWatch()
+            self.__scanInfoLabel['text'] = f'监视失败: {watcher.setupError}'
+            return
+        ready = watcher.ready
+        if not ready:
+            self.__scanInfoLabel['text'] = f'正在准备监视，已监视 {watcher.watchedCount} 个文件夹'
+        elif not wasReady:
+            fallbackInfo = f'（{watcher.fallbackReason}，已改用轮询）' if watcher.fallbackReason is not None else ''
+            self.__scanInfoLabel['text'] = f'正在监视 {watcher.watchedCount} 个文件夹{fallbackInfo}'
+        pathDirNames = []
+        while not self.__dirChangeQueue.empty():
+            pathDirNames.extend(self.__dirChangeQueue.get_nowait())
+        if pathDirNames:
+            self.__searchResults = None
+            changedNodes = self.__dirManager.updateDirs(pathDirNames)
+            rootNode = self.__dirManager.dirTree
+            if rootNode is None or rootNode not in self.__nodeItemDic:
+                # 重新扫描了根文件夹
+                self.__showData()
+            else:
+                for node in changedNodes:
+                    self.__syncChildItems(node)
+                self.__updateAncestorItems(changedNodes)
+                self.__showBreakdown()
+        self.after(MainWindow.__watchCheckInterval, self.__applyDirChanges, watcher, ready)
+
+    def __showBreakdown(self):
+        """ 在分类统计面板中显示选中的文件夹的分类统计 """
+        for treeView in (self.__extTreeView, self.__ageTreeView):
+            treeView.delete(*treeView.get_children())
+        _ids = self.__treeView.selection()
+        node = self.__itemNodeDic.get(_ids[0]) if len(_ids) == 1 else None
+        breakdown = node.breakdown if node is not None else None
+        if breakdown is None:
+            self.__breakdownLabel['text'] = '未统计（超过统计深度或未选中文件夹）' if node is not None else ''
+            return
+        self.__breakdownLabel['text'] = f'{node.dirName}（已过期，请刷新）' if breakdown.outdated else node.dirName
+        unitRate = byteUnitCountDic[self.__unit]
+        sizeFormat = '0f' if self.__unit == ByteUnit.byte else '3f'
+        totalSize = node.allSize
+        for treeView, rows in ((self.__extTreeView, breakdown.largestExtensions(MainWindow.__breakdownExtCount)),
+                               (self.__ageTreeView, breakdown.ages())):
+            for name, size, count in rows:
+                treeView.insert('', 'end', text=name or '（无）', values=(
+                    f'{size / unitRate: .{sizeFormat}}', count, f'{size / totalSize * 100 if totalSize else 0:.3f}%'))
 
     # 按钮事件 ---------------------------------------------------------------------------------------------------------
 
@@ -176,21 +567,61 @@ class MainWindow(tk.Tk):
         """ 点击加载路径 """
         dirName = filedialog.askdirectory()
         if dirName:
-            self.__dirManager = DirManager(dirName)
-            self.__showData()
+            self.__startScan(dirName)
+
+    def __clickCancelButton(self):
+        """ 点击取消扫描 """
+        if self.__scanTask is not None:
+            self.__scanTask.cancel()
 
     def __clickExportButton(self):
-        """ 点击导出 """
-        fileName = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[('text files', '.txt')])
+        """ 点击导出，扫描时没有记录文件时询问是否重新读取磁盘导出文件，或只导出文件夹 """
+        includeFiles = not self.__dirManager.readOnly
+        if includeFiles and not self.__dirManager.recordFiles:
+            includeFiles = messagebox.askyesnocancel(
+                '导出', '扫描时没有记录文件（可在扫描设置中开启）。\n'
+                      '是：导出文件，需要重新读取磁盘上的各文件夹，较慢\n否：只导出文件夹')
+            if includeFiles is None:
+                return
+        fileName = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=MainWindow.__exportFileTypes)
         if fileName:
-            with open(fileName, mode='w', encoding='utf-8') as file:
-                self.__dirManager.export(file)
+            fileFormat = MainWindow.__exportFormatDic.get(os.path.splitext(fileName)[1].lower(), 'text')
+            with open(fileName, mode='w', encoding='utf-8', newline='' if fileFormat == 'csv' else None) as file:
+                self.__dirManager.export(file, fileFormat, includeFiles)
 
     def __clickRefreshButton(self):
-        """ 点击刷新 """
-        if self.__dirManager:
-            self.__dirManager.reload()
-            self.__showData()
+        """ 点击刷新，选中了一个子文件夹时只刷新该文件夹 """
+        if not self.__dirManager:
+            return
+        _ids = self.__treeView.selection()
+        node = self.__itemNodeDic.get(_ids[0]) if len(_ids) == 1 else None
+        if node is None or node.parent is None:
+            self.__startScan(self.__scanDirName)
+            return
+
+        parent = node.parent
+        item = self.__nodeItemDic[node]
+        isOpen = self.__treeView.item(item, option='open')
+        index = self.__treeView.index(item)
+        self.__removeNodeItems(node)
+        self.__searchResults = None
+        newNode = self.__dirManager.refreshNode(node)
+        if newNode is not None:
+            newItem = self.__insertNodeItem(newNode, self.__nodeItemDic[parent], index)
+            if isOpen:
+                self.__populateItem(newNode)
+                self.__treeView.item(newItem, open=True)
+            self.__treeView.selection_set(newItem)
+        self.__updateAncestorItems([parent])
+
+    def __clickWatchButton(self):
+        """ 点击监视，开启后文件夹变化时自动更新 """
+        if self.__watcher is not None:
+            self.__stopWatch()
+        elif self.__dirManager and self.__dirManager.dirTree:
+            self.__watcher = self.__dirManager.watch(self.__dirChangeQueue.put)
+            self.__watchButton.configure(relief='sunken')
+            self.after(MainWindow.__watchCheckInterval, self.__applyDirChanges, self.__watcher)
 
     def __clickOpenButton(self):
         """ 点击打开 """
@@ -200,6 +631,115 @@ class MainWindow(tk.Tk):
         item = self.__treeView.item(_ids[0])
         os.system('start explorer ' + item['values'][-1].replace('/', '\\'))
 
+    def __clickRankingButton(self):
+        """ 点击显示最大的文件和文件夹 """
+        if self.__dirManager and self.__dirManager.ranking is not None:
+            RankingWindow(self, self.__dirManager.ranking, self.__unit, self.__locateDir)
+
+    def __clickSnapshotButton(self):
+        """ 点击保存快照，扩展名为.fsnap时保存二进制快照 """
+        fileTypes = MainWindow.__snapshotFileTypes + MainWindow.__binarySnapshotFileTypes
+        fileName = filedialog.asksaveasfilename(defaultextension='.snapshot', filetypes=fileTypes)
+        if not fileName:
+            return
+        if os.path.splitext(fileName)[1].lower() == '.fsnap':
+            with open(fileName, mode='wb') as file:
+                self.__dirManager.saveBinarySnapshot(file)
+        else:
+            with open(fileName, mode='w', encoding='utf-8') as file:
+                self.__dirManager.saveSnapshot(file)
+
+    def __clickOpenSnapshotButton(self):
+        """ 点击载入二进制快照，展开时才从文件读取子文件夹 """
+        fileName = filedialog.askopenfilename(filetypes=MainWindow.__binarySnapshotFileTypes)
+        if not fileName:
+            return
+        dirManager = DirManager.openBinarySnapshot(fileName, stats=ScanStats())
+        if dirManager.scanError is not None:
+            messagebox.showerror('无法打开快照', str(dirManager.scanError))
+            return
+        self.__stopWatch()
+        self.__closeDirManager()
+        self.__dirManager = dirManager
+        self.__scanDirName = dirManager.dirTree.pathDirName
+        self.__scanInfoLabel['text'] = f'快照: {fileName}'
+        self.__showData()
+
+    def __clickDiffButton(self):
+        """ 点击与保存的快照对比 """
+        fileName = filedialog.askopenfilename(filetypes=MainWindow.__snapshotFileTypes)
+        if not fileName:
+            return
+        try:
+            changes = self.__dirManager.diffSnapshot(fileName)
+        except (OSError, ValueError) as e:
+            messagebox.showerror('无法读取快照', str(e))
+            return
+        DiffWindow(self, changes, self.__dirManager.dirTree.pathDirName, self.__unit, self.__locateDir)
+
+    def __clickStatsButton(self):
+        """ 点击显示扫描统计信息 """
+        if not self.__dirManager or self.__dirManager.stats is None:
+            return
+        window = tk.Toplevel(self)
+        window.title('扫描统计')
+        text = tk.Text(window, width=100, height=40)
+        text.insert('end', self.__dirManager.stats.report())
+        text.configure(state='disabled')
+        text.pack(fill=tk.BOTH, expand=True)
+
+    def __clickExcludeButton(self):
+        """ 点击排除，设置之后扫描时排除的文件夹、并发线程数和是否记录文件，并列出上次扫描被排除的文件夹 """
+        window = tk.Toplevel(self)
+        window.title('扫描设置')
+        tk.Label(window, text='排除的文件夹（通配符，以";"分隔，不含"/"时匹配文件夹名，如 .git; node_modules）',
+                 anchor=tk.W).pack(fill=tk.X)
+        excludeEntry = tk.Entry(window, width=100)
+        excludeEntry.insert(0, '; '.join(self.__excludeGlobs))
+        excludeEntry.pack(fill=tk.X)
+        oneFileSystemVar = tk.BooleanVar(window, self.__oneFileSystem)
+        tk.Checkbutton(window, text='只统计根文件夹所在的文件系统', variable=oneFileSystemVar, anchor=tk.W).pack(fill=tk.X)
+        recordFilesVar = tk.BooleanVar(window, self.__recordFiles)
+        tk.Checkbutton(window, text='记录文件用于导出（导出时不必重新读取磁盘，但非常大的文件夹树会占用大量内存）',
+                       variable=recordFilesVar, anchor=tk.W).pack(fill=tk.X)
+        workersFrame = tk.Frame(window)
+        workersFrame.pack(fill=tk.X)
+        tk.Label(workersFrame, text=f'并发读取文件夹的线程数（0为自动：本地磁盘单线程，网络路径{MainWindow.__networkScanWorkers}线程）'
+                 ).pack(side=tk.LEFT)
+        workersVar = tk.IntVar(window, self.__scanWorkers)
+        tk.Spinbox(workersFrame, from_=0, to=64, width=5, textvariable=workersVar).pack(side=tk.LEFT)
+
+        def save():
+            self.__excludeGlobs = [glob.strip() for glob in excludeEntry.get().split(';') if glob.strip()]
+            self.__oneFileSystem = oneFileSystemVar.get()
+            self.__recordFiles = recordFilesVar.get()
+            try:
+                self.__scanWorkers = max(0, workersVar.get())
+            except tk.TclError:
+                pass  # 输入的不是整数时保留原设置
+            window.destroy()
+
+        tk.Button(window, text='确定（下次扫描时生效）', command=save).pack(anchor=tk.E)
+        prunedDirs = self.__dirManager.prunedDirs if self.__dirManager else []
+        tk.Label(window, text=f'上次扫描被排除的文件夹（{len(prunedDirs)}）', anchor=tk.W).pack(fill=tk.X)
+        scrollbar = tk.Scrollbar(window)
+        scrollbar.pack(fill=tk.Y, side=tk.RIGHT)
+        listbox = tk.Listbox(window, yscrollcommand=scrollbar.set, height=20)
+        listbox.pack(fill=tk.BOTH, expand=True)
+        scrollbar.config(command=listbox.yview)
+        reasonDic = {'exclude': '排除规则', 'filesystem': '其他文件系统'}
+        listbox.insert('end', *(f'[{reasonDic[reason]}] {pathDirName}' for pathDirName, reason in prunedDirs))
+
+    def __locateDir(self, pathDirName: str):
+        """ 选中并显示路径对应的文件夹 """
+        node = self.__dirManager.findNode(pathDirName) if self.__dirManager else None
+        if node is None:
+            return
+        self.__clearSelection()
+        item = self.__materializeNode(node)
+        self.__treeView.selection_add(item)
+        self.__treeView.see(item)
+
     def __clickChangeUnitButton(self):
         """ 点击单位转换 """
         if self.__unit == ByteUnit.byte:
@@ -215,14 +755,9 @@ class MainWindow(tk.Tk):
             self.__unit = ByteUnit.byte
             self.__changeUnitButton['image'] = self.__icons.BImage
 
-        unitRate = byteUnitCountDic[self.__unit]
-        sizeFormat = '0f' if self.__unit == ByteUnit.byte else '3f'
-        for node, item in self.__nodeItemDic.items():
-            if node:
-                self.__treeView.item(item, values=(f'{node.selfSize / unitRate: .{sizeFormat}}',
-                                                   f'{node.allSize / unitRate: .{sizeFormat}}',
-                                                   f'{node.sizePercent:.3f}%',
-                                                   node.dirCount, node.fileCount, node.pathDirName))
+        self.__viewModel.unit = self.__unit
+        self.__updateVisibleItems()
+        self.__showBreakdown()
 
     def __clickIgnoreCase(self):
         """ 点击忽略大小写 """
@@ -240,17 +775,82 @@ class MainWindow(tk.Tk):
         text = self.__searchEntry.get()
         if self.__dirManager and text:
             self.__clearSelection()
-            nodes = self.__dirManager.searchNode(text, self.__ignoreCase, self.__regex)
-            if nodes:
-                for node in nodes:
-                    _id = self.__nodeItemDic[node]
-                    self.__treeView.selection_add(_id)
-                self.__treeView.see(self.__nodeItemDic[nodes[0]])
+            try:
+                self.__searchResults = self.__dirManager.searchNode(text, self.__ignoreCase, self.__regex)
+            except re.error as e:
+                self.__searchResults = None
+                messagebox.showerror('正则表达式有误', str(e))
+                return
+            self.__selectSearchResults(self.__searchResults, True)
+
+    def __selectSearchResults(self, nodes, isFirstBatch: bool):
+        """ 分批选中搜索结果，先显示最先找到的结果 """
+        if nodes is not self.__searchResults:
+            return
+        batch = list(itertools.islice(nodes, MainWindow.__searchBatchSize))
+        for node in batch:
+            self.__treeView.selection_add(self.__materializeNode(node))
+        if batch and isFirstBatch:
+            self.__treeView.see(self.__nodeItemDic[batch[0]])
+        if len(batch) == MainWindow.__searchBatchSize:
+            self.after(1, self.__selectSearchResults, nodes, False)
+        else:
+            self.__searchResults = None
 
     def __sort(self, key: str):
-        """ 排序 """
-        if self.__dirManager:
-            self.__dirManager.sort(key)
-            nodeOpenDict = self.__getNodeOpenDict()
-            self.__showData()
-            self.__setItemOpen(nodeOpenDict)
+        """ 排序，只排序已插入子项的节点，其余节点在展开时再排序 """
+        if self.__dirManager and self.__scanTask is None:
+            populatedNodes = [node for node, item in self.__nodeItemDic.items()
+                              if node is not None and item not in self.__placeholderDic]
+            self.__dirManager.sort(key, populatedNodes)
+            for node in populatedNodes:
+                self.__reorderChildItems(node)
+
+
+class _ScanTask:
+    """ 后台扫描任务 """
+
+    def __init__(self, dirName: str, workers: int, rankingCount: int, excludeGlobs: list, oneFileSystem: bool,
+                 breakdownDepth: int, recordFiles: bool):
+        """ 初始化 """
+        self.nodeQueue = queue.Queue()
+        self.dirCount = 0
+        self.size = 0
+        self.dirManager = None
+        self.stats = ScanStats()
+        self.cancelled = False
+        self.finished = False
+        self.__dirName = dirName
+        self.__workers = workers
+        self.__rankingCount = rankingCount
+        self.__excludeGlobs = excludeGlobs
+        self.__oneFileSystem = oneFileSystem
+        self.__breakdownDepth = breakdownDepth
+        self.__recordFiles = recordFiles
+        self.__cancelEvent = threading.Event()
+
+    def start(self):
+        """ 开始扫描 """
+        threading.Thread(target=self.__run, daemon=True).start()
+
+    def cancel(self):
+        """ 取消扫描 """
+        self.__cancelEvent.set()
+
+    def __run(self):
+        """ 扫描线程 """
+        try:
+            self.dirManager = DirManager(self.__dirName, workers=self.__workers, onNodeListed=self.__onNodeListed,
+                                         cancelEvent=self.__cancelEvent, topCount=self.__rankingCount,
+                                         stats=self.stats, excludeGlobs=self.__excludeGlobs,
+                                         oneFileSystem=self.__oneFileSystem, recordFiles=self.__recordFiles,
+                                         breakdown=True, breakdownDepth=self.__breakdownDepth)
+        except ScanCancelledError:
+            self.cancelled = True
+        self.finished = True
+
+    def __onNodeListed(self, node):
+        """ 读取完一个文件夹 """
+        self.dirCount += 1
+        self.size += node.selfSize
+        self.nodeQueue.put(node)
@@ -0,0 +1,164 @@
+"""
+文件夹名索引
+相同的文件夹名只记录一次，并为小写名称建立三元组（连续3个字符）倒排索引，用于快速查找包含某字符串的文件夹
+"""
+
+from array import array
+import functools
+import re
+
+
+@functools.lru_cache(maxsize=128)
+def compilePattern(text: str, ignoreCase: bool):
+    """ 编译正则表达式（带缓存），表达式有误时抛出re.error """
+    return re.compile(text, re.IGNORECASE if ignoreCase else 0)
+
+
+class DirNameIndex:
+    """ 文件夹名索引 """
+
+    __gramLength = 3
+
+    def __init__(self, rootNode, useNameTable: bool = False):
+        """ 初始化，索引以rootNode为根的整棵树
+        紧凑存储和二进制快照中的节点（有tree和index属性的视图）只记录节点序号，搜索到时才生成视图
+        :param useNameTable: 使用rootNode（根节点）所在的二进制快照中保存的名称表建立索引，不读取节点记录，
+                             各名称的节点序号在搜索到该名称时才从文件读取；不建立三元组索引，
+                             逐个名称查找比为所有名称建立三元组索引快得多，适合打开后只搜索几次的快照
+        """
+        self.__tree = getattr(rootNode, 'tree', None)  # 节点所在的CompactDirTree或MappedDirTree，普通节点为None
+        self.__names = []  # [文件夹名]
+        self.__lowerNames = []  # [小写文件夹名]
+        self.__nameIdDic = {}  # {文件夹名: 名称序号}
+        self.__nameNodesList = []  # [[该名称的节点]]，有tree时为[array(该名称的节点序号)]
+        self.__gramDic = {}  # {三元组: array(包含该三元组的名称序号)}，使用名称表时为None（逐个名称查找）
+        self.__removedNodes = set()  # 已移除的节点，有tree时为节点序号
+        self.__nodeCount = 0
+        self.__readNameNodes = None  # 使用名称表时，由__nameNodesList中的(位置, 节点数)读取节点序号
+        if useNameTable:
+            self.__addNameTable()
+        else:
+            self.addTree(rootNode)
+
+    @property
+    def needsRebuild(self) -> bool:
+        """ 已移除的节点过多，重建索引更省内存 """
+        return len(self.__removedNodes) > max(self.__nodeCount // 4, 1024)
+
+    def addTree(self, rootNode):
+        """ 索引一个子树 """
+        tree = self.__tree
+        if tree is None:
+            for node in rootNode.preorderTraversal():
+                self.__addNode(node, node.dirName)
+            return
+        # 按序号遍历，不生成视图（子树根节点的名称可能是完整路径，取自视图）
+        self.__addNode(rootNode.index, rootNode.dirName)
+        indexStack = tree.getChildIndices(rootNode.index)[::-1]
+        while indexStack:
+            curIndex = indexStack.pop()
+            self.__addNode(curIndex, tree.getName(curIndex))
+            indexStack.extend(reversed(tree.getChildIndices(curIndex)))
+
+    def removeTree(self, rootNode):
+        """ 移除一个子树的索引 """
+        tree = self.__tree
+        if tree is None:
+            self.__removedNodes.update(rootNode.preorderTraversal())
+            return
+        indexStack = [rootNode.index]
+        while indexStack:
+            curIndex = indexStack.pop()
+            self.__removedNodes.add(curIndex)
+            indexStack.extend(tree.getChildIndices(curIndex))
+
+    def search(self, text: str, ignoreCase: bool, regex: bool):
+        """ 搜索名称匹配的节点，表达式有误时立即抛出re.error
+        :returns: 逐个产生匹配节点的生成器
+        """
+        if regex:
+            pattern = compilePattern(text, ignoreCase)
+            return self.__iterNodes(nameId for nameId, dirName in enumerate(self.__names)
+                                    if pattern.search(dirName) is not None)
+        lowerText = text.lower()
+        if ignoreCase:
+            return self.__iterNodes(nameId for nameId in self.__candidateNameIds(lowerText)
+                                    if lowerText in self.__lowerNames[nameId])
+        return self.__iterNodes(nameId for nameId in self.__candidateNameIds(lowerText)
+                                if text in self.__names[nameId])
+
+    def __addNameTable(self):
+        """ 索引二进制快照的名称表，__nameNodesList中只记录各名称的节点序号在文件中的位置
+        快照只读，不会再添加节点，不记录__nameIdDic
+        """
+        tree = self.__tree
+        self.__gramDic = None
+        for dirName, nodePosition, nodeCount in tree.iterNameTable():
+            self.__names.append(dirName)
+            self.__nameNodesList.append((nodePosition, nodeCount))
+        self.__lowerNames = [dirName.lower() for dirName in self.__names]
+        self.__nodeCount = tree.nodeCount
+        self.__readNameNodes = tree.readNameNodes
+
+    def __addNode(self, node, dirName: str):
+        """ 记录一个节点（有tree时为节点序号） """
+        self.__removedNodes.discard(node)
+        nameId = self.__nameIdDic.get(dirName)
+        if nameId is None:
+            nameId = self.__addName(dirName)
+        self.__nameNodesList[nameId].append(node)
+        self.__nodeCount += 1
+
+    def __addName(self, dirName: str) -> int:
+        """ 记录一个新的文件夹名 """
+        nameId = len(self.__names)
+        lowerName = dirName.lower()
+        self.__names.append(dirName)
+        self.__lowerNames.append(lowerName)
+        self.__nameIdDic[dirName] = nameId
+        self.__nameNodesList.append([] if self.__tree is None else array('q'))
+        if self.__gramDic is None:
+            return nameId
+        for gram in DirNameIndex.__getGrams(lowerName):
+            postings = self.__gramDic.get(gram)
+            if postings is None:
+                postings = self.__gramDic[gram] = array('i')
+            postings.append(nameId)
+        return nameId
+
+    def __candidateNameIds(self, lowerText: str):
+        """ 根据三元组索引得到可能包含lowerText的名称序号（升序） """
+        grams = DirNameIndex.__getGrams(lowerText) if self.__gramDic is not None else None
+        if not grams:
+            return range(len(self.__names))
+        postingsList = []
+        for gram in grams:
+            postings = self.__gramDic.get(gram)
+            if postings is None:
+                return ()
+            postingsList.append(postings)
+        postingsList.sort(key=len)
+        candidates = set(postingsList[0])
+        for postings in postingsList[1:]:
+            candidates.intersection_update(postings)
+            if not candidates:
+                return ()
+        return sorted(candidates)
+
+    def __iterNodes(self, nameIds):
+        """ 依次产生各名称对应的节点 """
+        tree = self.__tree
+        removedNodes = self.__removedNodes
+        for nameId in nameIds:
+            nodes = self.__nameNodesList[nameId]
+            if self.__readNameNodes is not None:
+                nodes = self.__readNameNodes(*nodes)
+            for node in nodes:
+                if node not in removedNodes:
+                    yield node if tree is None else tree.node(node)
+
+    @staticmethod
+    def __getGrams(lowerName: str) -> set:
+        """ 获取名称中所有的三元组 """
+        gramLength = DirNameIndex.__gramLength
+        return {lowerName[i:i + gramLength] for i in range(len(lowerName) - gramLength + 1)}
@@ -0,0 +1,68 @@
+"""
+主窗口列表的视图模型
+缓存节点各列的显示文本，大小按单位分别缓存，百分比等与单位无关的文本只在节点首次显示时生成，
+切换单位时只需重新生成实际显示的项
+"""
+
+from fileUtils import ByteUnit, byteUnitCountDic
+
+
+class NodeViewModel:
+    """ 节点显示文本的缓存，节点数据变化后须调用invalidate """
+
+    def __init__(self, unit: ByteUnit = ByteUnit.byte):
+        """ 初始化 """
+        self.__unit = unit
+        self.__unitRate = byteUnitCountDic[unit]
+        self.__sizeFormat = NodeViewModel.__getSizeFormat(unit)
+        self.__baseDic = {}  # {节点: (百分比文本, 文件夹数, 文件数, 路径)}
+        self.__sizeDics = {}  # {单位: {节点: (直属大小文本, 总大小文本)}}
+
+    @property
+    def unit(self) -> ByteUnit:
+        """ 当前单位 """
+        return self.__unit
+
+    @unit.setter
+    def unit(self, unit: ByteUnit):
+        self.__unit = unit
+        self.__unitRate = byteUnitCountDic[unit]
+        self.__sizeFormat = NodeViewModel.__getSizeFormat(unit)
+
+    @staticmethod
+    def __getSizeFormat(unit: ByteUnit) -> str:
+        """ 大小的格式 """
+        return '0f' if unit == ByteUnit.byte else '3f'
+
+    def getValues(self, node) -> tuple:
+        """ 获取节点各列显示的值（带缓存） """
+        base = self.__baseDic.get(node)
+        if base is None:
+            base = (f'{node.sizePercent:.3f}%', node.dirCount, node.fileCount, node.pathDirName)
+            self.__baseDic[node] = base
+        sizeDic = self.__sizeDics.get(self.__unit)
+        if sizeDic is None:
+            sizeDic = self.__sizeDics[self.__unit] = {}
+        sizes = sizeDic.get(node)
+        if sizes is None:
+            sizes = (f'{node.selfSize / self.__unitRate: .{self.__sizeFormat}}',
+                     f'{node.allSize / self.__unitRate: .{self.__sizeFormat}}')
+            sizeDic[node] = sizes
+        return sizes + base
+
+    def formatValues(self, node) -> tuple:
+        """ 获取节点各列显示的值（不缓存），用于数据仍在变化的节点（如扫描中） """
+        return (f'{node.selfSize / self.__unitRate: .{self.__sizeFormat}}',
+                f'{node.allSize / self.__unitRate: .{self.__sizeFormat}}',
+                f'{node.sizePercent:.3f}%', node.dirCount, node.fileCount, node.pathDirName)
+
+    def invalidate(self, node):
+        """ 节点数据发生变化或不再显示，清除其缓存 """
+        self.__baseDic.pop(node, None)
+        for sizeDic in self.__sizeDics.values():
+            sizeDic.pop(node, None)
+
+    def clear(self):
+        """ 清除全部缓存 """
+        self.__baseDic.clear()
+        self.__sizeDics.clear()
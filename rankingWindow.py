@@ -0,0 +1,54 @@
+"""
+最大的文件和文件夹窗口
+"""
+
+import os
+import tkinter as tk
+from tkinter import ttk
+from fileUtils import ByteUnit, byteUnitCountDic, SizeRanking
+
+
+class RankingWindow(tk.Toplevel):
+    """ 显示扫描中统计的最大的文件和文件夹，双击定位到所在文件夹 """
+
+    __title = '最大的文件和文件夹'
+    __initWidth = 900
+    __initHeight = 600
+
+    def __init__(self, master, ranking: SizeRanking, unit: ByteUnit, onLocate):
+        """ 初始化
+        :param onLocate: 双击某项时以文件夹路径为参数调用
+        """
+        super().__init__(master)
+        self.title(RankingWindow.__title)
+        self.geometry(f'{RankingWindow.__initWidth}x{RankingWindow.__initHeight}')
+        self.__onLocate = onLocate
+        self.__itemPathDic = {}  # {项: 所在文件夹路径}
+
+        scrollbar = tk.Scrollbar(self)
+        scrollbar.pack(fill=tk.Y, side=tk.RIGHT)
+        self.__treeView = ttk.Treeview(self, yscrollcommand=scrollbar.set, columns=(None,))
+        self.__treeView.heading('#0', text='路径')
+        self.__treeView.heading('#1', text='大小')
+        self.__treeView.column('#0', width=700)
+        self.__treeView.column('#1', anchor=tk.E)
+        self.__treeView.pack(fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.__treeView.yview)
+        self.__treeView.bind('<Double-1>', self.__onDoubleClick)
+
+        unitRate = byteUnitCountDic[unit]
+        sizeFormat = '0f' if unit == ByteUnit.byte else '3f'
+        for title, topItems, isFile in (('最大的文件', ranking.largestFiles, True),
+                                        ('最大的文件夹（包含子文件夹）', ranking.largestDirsByAllSize, False),
+                                        ('最大的文件夹（不包含子文件夹）', ranking.largestDirsBySelfSize, False)):
+            groupItem = self.__treeView.insert('', 'end', text=title, open=True)
+            for size, pathName in topItems.items():
+                item = self.__treeView.insert(groupItem, 'end', text=pathName,
+                                              values=(f'{size / unitRate: .{sizeFormat}}',))
+                self.__itemPathDic[item] = os.path.dirname(pathName) if isFile else pathName
+
+    def __onDoubleClick(self, _):
+        """ 双击定位 """
+        pathDirName = self.__itemPathDic.get(self.__treeView.focus())
+        if pathDirName is not None:
+            self.__onLocate(pathDirName)
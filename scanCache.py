@@ -0,0 +1,75 @@
+"""
+扫描缓存
+按根路径在SQLite数据库中记录每个文件夹的修改时间与直属文件统计，重新扫描时修改时间未变的文件夹不再读取
+注意：修改文件内容不会改变其所在文件夹的修改时间，因此此类变化需完整重新扫描才能反映
+"""
+
+import os
+import sqlite3
+from fileUtils import DirListing
+
+
+class ScanCache:
+    """ 扫描缓存 """
+
+    __subDirSep = '\0'  # 子文件夹名分隔符（文件名中不可能出现）
+
+    def __init__(self, cacheFile: str, rootPath: str):
+        """ 初始化
+        :param cacheFile: 缓存数据库文件路径，不存在时自动创建
+        :param rootPath: 扫描的根路径，不同根路径的缓存互不影响
+        """
+        cacheDir = os.path.dirname(cacheFile)
+        if cacheDir:
+            os.makedirs(cacheDir, exist_ok=True)
+        self.__rootPath = rootPath
+        self.__connection = sqlite3.connect(cacheFile, check_same_thread=False)
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS dirs (root TEXT, path TEXT, mtime INTEGER, '
+                                  'selfSize INTEGER, fileCount INTEGER, subDirs TEXT, PRIMARY KEY (root, path))')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def close(self):
+        """ 提交并关闭 """
+        self.__connection.commit()
+        self.__connection.close()
+
+    def getMtime(self, pathDirName: str):
+        """ 获取缓存的文件夹修改时间（纳秒），无缓存时返回None """
+        row = self.__connection.execute('SELECT mtime FROM dirs WHERE root=? AND path=?',
+                                        (self.__rootPath, pathDirName)).fetchone()
+        return row[0] if row else None
+
+    def getListing(self, pathDirName: str) -> DirListing:
+        """ 获取缓存的文件夹读取结果 """
+        selfSize, fileCount, subDirs = self.__connection.execute(
+            'SELECT selfSize, fileCount, subDirs FROM dirs WHERE root=? AND path=?',
+            (self.__rootPath, pathDirName)).fetchone()
+        return DirListing(selfSize, fileCount, [(dirName, os.path.join(pathDirName, dirName).replace('\\', '/'))
+                                                for dirName in ScanCache.__splitSubDirs(subDirs)], True)
+
+    def setListing(self, pathDirName: str, mtime: int, listing: DirListing):
+        """ 记录文件夹读取结果，同时清除已不存在的子文件夹的缓存 """
+        row = self.__connection.execute('SELECT subDirs FROM dirs WHERE root=? AND path=?',
+                                        (self.__rootPath, pathDirName)).fetchone()
+        if row:
+            removedDirs = set(ScanCache.__splitSubDirs(row[0])).difference(dirName for dirName, _ in listing.subDirs)
+            for dirName in removedDirs:
+                self.__removeTree(os.path.join(pathDirName, dirName).replace('\\', '/'))
+        self.__connection.execute('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?)',
+                                  (self.__rootPath, pathDirName, mtime, listing.selfSize, listing.fileCount,
+                                   ScanCache.__subDirSep.join(dirName for dirName, _ in listing.subDirs)))
+
+    def __removeTree(self, pathDirName: str):
+        """ 清除一个文件夹及其所有子孙文件夹的缓存 """
+        self.__connection.execute('DELETE FROM dirs WHERE root=? AND (path=? OR (path>? AND path<?))',
+                                  (self.__rootPath, pathDirName, pathDirName + '/', pathDirName + '0'))
+
+    @staticmethod
+    def __splitSubDirs(subDirs: str) -> list:
+        """ 拆分子文件夹名 """
+        return subDirs.split(ScanCache.__subDirSep) if subDirs else []
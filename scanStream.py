@@ -0,0 +1,123 @@
+"""
+流式扫描
+不建立文件夹树，每读取完一个文件夹即产生其直属统计数据，子树扫描完毕时再产生其最终统计数据；
+内存中只保留尚未完成的文件夹的累计值。提供同步生成器iterScan和异步迭代器aiterScan两种形式
+"""
+
+import asyncio
+from collections import namedtuple
+import os
+from fileUtils import compileExcludes, ListOptions, listDir, makeExcludes, sumDirTree
+
+
+class ScanEvent(namedtuple('ScanEvent', ['kind', 'pathDirName', 'depth', 'selfSize', 'allSize', 'dirCount',
+                                         'fileCount', 'canVisit'])):
+    """ 扫描事件，depth为相对于根文件夹的深度（根文件夹为0）
+    kind为'listed'时表示读取完一个文件夹，allSize、dirCount、fileCount只包括直属文件和子文件夹
+    （超过最大深度而合计的文件夹包括所有子孙文件夹）；
+    kind为'completed'时表示文件夹及其所有子孙文件夹均已读取，allSize、dirCount、fileCount为最终值，
+    子文件夹的completed事件总在父文件夹之前产生
+    """
+    __slots__ = ()
+
+
+class _SubtreeTracker:
+    """ 记录尚未完成的文件夹的累计值，子树完成时产生completed事件 """
+
+    def __init__(self):
+        """ 初始化 """
+        self.__pendingDic = {}  # {路径: [父路径, 深度, 未完成的子文件夹数, 直属大小, 总大小, 文件夹数, 文件数, 可访问]}
+
+    def addListing(self, pathDirName: str, parentPath, depth: int, listing) -> list:
+        """ 记录一个文件夹的读取结果
+        :param parentPath: 父文件夹路径，根文件夹为None
+        :returns: 依次产生的事件
+        """
+        allSize = listing.selfSize
+        dirCount = len(listing.subDirs)
+        fileCount = listing.fileCount
+        if listing.collapsed is not None:
+            allSize += listing.collapsed[0]
+            dirCount += listing.collapsed[1]
+            fileCount += listing.collapsed[2]
+        events = [ScanEvent('listed', pathDirName, depth, listing.selfSize, allSize, dirCount, fileCount,
+                            listing.canVisit)]
+        entry = [parentPath, depth, len(listing.subDirs), listing.selfSize, allSize, dirCount, fileCount,
+                 listing.canVisit]
+        while not entry[2]:
+            parentPath, depth, _, selfSize, allSize, dirCount, fileCount, canVisit = entry
+            events.append(ScanEvent('completed', pathDirName, depth, selfSize, allSize, dirCount, fileCount,
+                                    canVisit))
+            if parentPath is None:
+                break
+            entry = self.__pendingDic[parentPath]
+            entry[2] -= 1
+            entry[4] += allSize
+            entry[5] += dirCount
+            entry[6] += fileCount
+            if entry[2]:
+                break
+            del self.__pendingDic[parentPath]
+            pathDirName = parentPath
+        else:
+            self.__pendingDic[pathDirName] = entry
+        return events
+
+
+def _prepareScan(pathDirName: str, excludeGlobs, excludeRegexes, oneFileSystem: bool) -> tuple:
+    """ 生成读取选项，根文件夹不存在时抛出NotADirectoryError，正则表达式有误时抛出re.error
+    :returns: (根文件夹路径, 读取选项)
+    """
+    pathDirName = pathDirName.replace('\\', '/')
+    if not os.path.isdir(pathDirName):
+        raise NotADirectoryError(pathDirName)
+    excludes = makeExcludes(excludeGlobs, excludeRegexes)
+    compileExcludes(excludes)
+    rootDevice = os.stat(pathDirName).st_dev if oneFileSystem else None
+    return pathDirName, ListOptions(excludes=excludes, rootDevice=rootDevice)
+
+
+def iterScan(pathDirName: str, excludeGlobs=(), excludeRegexes=(), maxDepth: int = None,
+             oneFileSystem: bool = False):
+    """ 单线程深度优先扫描，依次产生ScanEvent，参数含义同fileUtils.DirManager
+    生成器创建后首次迭代时才检查根文件夹
+    """
+    pathDirName, options = _prepareScan(pathDirName, excludeGlobs, excludeRegexes, oneFileSystem)
+    tracker = _SubtreeTracker()
+    dirStack = [(pathDirName, None, 0)]  # [(路径, 父路径, 深度)]
+    while dirStack:
+        curPath, parentPath, depth = dirStack.pop()
+        collapsed = maxDepth is not None and depth >= maxDepth
+        listing = sumDirTree(curPath, options) if collapsed else listDir(curPath, options)
+        yield from tracker.addListing(curPath, parentPath, depth, listing)
+        dirStack.extend((subPath, curPath, depth + 1) for _, subPath in reversed(listing.subDirs))
+
+
+async def aiterScan(pathDirName: str, concurrency: int = 8, executor=None, excludeGlobs=(), excludeRegexes=(),
+                    maxDepth: int = None, oneFileSystem: bool = False):
+    """ 异步扫描，在执行器中读取文件夹，依次产生ScanEvent（顺序与iterScan不同，但子文件夹总先于父文件夹完成）
+    :param concurrency: 同时读取的文件夹数上限
+    :param executor: 读取文件夹的执行器（concurrent.futures.Executor），为None时使用事件循环的默认执行器
+    其余参数同iterScan；迭代中途退出时取消尚未开始的读取
+    """
+    pathDirName, options = _prepareScan(pathDirName, excludeGlobs, excludeRegexes, oneFileSystem)
+    loop = asyncio.get_running_loop()
+    tracker = _SubtreeTracker()
+    dirStack = [(pathDirName, None, 0)]  # [(路径, 父路径, 深度)]，尚未开始读取的文件夹
+    futureDic = {}  # {读取任务: (路径, 父路径, 深度)}
+    try:
+        while dirStack or futureDic:
+            while dirStack and len(futureDic) < concurrency:
+                curPath, parentPath, depth = dirStack.pop()
+                func = sumDirTree if maxDepth is not None and depth >= maxDepth else listDir
+                futureDic[loop.run_in_executor(executor, func, curPath, options)] = (curPath, parentPath, depth)
+            doneFutures, _ = await asyncio.wait(futureDic, return_when=asyncio.FIRST_COMPLETED)
+            for future in doneFutures:
+                curPath, parentPath, depth = futureDic.pop(future)
+                listing = future.result()
+                for event in tracker.addListing(curPath, parentPath, depth, listing):
+                    yield event
+                dirStack.extend((subPath, curPath, depth + 1) for _, subPath in reversed(listing.subDirs))
+    finally:
+        for future in futureDic:
+            future.cancel()
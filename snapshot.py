@@ -0,0 +1,171 @@
+"""
+文件夹快照与快照对比
+快照为文本文件，每行记录一个文件夹的统计数据，按路径各级名称的顺序排列，两个快照可以逐行归并比较（线性时间）
+"""
+
+from collections import namedtuple
+import csv
+import heapq
+import os
+import re
+import time
+
+snapshotMagic = '#foldersize-snapshot'
+snapshotVersion = '1'
+diffCsvHeader = ('status', 'path', 'oldSize', 'newSize', 'sizeDelta', 'oldFileCount', 'newFileCount', 'fileDelta')
+
+_escapeDic = {'\\': '\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t'}
+_unescapeDic = {value: key for key, value in _escapeDic.items()}
+_escapePattern = re.compile(r'[\\\n\r\t]')
+_unescapePattern = re.compile(r'\\[\\nrt]')
+
+
+class SnapshotRecord(namedtuple('SnapshotRecord', ['path', 'selfSize', 'allSize', 'dirCount', 'fileCount'])):
+    """ 快照中的一个文件夹，path为相对于根文件夹的路径（根文件夹为空字符串） """
+    __slots__ = ()
+
+
+class DirChange(namedtuple('DirChange', ['status', 'path', 'oldSize', 'newSize', 'oldFileCount', 'newFileCount'])):
+    """ 一个文件夹的变化，status为'added'、'removed'、'grown'、'shrunk'或'changed'（大小不变，文件数变化）
+    大小为包含子文件夹的大小，新增或删除的文件夹另一侧的大小和文件数为0
+    """
+    __slots__ = ()
+
+    @property
+    def sizeDelta(self) -> int:
+        """ 大小变化 """
+        return self.newSize - self.oldSize
+
+    @property
+    def fileDelta(self) -> int:
+        """ 文件数变化 """
+        return self.newFileCount - self.oldFileCount
+
+
+def _escapePath(path: str) -> str:
+    """ 转义路径中的换行符、制表符（字段分隔符）和反斜杠 """
+    return _escapePattern.sub(lambda match: _escapeDic[match.group()], path)
+
+
+def _unescapePath(path: str) -> str:
+    """ 还原转义的路径 """
+    return _unescapePattern.sub(lambda match: _unescapeDic[match.group()], path)
+
+
+def _pathKey(path: str) -> str:
+    """ 归并比较时路径的排序关键字，与按各级名称依次比较的顺序一致 """
+    return path.replace('/', '\0')
+
+
+def iterTreeRecords(rootNode):
+    """ 按快照的顺序（子文件夹按名称排列的前序遍历）依次产生文件夹树中各文件夹的记录 """
+    nodeStack = [(rootNode, '')]
+    while nodeStack:
+        curNode, path = nodeStack.pop()
+        yield SnapshotRecord(path, curNode.selfSize, curNode.allSize, curNode.dirCount, curNode.fileCount)
+        prefix = path + '/' if path else ''
+        nodeStack.extend((child, prefix + child.dirName)
+                         for child in sorted(curNode.children, key=lambda node: node.dirName, reverse=True))
+
+
+def saveSnapshot(rootNode, file):
+    """ 保存以rootNode为根的文件夹树的快照
+    :param file: 以文本模式（utf-8）打开的文件
+    """
+    buffer = [f'{snapshotMagic}\t{snapshotVersion}\t{_escapePath(rootNode.pathDirName)}\t{int(time.time())}\n']
+    for record in iterTreeRecords(rootNode):
+        buffer.append(f'{record.selfSize}\t{record.allSize}\t{record.dirCount}\t{record.fileCount}\t'
+                      f'{_escapePath(record.path)}\n')
+        if len(buffer) >= 4096:
+            file.write(''.join(buffer))
+            buffer.clear()
+    file.write(''.join(buffer))
+
+
+def readSnapshotHeader(file) -> tuple:
+    """ 读取快照文件头，文件不是快照时抛出ValueError
+    :returns: (根文件夹路径, 快照时间戳)
+    """
+    fields = file.readline().rstrip('\n').split('\t')
+    if len(fields) != 4 or fields[0] != snapshotMagic:
+        raise ValueError('不是文件夹快照文件')
+    if fields[1] != snapshotVersion:
+        raise ValueError(f'不支持的快照版本: {fields[1]}')
+    return _unescapePath(fields[2]), int(fields[3])
+
+
+def _rootKey(path: str) -> str:
+    """ 比较根文件夹时路径的关键字，忽略末尾的"/"（Windows下还忽略大小写） """
+    return os.path.normcase(path.replace('\\', '/').rstrip('/'))
+
+
+def checkSnapshotRoot(rootPath: str, expectedRootPath: str):
+    """ 检查快照的根文件夹是否为指定的文件夹，不是时抛出ValueError（记录以相对路径比较，不同根文件夹的对比没有意义） """
+    if _rootKey(rootPath) != _rootKey(expectedRootPath):
+        raise ValueError(f'快照的根文件夹{rootPath}与{expectedRootPath}不同')
+
+
+def iterSnapshotRecords(file):
+    """ 依次产生快照文件中的记录，须先调用readSnapshotHeader """
+    for line in file:
+        selfSize, allSize, dirCount, fileCount, path = line.rstrip('\n').split('\t', 4)
+        yield SnapshotRecord(_unescapePath(path), int(selfSize), int(allSize), int(dirCount), int(fileCount))
+
+
+def diffRecords(oldRecords, newRecords, limit: int = 0) -> list:
+    """ 归并比较两组按快照顺序排列的记录
+    :param limit: 只返回变化最大的若干项，为0时返回全部
+    :returns: 按大小变化的绝对值降序排列的[DirChange]
+    """
+    changes = _iterChanges(iter(oldRecords), iter(newRecords))
+    sortKey = lambda change: (abs(change.sizeDelta), abs(change.fileDelta))
+    if limit > 0:
+        return heapq.nlargest(limit, changes, key=sortKey)
+    return sorted(changes, key=sortKey, reverse=True)
+
+
+def _iterChanges(oldRecords, newRecords):
+    """ 归并两组记录，依次产生发生变化的文件夹 """
+    oldRecord = next(oldRecords, None)
+    newRecord = next(newRecords, None)
+    while oldRecord is not None or newRecord is not None:
+        if newRecord is None or (oldRecord is not None and _pathKey(oldRecord.path) < _pathKey(newRecord.path)):
+            yield DirChange('removed', oldRecord.path, oldRecord.allSize, 0, oldRecord.fileCount, 0)
+            oldRecord = next(oldRecords, None)
+        elif oldRecord is None or _pathKey(newRecord.path) < _pathKey(oldRecord.path):
+            yield DirChange('added', newRecord.path, 0, newRecord.allSize, 0, newRecord.fileCount)
+            newRecord = next(newRecords, None)
+        else:
+            if oldRecord.allSize != newRecord.allSize or oldRecord.fileCount != newRecord.fileCount:
+                if newRecord.allSize > oldRecord.allSize:
+                    status = 'grown'
+                elif newRecord.allSize < oldRecord.allSize:
+                    status = 'shrunk'
+                else:
+                    status = 'changed'
+                yield DirChange(status, newRecord.path, oldRecord.allSize, newRecord.allSize,
+                                oldRecord.fileCount, newRecord.fileCount)
+            oldRecord = next(oldRecords, None)
+            newRecord = next(newRecords, None)
+
+
+def diffSnapshotFiles(oldFileName: str, newFileName: str, limit: int = 0, allowOtherRoot: bool = False) -> list:
+    """ 比较两个快照文件，返回值同diffRecords
+    :param allowOtherRoot: 是否允许比较根文件夹不同的快照（如移动过的文件夹），为False时根文件夹不同抛出ValueError
+    """
+    with open(oldFileName, encoding='utf-8') as oldFile, open(newFileName, encoding='utf-8') as newFile:
+        oldRootPath, _ = readSnapshotHeader(oldFile)
+        newRootPath, _ = readSnapshotHeader(newFile)
+        if not allowOtherRoot:
+            checkSnapshotRoot(oldRootPath, newRootPath)
+        return diffRecords(iterSnapshotRecords(oldFile), iterSnapshotRecords(newFile), limit)
+
+
+def writeDiffCsv(changes, file):
+    """ 以CSV格式导出对比结果
+    :param file: 以文本模式打开的文件（newline=''）
+    """
+    csvWriter = csv.writer(file)
+    csvWriter.writerow(diffCsvHeader)
+    csvWriter.writerows((change.status, change.path, change.oldSize, change.newSize, change.sizeDelta,
+                         change.oldFileCount, change.newFileCount, change.fileDelta) for change in changes)
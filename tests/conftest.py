@@ -0,0 +1,8 @@
+"""
+测试配置：模块位于项目根目录（没有包结构），将其加入sys.path
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,42 @@
+"""
+二进制快照的测试
+"""
+
+import io
+import os
+import pytest
+from fileUtils import DirManager
+
+
+@pytest.fixture
+def snapshotFile(tmp_path):
+    """ 扫描一个小文件夹树并保存二进制快照，返回快照文件路径 """
+    root = tmp_path / 'root'
+    for relPath, size in (('a/x.log', 10), ('a/b/y.txt', 20), ('c/z.txt', 30)):
+        os.makedirs(root / os.path.dirname(relPath), exist_ok=True)
+        (root / relPath).write_bytes(b'x' * size)
+    fileName = str(tmp_path / 'tree.fsnap')
+    with open(fileName, 'wb') as file:
+        DirManager(str(root)).saveBinarySnapshot(file)
+    return fileName
+
+
+def testExportOnlyDirs(snapshotFile, tmp_path):
+    """ 快照不记录文件，导出时不读取当前磁盘上的文件 """
+    dirManager = DirManager.openBinarySnapshot(snapshotFile)
+    file = io.StringIO()
+    dirManager.export(file, 'ndjson')
+    assert file.getvalue().count('"type": "dir"') == 4
+    assert '"type": "file"' not in file.getvalue()
+    dirManager.close()
+
+
+@pytest.mark.parametrize('text, ignoreCase, regex', [('b', True, False), ('A', False, False), ('^[ac]$', True, True),
+                                                     ('root', True, False)])
+def testSearchMatchesScannedTree(snapshotFile, text, ignoreCase, regex):
+    """ 使用快照中的名称表搜索，结果与扫描得到的树一致 """
+    dirManager = DirManager.openBinarySnapshot(snapshotFile)
+    scannedManager = DirManager(dirManager.dirTree.pathDirName)
+    assert sorted(node.pathDirName for node in dirManager.searchNode(text, ignoreCase, regex)) == \
+        sorted(node.pathDirName for node in scannedManager.searchNode(text, ignoreCase, regex))
+    dirManager.close()
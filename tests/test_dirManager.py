@@ -0,0 +1,168 @@
+"""
+DirManager部分更新（updateDirs、refreshNode）和扫描缓存的测试，结果应与重新完整扫描一致
+"""
+
+import os
+import queue
+import sys
+import time
+import pytest
+from fileUtils import DirManager
+
+
+def writeFile(pathName: str, size: int):
+    """ 写入指定大小的文件，所在文件夹不存在时自动创建 """
+    os.makedirs(os.path.dirname(pathName), exist_ok=True)
+    with open(pathName, 'wb') as file:
+        file.write(b'x' * size)
+
+
+def waitUntil(condition, timeout: float = 5):
+    """ 等待条件成立，超时时测试失败 """
+    endTime = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < endTime, '等待超时'
+        time.sleep(0.01)
+
+
+def treeRecords(dirManager: DirManager) -> list:
+    """ 各节点的(路径, 直属大小, 总大小, 文件夹数, 文件数)，按路径排列 """
+    return sorted((node.pathDirName, node.selfSize, node.allSize, node.dirCount, node.fileCount)
+                  for node in dirManager.dirTree.preorderTraversal())
+
+
+@pytest.fixture
+def rootDir(tmp_path):
+    """ 根文件夹/a/b/c各层都有文件，另有被排除的.git文件夹 """
+    root = str(tmp_path).replace('\\', '/')
+    writeFile(f'{root}/top.txt', 10)
+    writeFile(f'{root}/a/a.txt', 20)
+    writeFile(f'{root}/a/b/b.txt', 30)
+    writeFile(f'{root}/a/b/c/c.txt', 40)
+    writeFile(f'{root}/a/.git/objects/o', 1000)
+    writeFile(f'{root}/d/d.txt', 50)
+    return root
+
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('maxDepth', [0, 1, 2, None])
+def testUpdateDirsMatchesFullScan(rootDir, maxDepth, compact):
+    """ 文件夹（包括未展开的文件夹中的子孙文件夹和被排除的文件夹）变化后部分更新，结果与完整扫描一致 """
+    options = {'maxDepth': maxDepth, 'excludeGlobs': ['.git'], 'compact': compact}
+    dirManager = DirManager(rootDir, **options)
+    writeFile(f'{rootDir}/a/b/c/new.txt', 7)
+    writeFile(f'{rootDir}/a/b/e/e.txt', 11)
+    writeFile(f'{rootDir}/a/.git/objects/p', 500)
+    writeFile(f'{rootDir}/a/f/.git/x', 300)
+    writeFile(f'{rootDir}/a/f/f.txt', 5)
+    os.remove(f'{rootDir}/d/d.txt')
+    changedDirs = [f'{rootDir}/a/b/c', f'{rootDir}/a/b', f'{rootDir}/a/.git/objects', f'{rootDir}/a', f'{rootDir}/d']
+    dirManager.updateDirs(changedDirs)
+    assert treeRecords(dirManager) == treeRecords(DirManager(rootDir, **options))
+    if maxDepth is not None:
+        assert max(node.depth for node in dirManager.dirTree.preorderTraversal()) <= maxDepth
+
+
+@pytest.mark.parametrize('maxDepth', [1, 2, None])
+def testRefreshNodeMatchesFullScan(rootDir, maxDepth):
+    """ 只刷新一个子树后，各祖先节点的大小和数量与完整扫描一致 """
+    options = {'maxDepth': maxDepth, 'excludeGlobs': ['.git']}
+    dirManager = DirManager(rootDir, **options)
+    writeFile(f'{rootDir}/a/b/c/d/new.txt', 70)
+    writeFile(f'{rootDir}/a/.git/y', 100)
+    dirManager.refreshNode(dirManager.findNode(f'{rootDir}/a'))
+    assert treeRecords(dirManager) == treeRecords(DirManager(rootDir, **options))
+
+
+def testUpdateCollapsedRoot(rootDir):
+    """ 根文件夹未展开时重新合计根文件夹，不重复计数 """
+    dirManager = DirManager(rootDir, maxDepth=0, excludeGlobs=['.git'])
+    oldRoot = dirManager.dirTree
+    writeFile(f'{rootDir}/a/b/c/new.txt', 7)
+    assert dirManager.updateDirs([f'{rootDir}/a/b/c', rootDir]) == [dirManager.dirTree]
+    assert dirManager.dirTree is not oldRoot
+    assert not dirManager.dirTree.children
+    assert (dirManager.dirTree.allSize, dirManager.dirTree.dirCount, dirManager.dirTree.fileCount) == (157, 4, 6)
+
+
+def testWalkDirsSkipsPrunedDirs(rootDir):
+    """ 监视时新出现的文件夹按排除规则跳过 """
+    from dirWatcher import walkDirs
+    from fileUtils import ListOptions, makeExcludes
+    pruneOptions = ListOptions(excludes=makeExcludes(['.git']))
+    assert sorted(walkDirs(f'{rootDir}/a', pruneOptions)) == [f'{rootDir}/a', f'{rootDir}/a/b', f'{rootDir}/a/b/c']
+    assert walkDirs(f'{rootDir}/a/.git', pruneOptions) == []
+
+
+@pytest.mark.parametrize('usePolling', [False, True])
+def testWatchMatchesFullScan(rootDir, usePolling):
+    """ 监视器在监视线程中遍历并开始监视文件夹（跳过被排除的），发现的变化部分更新后与完整扫描一致 """
+    options = {'maxDepth': 1, 'excludeGlobs': ['.git']}
+    dirManager = DirManager(rootDir, **options)
+    changeQueue = queue.Queue()
+    watcher = dirManager.watch(changeQueue.put, delay=0.1, pollInterval=0.1, usePolling=usePolling)
+    try:
+        waitUntil(lambda: watcher.ready)
+        assert watcher.setupError is None
+        assert watcher.watchedCount == 5  # 根文件夹、a、a/b、a/b/c、d
+        time.sleep(0.05)  # 文件夹修改时间精度较低时确保变化能被轮询发现
+        writeFile(f'{rootDir}/a/b/c/new.txt', 7)
+        dirManager.updateDirs(changeQueue.get(timeout=5))
+    finally:
+        watcher.stop()
+    assert treeRecords(dirManager) == treeRecords(DirManager(rootDir, **options))
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='需要inotify')
+def testWatchFallsBackToPolling(rootDir, monkeypatch):
+    """ inotify监视数达到上限时在监视线程中改用轮询，已监视的文件夹也改为轮询 """
+    from dirWatcher import InotifyWatcher
+    addWatch = InotifyWatcher._InotifyWatcher__addWatch
+    watchCounts = []
+
+    def limitedAddWatch(watcher, pathDirName):
+        if len(watchCounts) >= 2:
+            raise OSError(28, 'inotify watch limit reached')
+        watchCounts.append(pathDirName)
+        addWatch(watcher, pathDirName)
+
+    monkeypatch.setattr(InotifyWatcher, '_InotifyWatcher__addWatch', limitedAddWatch)
+    dirManager = DirManager(rootDir, excludeGlobs=['.git'])
+    changeQueue = queue.Queue()
+    watcher = dirManager.watch(changeQueue.put, delay=0.1, pollInterval=0.1)
+    try:
+        waitUntil(lambda: watcher.ready)
+        assert isinstance(watcher, InotifyWatcher)
+        assert watcher.fallbackReason is not None
+        assert watcher.watchedCount == 5
+        time.sleep(0.05)
+        writeFile(f'{watchCounts[0]}/new.txt', 7)
+        assert changeQueue.get(timeout=5) == [watchCounts[0]]
+    finally:
+        watcher.stop()
+
+
+@pytest.mark.parametrize('maxDepth', [0, 1, 2])
+def testChangeInsideCollapsedDir(rootDir, maxDepth):
+    """ 只报告未展开的文件夹中的子孙文件夹变化时，重新合计其最深的已展开的祖先节点 """
+    dirManager = DirManager(rootDir, maxDepth=maxDepth)
+    writeFile(f'{rootDir}/a/b/c/new.txt', 7)
+    writeFile(f'{rootDir}/a/.git/objects/p', 500)
+    dirManager.updateDirs([f'{rootDir}/a/b/c', f'{rootDir}/a/.git/objects'])
+    assert treeRecords(dirManager) == treeRecords(DirManager(rootDir, maxDepth=maxDepth))
+
+
+@pytest.mark.parametrize('options', [{'breakdown': True}, {'topCount': 3}])
+def testCacheWithFileStatistics(rootDir, tmp_path, options):
+    """ 需要逐个文件统计时不使用缓存数据，使用缓存重新扫描的统计结果与第一次扫描一致 """
+    cacheFile = str(tmp_path / 'cache.db')
+
+    def statistics(dirManager: DirManager):
+        if options.get('breakdown'):
+            breakdown = dirManager.dirTree.breakdown
+            return breakdown.largestExtensions(), breakdown.ageCounts
+        return dirManager.ranking.largestFiles.items()
+
+    first = statistics(DirManager(rootDir, cacheFile=cacheFile, **options))
+    assert first and first[0]
+    assert statistics(DirManager(rootDir, cacheFile=cacheFile, **options)) == first
@@ -0,0 +1,36 @@
+"""
+文本快照对比的测试
+"""
+
+import os
+import pytest
+from fileUtils import DirManager
+from snapshot import diffSnapshotFiles
+
+
+@pytest.fixture
+def twoRoots(tmp_path):
+    """ 结构相同、文件大小不同的两个根文件夹 """
+    roots = []
+    for rootName, size in (('one', 10), ('two', 20)):
+        root = str(tmp_path / rootName).replace('\\', '/')
+        os.makedirs(f'{root}/a')
+        with open(f'{root}/a/a.txt', 'wb') as file:
+            file.write(b'x' * size)
+        roots.append(root)
+    return roots
+
+
+def testDiffRequiresSameRoot(twoRoots, tmp_path):
+    """ 快照的根文件夹不同时拒绝对比，指定allowOtherRoot时按相对路径对比 """
+    oneRoot, twoRoot = twoRoots
+    oneSnapshot, twoSnapshot = str(tmp_path / 'one.snapshot'), str(tmp_path / 'two.snapshot')
+    for root, snapshotFile in ((oneRoot, oneSnapshot), (twoRoot, twoSnapshot)):
+        with open(snapshotFile, mode='w', encoding='utf-8') as file:
+            DirManager(root).saveSnapshot(file)
+    with pytest.raises(ValueError):
+        diffSnapshotFiles(oneSnapshot, twoSnapshot)
+    with pytest.raises(ValueError):
+        DirManager(twoRoot).diffSnapshot(oneSnapshot)
+    assert [change.path for change in diffSnapshotFiles(oneSnapshot, twoSnapshot, allowOtherRoot=True)] == ['', 'a']
+    assert DirManager(oneRoot + '/').diffSnapshot(oneSnapshot) == []
@@ -0,0 +1,48 @@
+"""
+导出的测试
+"""
+
+import io
+import os
+import pytest
+import treeExport
+from fileUtils import DirManager
+
+
+@pytest.fixture
+def rootDir(tmp_path):
+    """ 两层文件夹，各有一个文件 """
+    for relPath, size in (('a/x.log', 10), ('a/b/y.txt', 20)):
+        os.makedirs(tmp_path / os.path.dirname(relPath), exist_ok=True)
+        (tmp_path / relPath).write_bytes(b'x' * size)
+    return str(tmp_path)
+
+
+def exportNdjson(dirManager: DirManager, **options) -> str:
+    """ 以ndjson格式导出为字符串 """
+    file = io.StringIO()
+    dirManager.export(file, 'ndjson', **options)
+    return file.getvalue()
+
+
+def testExportRecordedFilesWithoutReadingDisk(rootDir, monkeypatch):
+    """ 扫描时记录了文件时，导出文件不再读取磁盘 """
+    dirManager = DirManager(rootDir, recordFiles=True)
+    assert dirManager.recordFiles
+
+    def failListDir(*_):
+        raise AssertionError('导出时读取了磁盘')
+
+    monkeypatch.setattr(treeExport, 'listDir', failListDir)
+    assert exportNdjson(dirManager).count('"type": "file"') == 2
+
+
+def testExportWithoutRecordedFiles(rootDir, monkeypatch):
+    """ 扫描时没有记录文件时，导出文件重新读取磁盘，只导出文件夹时不读取 """
+    dirManager = DirManager(rootDir)
+    assert not dirManager.recordFiles
+    assert exportNdjson(dirManager).count('"type": "file"') == 2
+    monkeypatch.setattr(treeExport, 'listDir', None)
+    text = exportNdjson(dirManager, includeFiles=False)
+    assert text.count('"type": "dir"') == 3
+    assert '"type": "file"' not in text
@@ -0,0 +1,148 @@
+"""
+导出文件夹树
+以迭代方式遍历文件夹树并分块写入文件，不受递归深度限制；文件信息优先使用扫描时记录的数据，
+没有记录的文件夹才重新读取磁盘（二进制快照等不对应当前磁盘的数据只导出文件夹）
+"""
+
+import csv
+import json
+from fileUtils import listDir, ListOptions
+
+exportFormats = ('text', 'csv', 'ndjson', 'json')
+csvHeader = ('type', 'path', 'depth', 'size', 'allSize', 'sizePercent', 'dirCount', 'fileCount', 'canVisit')
+
+
+class _BufferedWriter:
+    """ 先将文本缓存在内存中，积累到一定数量后一次写入文件 """
+
+    __bufferSize = 4096  # 每次写入的文本段数
+
+    def __init__(self, file):
+        """ 初始化 """
+        self.__file = file
+        self.__buffer = []
+
+    def write(self, text: str):
+        """ 写入文本 """
+        self.__buffer.append(text)
+        if len(self.__buffer) >= _BufferedWriter.__bufferSize:
+            self.flush()
+
+    def flush(self):
+        """ 将缓存的文本写入文件 """
+        if self.__buffer:
+            self.__file.write(''.join(self.__buffer))
+            self.__buffer.clear()
+
+
+def exportTree(rootNode, file, fileFormat: str = 'text', includeFiles: bool = True):
+    """ 导出以rootNode为根的文件夹（包括文件）信息
+    :param file: 以文本模式打开的文件，csv格式时应以newline=''打开
+    :param fileFormat: 导出格式，见exportFormats
+    :param includeFiles: 是否导出文件，为False时只导出文件夹（json格式的files为空列表）
+    """
+    writers = {'text': _writeText, 'csv': _writeCsv, 'ndjson': _writeNdjson, 'json': _writeJson}
+    if fileFormat not in writers:
+        raise ValueError(f'不支持的导出格式: {fileFormat}')
+    writer = _BufferedWriter(file)
+    writers[fileFormat](rootNode, writer, iterFiles if includeFiles else _noFiles)
+    writer.flush()
+
+
+def iterFiles(node):
+    """ 依次产生节点的直属文件(文件名, 文件大小)，扫描时没有记录文件的节点重新读取磁盘 """
+    files = node.files
+    if files is None:
+        files = listDir(node.pathDirName, ListOptions(recordFiles=True)).files
+    return files.items()
+
+
+def _noFiles(node):
+    """ 不导出文件时代替iterFiles """
+    return ()
+
+
+def _joinPath(pathDirName: str, name: str) -> str:
+    """ 拼接路径 """
+    return pathDirName.rstrip('/') + '/' + name
+
+
+def _iterNodes(rootNode):
+    """ 前序遍历，不预先生成整个节点列表 """
+    nodeStack = [rootNode]
+    while nodeStack:
+        curNode = nodeStack.pop()
+        yield curNode
+        nodeStack.extend(reversed(curNode.children))
+
+
+def _writeText(rootNode, writer: _BufferedWriter, filesFunc):
+    """ 导出树状图，每个文件夹先列出子文件夹再列出文件 """
+    indentStr = '    '  # 缩进字符串
+    nodeStack = [(rootNode, False)]  # [(节点, 是否写文件)]
+    while nodeStack:
+        curNode, writeFiles = nodeStack.pop()
+        if writeFiles:
+            indent = indentStr * (curNode.depth + 1)
+            for fileName, _ in filesFunc(curNode):
+                writer.write(f'{indent}{fileName}\n')
+            continue
+        writer.write(f'{indentStr * curNode.depth}*{curNode.dirName}\n')
+        nodeStack.append((curNode, True))
+        nodeStack.extend((child, False) for child in reversed(curNode.children))
+
+
+def _writeCsv(rootNode, writer: _BufferedWriter, filesFunc):
+    """ 导出CSV表格，每个文件夹和文件各占一行 """
+    csvWriter = csv.writer(writer)
+    csvWriter.writerow(csvHeader)
+    for node in _iterNodes(rootNode):
+        pathDirName = node.pathDirName
+        csvWriter.writerow(('dir', pathDirName, node.depth, node.selfSize, node.allSize, f'{node.sizePercent:.2f}',
+                            node.dirCount, node.fileCount, int(node.canVisit)))
+        fileDepth = node.depth + 1
+        for fileName, fileSize in filesFunc(node):
+            csvWriter.writerow(('file', _joinPath(pathDirName, fileName), fileDepth, fileSize, '', '', '', '', ''))
+
+
+def _writeNdjson(rootNode, writer: _BufferedWriter, filesFunc):
+    """ 导出NDJSON，每行一个文件夹或文件对象 """
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    for node in _iterNodes(rootNode):
+        pathDirName = node.pathDirName
+        writer.write(dumps({'type': 'dir', 'path': pathDirName, 'depth': node.depth, 'selfSize': node.selfSize,
+                            'allSize': node.allSize, 'sizePercent': node.sizePercent, 'dirCount': node.dirCount,
+                            'fileCount': node.fileCount, 'canVisit': node.canVisit}))
+        writer.write('\n')
+        fileDepth = node.depth + 1
+        for fileName, fileSize in filesFunc(node):
+            writer.write(dumps({'type': 'file', 'path': _joinPath(pathDirName, fileName), 'depth': fileDepth,
+                                'size': fileSize}))
+            writer.write('\n')
+
+
+def _writeJson(rootNode, writer: _BufferedWriter, filesFunc):
+    """ 导出嵌套的JSON文档，文件夹对象的files为直属文件，children为子文件夹 """
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    nodeStack = [(rootNode, True)]  # [(节点, 是否为第一个子节点)]，节点为None表示结束上一层
+    while nodeStack:
+        curNode, isFirst = nodeStack.pop()
+        if curNode is None:
+            writer.write(']}')
+            continue
+        if not isFirst:
+            writer.write(',')
+        header = dumps({'name': curNode.dirName, 'path': curNode.pathDirName, 'selfSize': curNode.selfSize,
+                        'allSize': curNode.allSize, 'sizePercent': curNode.sizePercent,
+                        'dirCount': curNode.dirCount, 'fileCount': curNode.fileCount, 'canVisit': curNode.canVisit})
+        writer.write(header[:-1])
+        writer.write(', "files": [')
+        for i, (fileName, fileSize) in enumerate(filesFunc(curNode)):
+            if i:
+                writer.write(', ')
+            writer.write(dumps({'name': fileName, 'size': fileSize}))
+        writer.write('], "children": [')
+        nodeStack.append((None, False))
+        children = curNode.children
+        nodeStack.extend((child, i == 0) for i, child in reversed(list(enumerate(children))))
+    writer.write('\n')